@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sistema CM - Agregação de Relatórios
+Agrupamento vetorizado (pandas/NumPy) dos dados dos relatórios por dia,
+semana ISO, mês ou ano
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from estatisticas_relatorios import EstatisticasRelatorio
+
+AGRUPAMENTOS = ("diario", "semanal", "mensal", "anual")
+
+# Unidade datetime64 do início de cada período (semana é tratada à parte)
+_UNIDADE_PERIODO = {"diario": "datetime64[D]", "mensal": "datetime64[M]", "anual": "datetime64[Y]"}
+
+
+def _quadro(data, centavos, quantidade, registros, lojas, produtos, tickets=None) -> pd.DataFrame:
+    """Monta o DataFrame tipado, descartando registros sem data válida
+
+    tickets (opcional): histograma {bucket: vendas} dos tickets de cada linha
+    """
+    quadro = pd.DataFrame({
+        "data": data,
+        "centavos": centavos,
+        "quantidade": quantidade,
+        "registros": registros,
+        "loja": pd.Categorical(lojas),
+        "produto": pd.Categorical(produtos),
+    })
+    if tickets is not None:
+        quadro["tickets"] = pd.Series(tickets, index=quadro.index, dtype=object)
+    invalidas = quadro["data"].isna()
+    if invalidas.any():
+        logging.warning(f"{int(invalidas.sum())} registros sem data válida ignorados na agregação")
+        quadro = quadro[~invalidas]
+    return quadro
+
+
+def _centavos(valores: np.ndarray) -> np.ndarray:
+    """Converte valores em reais (float) para centavos inteiros"""
+    return np.rint(valores * 100).astype(np.int64)
+
+
+def quadro_resumo(linhas: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Linhas do resumo diário de vendas em colunas tipadas"""
+    n = len(linhas)
+    return _quadro(
+        pd.to_datetime([linha["dia"] for linha in linhas]),
+        _centavos(np.fromiter((float(linha["total"]) for linha in linhas), dtype=np.float64, count=n)),
+        np.fromiter((linha["quantidade"] for linha in linhas), dtype=np.int64, count=n),
+        np.fromiter((linha["registros"] for linha in linhas), dtype=np.int64, count=n),
+        [linha["loja"] for linha in linhas],
+        [linha["produto"] for linha in linhas],
+        [linha["tickets"] for linha in linhas],
+    )
+
+
+def quadro_registros(itens: Iterable[Dict[str, Any]]) -> pd.DataFrame:
+    """Registros genéricos ({'data', 'valor', ...}) em colunas tipadas"""
+    itens = list(itens)
+    n = len(itens)
+    return _quadro(
+        pd.to_datetime([item["data"] for item in itens]),
+        _centavos(np.fromiter((float(item.get("valor", 0) or 0) for item in itens), dtype=np.float64, count=n)),
+        np.fromiter((item.get("quantidade", 0) or 0 for item in itens), dtype=np.int64, count=n),
+        np.fromiter((item.get("registros", 1) for item in itens), dtype=np.int64, count=n),
+        [item.get("loja") for item in itens],
+        [item.get("produto") for item in itens],
+    )
+
+
+def inicio_periodo(datas: np.ndarray, agrupamento: str) -> np.ndarray:
+    """Início do período (datetime64[D]) de cada data"""
+    dias = datas.astype("datetime64[D]")
+    if agrupamento == "semanal":
+        # 01/01/1970 foi quinta-feira: (dia + 3) % 7 dá o dia da semana com segunda = 0
+        numeros = dias.astype(np.int64)
+        return (numeros - (numeros + 3) % 7).astype("datetime64[D]")
+    return dias.astype(_UNIDADE_PERIODO.get(agrupamento, "datetime64[Y]")).astype("datetime64[D]")
+
+
+def rotulo_periodo(inicio, agrupamento: str) -> str:
+    """Rótulo exibido para o período iniciado na data informada"""
+    if agrupamento == "diario":
+        return inicio.strftime("%d/%m/%Y")
+    if agrupamento == "semanal":
+        ano, semana, _ = inicio.isocalendar()
+        return f"Semana {semana}/{ano}"
+    if agrupamento == "mensal":
+        return inicio.strftime("%m/%Y")
+    return str(inicio.year)
+
+
+def interpretar_periodo(texto: str) -> Tuple[date, date]:
+    """Converte "AAAA-MM" (mês inteiro) ou "AAAA-MM-DD:AAAA-MM-DD" em (início, fim)"""
+    if ":" in texto:
+        inicio, fim = (datetime.strptime(parte, "%Y-%m-%d").date() for parte in texto.split(":", 1))
+        return inicio, fim
+    inicio = datetime.strptime(texto, "%Y-%m").date()
+    proximo = (inicio + timedelta(days=31)).replace(day=1)
+    return inicio, proximo - timedelta(days=1)
+
+
+def agrupar_periodos(quadro: pd.DataFrame, agrupamento: str,
+                     estatisticas: Optional[EstatisticasRelatorio] = None) -> Dict[str, Dict[str, Any]]:
+    """Agrupa o quadro por período, em ordem cronológica
+
+    Se estatisticas for informado, é alimentado na mesma passagem: valores
+    por período e, quando o quadro traz a coluna tickets (resumo diário de
+    vendas), o histograma dos tickets de cada venda.
+
+    Returns:
+        Dicionário {rótulo: {'valor_total', 'quantidade', 'inicio'}}, onde
+        'quantidade' é o número de registros do período
+    """
+    if quadro.empty:
+        return {}
+
+    inicios = inicio_periodo(quadro["data"].to_numpy(dtype="datetime64[ns]"), agrupamento)
+
+    # Somas por período com bincount sobre o número do dia (sem ordenar os registros)
+    dias = inicios.astype(np.int64)
+    primeiro = int(dias.min())
+    posicoes = dias - primeiro
+    linhas = np.bincount(posicoes)
+    centavos_linhas = quadro["centavos"].to_numpy(dtype=np.float64)
+    registros_linhas = quadro["registros"].to_numpy(dtype=np.float64)
+    centavos = np.bincount(posicoes, weights=centavos_linhas)
+    registros = np.bincount(posicoes, weights=registros_linhas)
+
+    if estatisticas is not None and "tickets" in quadro.columns:
+        for tickets in quadro["tickets"]:
+            estatisticas.tickets.adicionar_buckets(tickets)
+
+    dados_agrupados = {}
+    for posicao in np.flatnonzero(linhas):
+        inicio = (np.datetime64(primeiro + int(posicao), "D")).astype(object)
+        rotulo = rotulo_periodo(inicio, agrupamento)
+        dados_agrupados[rotulo] = {
+            "valor_total": round(float(centavos[posicao])) / 100,
+            "quantidade": int(registros[posicao]),
+            "inicio": inicio,
+        }
+        if estatisticas is not None:
+            estatisticas.adicionar(rotulo, dados_agrupados[rotulo]["valor_total"],
+                                   dados_agrupados[rotulo]["quantidade"])
+    return dados_agrupados
+
+
+class CacheResultados:
+    """Cache LRU de resultados agrupados, compartilhado entre threads
+
+    A chave deve incluir a versão dos dados (GerenciadorDados.versao_dados):
+    resultados de versões antigas deixam de ser consultados e saem por LRU.
+    """
+
+    def __init__(self, capacidade: int = 32):
+        self.capacidade = capacidade
+        self._itens: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._itens)
+
+    def obter(self, chave: Hashable) -> Optional[Any]:
+        """Resultado guardado para a chave (None se ausente)"""
+        with self._lock:
+            valor = self._itens.get(chave)
+            if valor is not None:
+                self._itens.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave: Hashable, valor: Any):
+        """Guarda o resultado, descartando o menos usado se necessário"""
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        """Descarta todos os resultados"""
+        with self._lock:
+            self._itens.clear()
@@ -0,0 +1,653 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sistema CM - Armazenamento SQLite do GerenciadorDados
+Mantém cadastros, vendas, pagamentos e auditoria em tabelas normalizadas
+e indexadas, com leitura sob demanda através de listas persistentes
+"""
+
+import json
+import sqlite3
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableSequence
+from dataclasses import fields
+from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
+from typing import Dict, Any, List, Optional
+
+from estatisticas_relatorios import ERRO_RELATIVO_TICKET, EsbocoQuantis
+
+# Chaves de self.dados mantidas em tabelas próprias
+COLECOES = ("cadastros", "historico_vendas", "pagamentos", "auditoria")
+
+# Quantidade de linhas lidas por consulta ao percorrer uma coleção
+TAMANHO_LOTE = 500
+
+
+def _para_centavos(valor) -> int:
+    """Converte valor monetário para centavos inteiros"""
+    try:
+        valor = valor if isinstance(valor, Decimal) else Decimal(str(valor or 0))
+        return int((valor * 100).to_integral_value(rounding=ROUND_HALF_UP))
+    except (InvalidOperation, ValueError):
+        logging.warning(f"Valor inválido para centavos: {valor}, usando 0")
+        return 0
+
+
+def _de_centavos(centavos: Optional[int]) -> Decimal:
+    """Converte centavos inteiros para Decimal com duas casas"""
+    return Decimal(centavos or 0).scaleb(-2)
+
+
+def _inserir(conn, mapeador, objeto, posicao: Optional[int] = None) -> int:
+    """Insere o objeto (e as linhas filhas) na tabela do mapeador; retorna a posição
+
+    Sem posição informada, a linha vai para o final (AUTOINCREMENT).
+    """
+    colunas = mapeador.colunas if posicao is None else ["posicao"] + mapeador.colunas
+    valores = mapeador.para_linha(objeto) if posicao is None else (posicao,) + mapeador.para_linha(objeto)
+    cursor = conn.execute(f"INSERT INTO {mapeador.tabela} ({', '.join(colunas)}) "
+                          f"VALUES ({', '.join('?' * len(colunas))})", valores)
+    mapeador.gravar_filhos(conn, cursor.lastrowid, objeto)
+    return cursor.lastrowid
+
+
+def _assinatura(mapeador, objeto) -> tuple:
+    """Estado gravável do objeto (linha e filhas), para detectar edições feitas no próprio objeto"""
+    assinatura = getattr(mapeador, "assinatura", None)
+    return assinatura(objeto) if assinatura else mapeador.para_linha(objeto)
+
+
+def _inserir_lote(conn, mapeador, objetos):
+    """Insere vários objetos; sem linhas filhas, em um único executemany"""
+    if getattr(mapeador, "possui_filhos", False):
+        for objeto in objetos:
+            _inserir(conn, mapeador, objeto)
+        return
+    colunas = ", ".join(mapeador.colunas)
+    marcadores = ", ".join("?" * len(mapeador.colunas))
+    conn.executemany(f"INSERT INTO {mapeador.tabela} ({colunas}) VALUES ({marcadores})",
+                     [mapeador.para_linha(objeto) for objeto in objetos])
+
+
+class _MapeadorCadastros:
+    """Mapeamento CadastroCliente <-> tabela cadastro_cliente (+ telefones e referências)"""
+
+    tabela = "cadastro_cliente"
+    possui_filhos = True
+
+    def __init__(self, classe):
+        self.classe = classe
+        self.colunas = [f.name for f in fields(classe) if f.name not in ("telefones_adicionais", "referencias")]
+
+    def ddl(self) -> List[str]:
+        colunas = ", ".join(f"{c} TEXT" for c in self.colunas)
+        return [
+            f"CREATE TABLE IF NOT EXISTS cadastro_cliente (posicao INTEGER PRIMARY KEY AUTOINCREMENT, {colunas})",
+            """CREATE TABLE IF NOT EXISTS cadastro_telefone (
+                cliente_posicao INTEGER NOT NULL,
+                ordem INTEGER NOT NULL,
+                telefone TEXT NOT NULL,
+                FOREIGN KEY (cliente_posicao) REFERENCES cadastro_cliente (posicao)
+            )""",
+            """CREATE TABLE IF NOT EXISTS cadastro_referencia (
+                cliente_posicao INTEGER NOT NULL,
+                ordem INTEGER NOT NULL,
+                nome TEXT,
+                telefone TEXT,
+                parentesco TEXT,
+                FOREIGN KEY (cliente_posicao) REFERENCES cadastro_cliente (posicao)
+            )""",
+            "CREATE INDEX IF NOT EXISTS idx_cadastro_cliente_id ON cadastro_cliente (id)",
+            "CREATE INDEX IF NOT EXISTS idx_cadastro_cliente_nome ON cadastro_cliente (nome)",
+            "CREATE INDEX IF NOT EXISTS idx_cadastro_cliente_cpf ON cadastro_cliente (cpf)",
+            "CREATE INDEX IF NOT EXISTS idx_cadastro_cliente_loja ON cadastro_cliente (loja_cadastro)",
+            "CREATE INDEX IF NOT EXISTS idx_cadastro_telefone_cliente ON cadastro_telefone (cliente_posicao, ordem)",
+            "CREATE INDEX IF NOT EXISTS idx_cadastro_referencia_cliente ON cadastro_referencia (cliente_posicao, ordem)",
+        ]
+
+    def para_linha(self, cliente) -> tuple:
+        return tuple(str(getattr(cliente, c)) if getattr(cliente, c) is not None else "" for c in self.colunas)
+
+    def gravar_filhos(self, conn, posicao: int, cliente):
+        conn.executemany(
+            "INSERT INTO cadastro_telefone (cliente_posicao, ordem, telefone) VALUES (?, ?, ?)",
+            [(posicao, i, tel) for i, tel in enumerate(cliente.telefones_adicionais or [])]
+        )
+        conn.executemany(
+            "INSERT INTO cadastro_referencia (cliente_posicao, ordem, nome, telefone, parentesco) VALUES (?, ?, ?, ?, ?)",
+            [(posicao, i, ref.get("nome", ""), ref.get("telefone", ""), ref.get("parentesco", ""))
+             for i, ref in enumerate(cliente.referencias or [])]
+        )
+
+    def apagar_filhos(self, conn, posicao: int):
+        conn.execute("DELETE FROM cadastro_telefone WHERE cliente_posicao = ?", (posicao,))
+        conn.execute("DELETE FROM cadastro_referencia WHERE cliente_posicao = ?", (posicao,))
+
+    def deslocar_filhos(self, conn, a_partir: int):
+        conn.execute("UPDATE cadastro_telefone SET cliente_posicao = cliente_posicao + 1 "
+                     "WHERE cliente_posicao >= ?", (a_partir,))
+        conn.execute("UPDATE cadastro_referencia SET cliente_posicao = cliente_posicao + 1 "
+                     "WHERE cliente_posicao >= ?", (a_partir,))
+
+    def assinatura(self, cliente) -> tuple:
+        return (self.para_linha(cliente), tuple(cliente.telefones_adicionais or ()),
+                tuple(tuple(ref.items()) for ref in cliente.referencias or ()))
+
+    def de_linhas(self, conn, linhas) -> Dict[int, Any]:
+        """Materializa objetos a partir das linhas, buscando os filhos em lote"""
+        if not linhas:
+            return {}
+        posicoes = [linha[0] for linha in linhas]
+        marcadores = ", ".join("?" * len(posicoes))
+
+        telefones: Dict[int, List[str]] = {}
+        for posicao, telefone in conn.execute(
+                f"SELECT cliente_posicao, telefone FROM cadastro_telefone "
+                f"WHERE cliente_posicao IN ({marcadores}) ORDER BY cliente_posicao, ordem", posicoes):
+            telefones.setdefault(posicao, []).append(telefone)
+
+        referencias: Dict[int, List[Dict[str, str]]] = {}
+        for posicao, nome, telefone, parentesco in conn.execute(
+                f"SELECT cliente_posicao, nome, telefone, parentesco FROM cadastro_referencia "
+                f"WHERE cliente_posicao IN ({marcadores}) ORDER BY cliente_posicao, ordem", posicoes):
+            referencias.setdefault(posicao, []).append(
+                {"nome": nome, "telefone": telefone, "parentesco": parentesco})
+
+        objetos = {}
+        for linha in linhas:
+            valores = dict(zip(self.colunas, linha[1:]))
+            objetos[linha[0]] = self.classe(
+                telefones_adicionais=telefones.get(linha[0], []),
+                referencias=referencias.get(linha[0], []),
+                **valores
+            )
+        return objetos
+
+
+class _MapeadorVendas:
+    """Mapeamento Venda <-> tabela historico_venda"""
+
+    tabela = "historico_venda"
+    colunas = ["produto", "quantidade", "total_centavos", "timestamp", "codigo_loja"]
+
+    def __init__(self, classe):
+        self.classe = classe
+
+    def ddl(self) -> List[str]:
+        return [
+            """CREATE TABLE IF NOT EXISTS historico_venda (
+                posicao INTEGER PRIMARY KEY AUTOINCREMENT,
+                produto TEXT,
+                quantidade INTEGER,
+                total_centavos INTEGER,
+                timestamp TEXT,
+                codigo_loja TEXT
+            )""",
+            "CREATE INDEX IF NOT EXISTS idx_historico_venda_timestamp ON historico_venda (timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_historico_venda_loja ON historico_venda (codigo_loja, timestamp)",
+        ]
+
+    def para_linha(self, venda) -> tuple:
+        return (venda.produto, venda.quantidade, _para_centavos(venda.total), venda.timestamp, venda.codigo_loja)
+
+    def gravar_filhos(self, conn, posicao, venda):
+        pass
+
+    def apagar_filhos(self, conn, posicao):
+        pass
+
+    def deslocar_filhos(self, conn, a_partir):
+        pass
+
+    def de_linhas(self, conn, linhas) -> Dict[int, Any]:
+        return {
+            linha[0]: self.classe(produto=linha[1], quantidade=linha[2], total=_de_centavos(linha[3]),
+                                  timestamp=linha[4], codigo_loja=linha[5])
+            for linha in linhas
+        }
+
+
+class _MapeadorPagamentos:
+    """Mapeamento Pagamento <-> tabela pagamento"""
+
+    tabela = "pagamento"
+    colunas = ["descricao", "valor_centavos", "tipo", "timestamp"]
+
+    def __init__(self, classe):
+        self.classe = classe
+
+    def ddl(self) -> List[str]:
+        return [
+            """CREATE TABLE IF NOT EXISTS pagamento (
+                posicao INTEGER PRIMARY KEY AUTOINCREMENT,
+                descricao TEXT,
+                valor_centavos INTEGER,
+                tipo TEXT,
+                timestamp TEXT
+            )""",
+            "CREATE INDEX IF NOT EXISTS idx_pagamento_timestamp ON pagamento (timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_pagamento_tipo ON pagamento (tipo, timestamp)",
+        ]
+
+    def para_linha(self, pagamento) -> tuple:
+        return (pagamento.descricao, _para_centavos(pagamento.valor), pagamento.tipo, pagamento.timestamp)
+
+    def gravar_filhos(self, conn, posicao, pagamento):
+        pass
+
+    def apagar_filhos(self, conn, posicao):
+        pass
+
+    def deslocar_filhos(self, conn, a_partir):
+        pass
+
+    def de_linhas(self, conn, linhas) -> Dict[int, Any]:
+        return {
+            linha[0]: self.classe(descricao=linha[1], valor=_de_centavos(linha[2]), tipo=linha[3], timestamp=linha[4])
+            for linha in linhas
+        }
+
+
+class _MapeadorAuditoria:
+    """Mapeamento das entradas de auditoria (texto) <-> tabela auditoria"""
+
+    tabela = "auditoria"
+    colunas = ["timestamp", "mensagem"]
+
+    def ddl(self) -> List[str]:
+        return [
+            """CREATE TABLE IF NOT EXISTS auditoria (
+                posicao INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT,
+                mensagem TEXT NOT NULL
+            )""",
+            "CREATE INDEX IF NOT EXISTS idx_auditoria_timestamp ON auditoria (timestamp)",
+        ]
+
+    def para_linha(self, entrada) -> tuple:
+        # Entradas no formato "AAAA-MM-DD HH:MM:SS - ..." (ou legado "DD/MM/AAAA HH:MM:SS - ...")
+        return (str(entrada)[:19], str(entrada))
+
+    def gravar_filhos(self, conn, posicao, entrada):
+        pass
+
+    def apagar_filhos(self, conn, posicao):
+        pass
+
+    def deslocar_filhos(self, conn, a_partir):
+        pass
+
+    def de_linhas(self, conn, linhas) -> Dict[int, Any]:
+        return {linha[0]: linha[2] for linha in linhas}
+
+
+class ListaSQLite(MutableSequence):
+    """Lista persistente com leitura sob demanda
+
+    Mantém em memória apenas as chaves (posições) das linhas e um cache LRU
+    dos objetos já materializados. Cada alteração grava somente a linha
+    afetada.
+
+    Objetos obtidos por índice podem ser editados diretamente (como na
+    lista do backend JSON): a edição é gravada por gravar_alterados()
+    (chamado em salvar_dados) ou quando o objeto sai do cache. Na iteração,
+    a edição feita no objeto é gravada quando a iteração avança; objetos
+    guardados e editados depois disso não são acompanhados.
+    """
+
+    def __init__(self, armazenamento: "ArmazenamentoSQLite", mapeador, tamanho_cache: int = 2048):
+        self._armazenamento = armazenamento
+        self._mapeador = mapeador
+        self._tamanho_cache = tamanho_cache
+        self._cache: "OrderedDict[int, Any]" = OrderedDict()
+        # Estado gravado de cada objeto do cache (detecção de edições diretas)
+        self._assinaturas: Dict[int, tuple] = {}
+
+        with armazenamento.lock:
+            self._posicoes = array("q", (linha[0] for linha in armazenamento.conn.execute(
+                f"SELECT posicao FROM {mapeador.tabela} ORDER BY posicao")))
+
+    def __len__(self) -> int:
+        return len(self._posicoes)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self[i] for i in range(*indice.indices(len(self)))]
+
+        posicao = self._posicoes[indice]
+        objeto = self._cache.get(posicao)
+        if objeto is not None:
+            self._cache.move_to_end(posicao)
+            return objeto
+
+        objeto = self._carregar([posicao])[posicao]
+        self._guardar_cache(posicao, objeto)
+        return objeto
+
+    def __iter__(self):
+        # Leitura em lotes ordenados, sem poluir o cache LRU
+        mapeador = self._mapeador
+        for inicio in range(0, len(self._posicoes), TAMANHO_LOTE):
+            lote = self._posicoes[inicio:inicio + TAMANHO_LOTE]
+            objetos = self._carregar(list(lote))
+            for posicao in lote:
+                objeto = self._cache.get(posicao)
+                if objeto is not None:
+                    yield objeto
+                    continue
+                objeto = objetos[posicao]
+                antes = _assinatura(mapeador, objeto)
+                yield objeto
+                # Objeto fora do cache editado durante a iteração
+                if _assinatura(mapeador, objeto) != antes:
+                    with self._armazenamento.transacao() as conn:
+                        self._gravar(conn, posicao, objeto)
+
+    def __setitem__(self, indice, objeto):
+        if isinstance(indice, slice):
+            raise TypeError("Atribuição por fatia não suportada")
+
+        posicao = self._posicoes[indice]
+        with self._armazenamento.transacao() as conn:
+            self._gravar(conn, posicao, objeto)
+        self._guardar_cache(posicao, objeto)
+
+    def __delitem__(self, indice):
+        if isinstance(indice, slice):
+            for i in sorted(range(*indice.indices(len(self))), reverse=True):
+                del self[i]
+            return
+
+        posicao = self._posicoes[indice]
+        with self._armazenamento.transacao() as conn:
+            self._mapeador.apagar_filhos(conn, posicao)
+            conn.execute(f"DELETE FROM {self._mapeador.tabela} WHERE posicao = ?", (posicao,))
+        del self._posicoes[indice]
+        self._cache.pop(posicao, None)
+        self._assinaturas.pop(posicao, None)
+
+    def insert(self, indice, objeto):
+        """Insere o objeto antes do índice informado (como list.insert)"""
+        tamanho = len(self)
+        indice = min(max(indice + tamanho if indice < 0 else indice, 0), tamanho)
+
+        deslocadas = False
+        with self._armazenamento.transacao() as conn:
+            if indice == tamanho:
+                posicao = self._inserir(conn, objeto)
+            else:
+                posicao, deslocadas = self._abrir_posicao(conn, indice)
+                _inserir(conn, self._mapeador, objeto, posicao)
+        if deslocadas:
+            self._deslocar_posicoes(indice, posicao)
+        self._posicoes.insert(indice, posicao)
+        self._guardar_cache(posicao, objeto)
+
+    def _abrir_posicao(self, conn, indice: int):
+        """Posição livre antes da linha do índice (lacuna de exclusões ou deslocando as seguintes)
+
+        Returns:
+            tuple: (posição, se as linhas seguintes foram deslocadas no banco)
+        """
+        posicao = self._posicoes[indice]
+        anterior = self._posicoes[indice - 1] if indice > 0 else 0
+        if posicao - 1 > anterior:
+            return posicao - 1, False
+
+        # Sem lacuna: as linhas seguintes avançam uma posição (em dois passos,
+        # pelo negativo, para não colidir com a chave primária durante o UPDATE)
+        tabela = self._mapeador.tabela
+        conn.execute(f"UPDATE {tabela} SET posicao = -(posicao + 1) WHERE posicao >= ?", (posicao,))
+        conn.execute(f"UPDATE {tabela} SET posicao = -posicao WHERE posicao < 0")
+        self._mapeador.deslocar_filhos(conn, posicao)
+        return posicao, True
+
+    def _deslocar_posicoes(self, indice: int, posicao: int):
+        """Acompanha em memória o deslocamento das linhas a partir da posição"""
+        for i in range(indice, len(self._posicoes)):
+            self._posicoes[i] += 1
+        deslocar = (lambda p: p + 1 if p >= posicao else p)
+        self._cache = OrderedDict((deslocar(p), objeto) for p, objeto in self._cache.items())
+        self._assinaturas = {deslocar(p): assinatura for p, assinatura in self._assinaturas.items()}
+
+    def extend(self, objetos):
+        """Insere vários objetos em uma única transação"""
+        novos = []
+        with self._armazenamento.transacao() as conn:
+            for objeto in objetos:
+                novos.append(self._inserir(conn, objeto))
+        self._posicoes.extend(novos)
+
+    def gravar_alterados(self) -> int:
+        """Grava os objetos do cache editados diretamente (ex.: lista[0].nome = ...)
+
+        Returns:
+            int: Quantidade de objetos gravados
+        """
+        mapeador = self._mapeador
+        alterados = [(posicao, objeto) for posicao, objeto in list(self._cache.items())
+                     if _assinatura(mapeador, objeto) != self._assinaturas.get(posicao)]
+        if alterados:
+            with self._armazenamento.transacao() as conn:
+                for posicao, objeto in alterados:
+                    self._gravar(conn, posicao, objeto)
+            for posicao, objeto in alterados:
+                self._assinaturas[posicao] = _assinatura(mapeador, objeto)
+        return len(alterados)
+
+    def _gravar(self, conn, posicao: int, objeto):
+        """Grava a linha (e as filhas) do objeto na posição informada"""
+        mapeador = self._mapeador
+        atribuicoes = ", ".join(f"{c} = ?" for c in mapeador.colunas)
+        conn.execute(f"UPDATE {mapeador.tabela} SET {atribuicoes} WHERE posicao = ?",
+                     mapeador.para_linha(objeto) + (posicao,))
+        mapeador.apagar_filhos(conn, posicao)
+        mapeador.gravar_filhos(conn, posicao, objeto)
+
+    def _inserir(self, conn, objeto) -> int:
+        return _inserir(conn, self._mapeador, objeto)
+
+    def _carregar(self, posicoes: List[int]) -> Dict[int, Any]:
+        mapeador = self._mapeador
+        colunas = ", ".join(["posicao"] + mapeador.colunas)
+        with self._armazenamento.lock:
+            conn = self._armazenamento.conn
+            linhas = conn.execute(
+                f"SELECT {colunas} FROM {mapeador.tabela} WHERE posicao BETWEEN ? AND ? ORDER BY posicao",
+                (min(posicoes), max(posicoes))
+            ).fetchall() if len(posicoes) > 1 else conn.execute(
+                f"SELECT {colunas} FROM {mapeador.tabela} WHERE posicao = ?", (posicoes[0],)
+            ).fetchall()
+            desejadas = set(posicoes)
+            return mapeador.de_linhas(conn, [linha for linha in linhas if linha[0] in desejadas])
+
+    def _guardar_cache(self, posicao: int, objeto):
+        self._cache[posicao] = objeto
+        self._cache.move_to_end(posicao)
+        self._assinaturas[posicao] = _assinatura(self._mapeador, objeto)
+        while len(self._cache) > self._tamanho_cache:
+            antiga, removido = self._cache.popitem(last=False)
+            # Editado diretamente: gravar antes de deixar de acompanhá-lo
+            if _assinatura(self._mapeador, removido) != self._assinaturas.pop(antiga):
+                with self._armazenamento.transacao() as conn:
+                    self._gravar(conn, antiga, removido)
+
+    def __repr__(self) -> str:
+        return f"<ListaSQLite {self._mapeador.tabela}: {len(self)} registros>"
+
+
+class ArmazenamentoSQLite:
+    """Armazenamento do GerenciadorDados em banco SQLite"""
+
+    def __init__(self, caminho: str, classe_cliente, classe_venda, classe_pagamento):
+        self.caminho = caminho
+        self.lock = threading.RLock()
+
+        # Conexão compartilhada entre a interface e as threads de relatório
+        self.conn = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+
+        self.mapeadores = {
+            "cadastros": _MapeadorCadastros(classe_cliente),
+            "historico_vendas": _MapeadorVendas(classe_venda),
+            "pagamentos": _MapeadorPagamentos(classe_pagamento),
+            "auditoria": _MapeadorAuditoria(),
+        }
+        self._criar_tabelas()
+
+    def _criar_tabelas(self):
+        """Cria tabelas e índices, se necessário"""
+        with self.transacao() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS dados_gerais (chave TEXT PRIMARY KEY, valor TEXT NOT NULL)")
+            # Ponto de retomada das importações em streaming (importar_json.py)
+            conn.execute("""CREATE TABLE IF NOT EXISTS importacao_json (
+                origem TEXT PRIMARY KEY,
+                progresso TEXT NOT NULL,
+                concluida INTEGER NOT NULL DEFAULT 0
+            )""")
+            for mapeador in self.mapeadores.values():
+                for comando in mapeador.ddl():
+                    conn.execute(comando)
+
+    def transacao(self):
+        """Context manager de transação (BEGIN/COMMIT/ROLLBACK) sob o lock"""
+        return _Transacao(self)
+
+    def vazio(self) -> bool:
+        """Indica se o banco ainda não recebeu dados"""
+        with self.lock:
+            tabelas = ["dados_gerais"] + [mapeador.tabela for mapeador in self.mapeadores.values()]
+            return not any(self.conn.execute(f"SELECT 1 FROM {tabela} LIMIT 1").fetchone() for tabela in tabelas)
+
+    def carregar(self) -> Dict[str, Any]:
+        """Monta o dicionário de dados com coleções carregadas sob demanda"""
+        with self.lock:
+            dados = {chave: json.loads(valor) for chave, valor in
+                     self.conn.execute("SELECT chave, valor FROM dados_gerais")}
+        for colecao, mapeador in self.mapeadores.items():
+            dados[colecao] = ListaSQLite(self, mapeador)
+        return dados
+
+    def importar(self, dados: Dict[str, Any]):
+        """Importa um dicionário de dados (formato do arquivo JSON) para o banco"""
+        for colecao, mapeador in self.mapeadores.items():
+            ListaSQLite(self, mapeador).extend(dados.get(colecao, []))
+        self.salvar_gerais(dados)
+        logging.info(f"Dados importados para {self.caminho}")
+
+    def salvar_gerais(self, dados: Dict[str, Any]):
+        """Grava as chaves que não são coleções (saldos, lojas, metas, ...)"""
+        with self.transacao() as conn:
+            self._gravar_gerais(conn, dados)
+
+    @staticmethod
+    def _gravar_gerais(conn, dados: Dict[str, Any]):
+        conn.executemany(
+            "INSERT OR REPLACE INTO dados_gerais (chave, valor) VALUES (?, ?)",
+            [(chave, json.dumps(valor, ensure_ascii=False, default=str))
+             for chave, valor in dados.items() if chave not in COLECOES]
+        )
+
+    def importar_lote(self, origem: str, progresso: Dict[str, Any], colecao: Optional[str] = None,
+                      objetos=(), gerais: Optional[Dict[str, Any]] = None, concluida: bool = False):
+        """Grava um lote da importação em streaming junto com o ponto de retomada
+
+        Registros, chaves gerais e progresso vão na mesma transação: uma
+        importação interrompida continua exatamente do último lote gravado.
+        """
+        with self.transacao() as conn:
+            if colecao and objetos:
+                _inserir_lote(conn, self.mapeadores[colecao], objetos)
+            if gerais:
+                self._gravar_gerais(conn, gerais)
+            conn.execute("INSERT OR REPLACE INTO importacao_json (origem, progresso, concluida) VALUES (?, ?, ?)",
+                         (origem, json.dumps(progresso, ensure_ascii=False), int(concluida)))
+
+    def progresso_importacao(self, origem: str) -> Optional[Dict[str, Any]]:
+        """Progresso gravado da importação do arquivo (None se nunca iniciada)"""
+        with self.lock:
+            linha = self.conn.execute("SELECT progresso, concluida FROM importacao_json WHERE origem = ?",
+                                      (origem,)).fetchone()
+        if linha is None:
+            return None
+        return {**json.loads(linha[0]), "concluida": bool(linha[1])}
+
+    def importacao_pendente(self) -> Optional[str]:
+        """Arquivo cuja importação em streaming foi interrompida, se houver"""
+        with self.lock:
+            linha = self.conn.execute("SELECT origem FROM importacao_json WHERE concluida = 0").fetchone()
+        return linha[0] if linha else None
+
+    def resumo_vendas_diario(self) -> List[tuple]:
+        """Vendas agregadas por (dia, loja, produto) direto no banco
+
+        O agrupamento inclui o bucket do ticket de cada venda (mesmo esboço do
+        resumo diário); as linhas do mesmo dia, loja e produto são somadas em
+        ResumoVendasDiario.de_linhas.
+
+        Returns:
+            Linhas (dia, loja, produto, registros, quantidade, total, [[bucket, vendas]])
+        """
+        esboco = EsbocoQuantis(ERRO_RELATIVO_TICKET)
+        with self.lock:
+            self.conn.create_function("bucket_ticket", 1, lambda centavos: esboco.indice((centavos or 0) / 100),
+                                      deterministic=True)
+            linhas = self.conn.execute("""
+                SELECT substr(timestamp, 1, 10), codigo_loja, produto, bucket_ticket(total_centavos),
+                       COUNT(*), COALESCE(SUM(quantidade), 0), SUM(total_centavos)
+                FROM historico_venda
+                WHERE timestamp GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'
+                GROUP BY 1, 2, 3, 4
+            """).fetchall()
+        return [linha[:3] + (linha[4], linha[5], _de_centavos(linha[6]), [(linha[3], linha[4])])
+                for linha in linhas]
+
+    def iterar_periodo(self, colecao: str, inicio: str, fim: str, lote: int = TAMANHO_LOTE):
+        """Percorre, em lotes, os registros da coleção com inicio <= timestamp < fim
+
+        O lock é liberado entre os lotes; a continuação usa a última posição lida.
+        """
+        mapeador = self.mapeadores[colecao]
+        colunas = ", ".join(["posicao"] + mapeador.colunas)
+        ultima = 0
+        while True:
+            with self.lock:
+                linhas = self.conn.execute(
+                    f"SELECT {colunas} FROM {mapeador.tabela} "
+                    f"WHERE timestamp >= ? AND timestamp < ? AND posicao > ? ORDER BY posicao LIMIT ?",
+                    (inicio, fim, ultima, lote)
+                ).fetchall()
+                objetos = mapeador.de_linhas(self.conn, linhas)
+            if not linhas:
+                return
+            for linha in linhas:
+                yield objetos[linha[0]]
+            ultima = linhas[-1][0]
+
+    def fechar(self):
+        """Fecha a conexão com o banco"""
+        with self.lock:
+            self.conn.close()
+
+
+class _Transacao:
+    """Transação explícita sobre a conexão do armazenamento"""
+
+    def __init__(self, armazenamento: ArmazenamentoSQLite):
+        self.armazenamento = armazenamento
+
+    def __enter__(self):
+        self.armazenamento.lock.acquire()
+        self.armazenamento.conn.execute("BEGIN")
+        return self.armazenamento.conn
+
+    def __exit__(self, tipo, valor, tb):
+        try:
+            self.armazenamento.conn.execute("COMMIT" if tipo is None else "ROLLBACK")
+        finally:
+            self.armazenamento.lock.release()
+        return False
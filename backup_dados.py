@@ -0,0 +1,496 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sistema CM - Backup dos Dados
+Backups incrementais com deduplicação: cada arquivo é dividido em blocos
+definidos pelo conteúdo e os blocos são guardados uma única vez, pelo hash,
+de modo que trechos não alterados entre um backup e outro não ocupam espaço
+de novo. Bancos SQLite são copiados pela API de backup online, em lotes de
+páginas, sem bloquear quem grava.
+
+Estrutura do diretório de backups:
+    blocos/<2 primeiros hex>/<sha256>   blocos comprimidos com zlib
+    pontos/<AAAAMMDD-HHMMSS>.json       manifesto de cada backup
+
+Uso:
+    python backup_dados.py criar [--origem DIR] [--destino DIR]
+    python backup_dados.py listar
+    python backup_dados.py verificar [PONTO]
+    python backup_dados.py restaurar PONTO DIRETORIO
+    python backup_dados.py podar [--manter N]
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import hashlib
+import logging
+import sqlite3
+import shutil
+import argparse
+import tempfile
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from trava_arquivo import TravaArquivo
+
+# Blocos de 16 KB a 256 KB, média em torno de 80 KB (corte quando o hash de 16 bits é zero)
+BLOCO_MINIMO = 16 * 1024
+BLOCO_MAXIMO = 256 * 1024
+# Bytes considerados pelo hash de janela deslizante
+JANELA = 48
+# Leitura dos arquivos em segmentos (memória limitada para arquivos grandes)
+SEGMENTO_LEITURA = 8 * 1024 * 1024
+# Páginas copiadas por passo do backup SQLite (entre os passos outras conexões gravam)
+PAGINAS_POR_PASSO = 1024
+REINICIOS_MAX = 3
+
+# Valor pseudoaleatório fixo por byte (derivado de SHA-256: igual em qualquer versão)
+_TABELA_BYTES = np.array([int.from_bytes(hashlib.sha256(bytes([byte])).digest()[:2], "little")
+                          for byte in range(256)], dtype=np.uint16)
+
+ARQUIVOS_PADRAO = ("dados_sistema.json", "dados_sistema.json.journal", "dados_sistema.json.journal.1",
+                   "usuarios.json", "preferencias.json")
+BANCOS_PADRAO = ("sistema.db", "dados_sistema.db")
+DIRETORIOS_PADRAO = ("dados_sistema.auditoria",)
+# Arquivo de dados, journal e auditoria: gravados pelo sistema sob a trava do arquivo de dados
+PREFIXOS_TRAVADOS = ("dados_sistema.json", "dados_sistema.auditoria/")
+TRAVA_DADOS = "dados_sistema.json.lock"
+# Espera pela trava do repositório (outro backup ou poda em andamento)
+TEMPO_LIMITE_REPOSITORIO = 3600.0
+
+
+class ErroBackup(Exception):
+    """Ponto de backup inexistente ou inconsistente"""
+
+
+def _cortes_candidatos(cauda: bytes, dados: bytes, inicio_dados: int) -> np.ndarray:
+    """Posições (no arquivo) logo após cada janela de JANELA bytes com hash zero
+
+    O hash é a soma, em 16 bits, dos valores da tabela para os bytes da
+    janela: depende só do conteúdo, então uma inserção desloca os cortes
+    junto com o texto. Soma zero equivale a somas acumuladas iguais nas
+    duas pontas da janela. cauda são os JANELA bytes anteriores a dados.
+    """
+    buffer = np.frombuffer(cauda + dados, dtype=np.uint8)
+    if len(buffer) <= JANELA:
+        return np.empty(0, dtype=np.int64)
+    acumulado = np.cumsum(_TABELA_BYTES[buffer], dtype=np.uint16)
+    fins = np.flatnonzero(acumulado[JANELA:] == acumulado[:-JANELA]) + JANELA + 1
+    return fins + (inicio_dados - len(cauda))
+
+
+def dividir_blocos(arquivo) -> Iterator[bytes]:
+    """Blocos definidos pelo conteúdo do arquivo binário aberto"""
+    pendente = b""
+    consumido = 0  # posição em pendente do início do bloco atual
+    base = 0       # posição no arquivo do início do bloco atual
+    lido = 0
+    cauda = b""
+    candidatos = deque()
+
+    while True:
+        dados = arquivo.read(SEGMENTO_LEITURA)
+        if dados:
+            candidatos.extend(_cortes_candidatos(cauda, dados, lido).tolist())
+            cauda = (cauda + dados)[-JANELA:]
+            pendente = pendente[consumido:] + dados
+            consumido = 0
+            lido += len(dados)
+        fim = not dados
+
+        while True:
+            while candidatos and candidatos[0] < base + BLOCO_MINIMO:
+                candidatos.popleft()
+            if candidatos and candidatos[0] <= base + BLOCO_MAXIMO:
+                corte = candidatos.popleft()
+            elif lido >= base + BLOCO_MAXIMO:
+                corte = base + BLOCO_MAXIMO
+            elif fim and lido > base:
+                corte = lido
+            else:
+                break
+            tamanho = corte - base
+            yield pendente[consumido:consumido + tamanho]
+            consumido += tamanho
+            base = corte
+
+        if fim:
+            return
+
+
+class _CopiaReiniciada(Exception):
+    """Cópia em lotes reiniciada vezes demais por gravações concorrentes"""
+
+
+def _copiar_banco(origem: str, destino: str, paginas: int = PAGINAS_POR_PASSO):
+    """Cópia consistente de um banco SQLite em uso (API de backup online)
+
+    A cópia é feita em lotes de páginas, liberando o banco entre um passo e
+    outro. Se outra conexão grava no meio, o SQLite reinicia a cópia; após
+    REINICIOS_MAX reinícios ela é refeita num passo único, que em modo WAL
+    lê um retrato consistente sem bloquear as gravações.
+    """
+    fonte = sqlite3.connect(origem, timeout=10)
+    copia = sqlite3.connect(destino)
+    restantes = [None, 0]  # restantes no passo anterior, reinícios
+
+    def progresso(status, restante, total):
+        if restantes[0] is not None and restante > restantes[0]:
+            restantes[1] += 1
+            if restantes[1] > REINICIOS_MAX:
+                raise _CopiaReiniciada()
+        restantes[0] = restante
+
+    try:
+        try:
+            fonte.backup(copia, pages=paginas, progress=progresso, sleep=0.001)
+        except _CopiaReiniciada:
+            logging.info(f"Backup de {origem}: gravações contínuas, cópia em passo único")
+            fonte.backup(copia)
+    finally:
+        copia.close()
+        fonte.close()
+
+
+class RepositorioBackups:
+    """Repositório de backups com blocos endereçados pelo hash"""
+
+    def __init__(self, diretorio: str = "backups", nivel_compressao: int = 3):
+        self.diretorio = Path(diretorio)
+        self.nivel_compressao = nivel_compressao
+        self.dir_blocos = self.diretorio / "blocos"
+        self.dir_pontos = self.diretorio / "pontos"
+        self.dir_blocos.mkdir(parents=True, exist_ok=True)
+        self.dir_pontos.mkdir(parents=True, exist_ok=True)
+        # Criação e poda exclusivas: a poda não apaga blocos que um backup em andamento reaproveitou
+        self.trava = TravaArquivo(str(self.diretorio / "repositorio.lock"), tempo_limite=TEMPO_LIMITE_REPOSITORIO)
+
+    # ------------------------------------------------------------ blocos
+
+    def _caminho_bloco(self, hash_bloco: str) -> Path:
+        return self.dir_blocos / hash_bloco[:2] / hash_bloco
+
+    def _guardar_bloco(self, bloco: bytes, estatisticas: Dict[str, int]) -> str:
+        hash_bloco = hashlib.sha256(bloco).hexdigest()
+        caminho = self._caminho_bloco(hash_bloco)
+        if caminho.exists():
+            estatisticas["reaproveitados"] += 1
+            return hash_bloco
+
+        caminho.parent.mkdir(exist_ok=True)
+        comprimido = zlib.compress(bloco, self.nivel_compressao)
+        with tempfile.NamedTemporaryFile("wb", dir=caminho.parent, delete=False) as tmp:
+            tmp.write(comprimido)
+            temporario = tmp.name
+        os.replace(temporario, caminho)
+        estatisticas["novos"] += 1
+        estatisticas["bytes_gravados"] += len(comprimido)
+        return hash_bloco
+
+    def _ler_bloco(self, hash_bloco: str) -> bytes:
+        try:
+            with open(self._caminho_bloco(hash_bloco), "rb") as f:
+                bloco = zlib.decompress(f.read())
+        except (OSError, zlib.error) as e:
+            raise ErroBackup(f"Bloco {hash_bloco[:12]} ilegível: {e}")
+        if hashlib.sha256(bloco).hexdigest() != hash_bloco:
+            raise ErroBackup(f"Bloco {hash_bloco[:12]} corrompido")
+        return bloco
+
+    def _guardar_arquivo(self, caminho: str, estatisticas: Dict[str, int]) -> Dict[str, Any]:
+        """Divide o arquivo em blocos e guarda os que ainda não existem"""
+        hash_arquivo = hashlib.sha256()
+        blocos = []
+        tamanho = 0
+        with open(caminho, "rb") as f:
+            for bloco in dividir_blocos(f):
+                hash_arquivo.update(bloco)
+                blocos.append([self._guardar_bloco(bloco, estatisticas), len(bloco)])
+                tamanho += len(bloco)
+        return {"tamanho": tamanho, "sha256": hash_arquivo.hexdigest(), "blocos": blocos}
+
+    # ------------------------------------------------------------ pontos
+
+    def pontos(self) -> List[str]:
+        """Pontos de backup existentes, do mais antigo para o mais recente"""
+        return sorted(caminho.stem for caminho in self.dir_pontos.glob("*.json"))
+
+    def manifesto(self, ponto: str) -> Dict[str, Any]:
+        try:
+            with open(self.dir_pontos / f"{ponto}.json", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise ErroBackup(f"Ponto de backup {ponto} indisponível: {e}")
+
+    def criar(self, origem: str = ".", arquivos: Optional[List[str]] = None,
+              bancos: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Cria um ponto de backup dos arquivos e bancos (caminhos relativos à origem)
+
+        O arquivo de dados, os journals e a auditoria são copiados sob a trava
+        do arquivo de dados (as instâncias do sistema gravam sob ela), formando
+        um conjunto consistente, e divididos em blocos a partir das cópias.
+
+        Returns:
+            Manifesto gravado, com estatísticas da execução
+        """
+        with self.trava:
+            return self._criar(origem, arquivos, bancos)
+
+    def _criar(self, origem: str, arquivos: Optional[List[str]], bancos: Optional[List[str]]) -> Dict[str, Any]:
+        """Cria o ponto de backup (com a trava do repositório obtida)"""
+        inicio = time.perf_counter()
+        origem = Path(origem)
+        if arquivos is None:
+            arquivos = [nome for nome in ARQUIVOS_PADRAO if (origem / nome).is_file()]
+            for diretorio in DIRETORIOS_PADRAO:
+                if (origem / diretorio).is_dir():
+                    arquivos += sorted(caminho.relative_to(origem).as_posix()
+                                       for caminho in (origem / diretorio).iterdir() if caminho.is_file())
+        if bancos is None:
+            bancos = [nome for nome in BANCOS_PADRAO if (origem / nome).is_file()]
+
+        estatisticas = {"novos": 0, "reaproveitados": 0, "bytes_gravados": 0}
+        conteudo = {}
+        with tempfile.TemporaryDirectory(dir=self.diretorio) as temporario:
+            caminhos = {nome: str(origem / nome) for nome in arquivos}
+            travados = [nome for nome in arquivos if nome.startswith(PREFIXOS_TRAVADOS)]
+            if travados:
+                with TravaArquivo(str(origem / TRAVA_DADOS)):
+                    for numero, nome in enumerate(travados):
+                        copia = os.path.join(temporario, str(numero))
+                        try:
+                            shutil.copyfile(caminhos[nome], copia)
+                            caminhos[nome] = copia
+                        except FileNotFoundError:
+                            # Ausente: o aviso sai ao dividir em blocos
+                            pass
+
+            for nome in arquivos:
+                try:
+                    conteudo[nome] = self._guardar_arquivo(caminhos[nome], estatisticas)
+                except FileNotFoundError:
+                    # Arquivo rotacionado/removido pelo sistema durante o backup
+                    logging.warning(f"Backup: {nome} não encontrado")
+        for nome in bancos:
+            with tempfile.TemporaryDirectory(dir=self.diretorio) as temporario:
+                copia = os.path.join(temporario, "copia.db")
+                _copiar_banco(str(origem / nome), copia)
+                conteudo[nome] = self._guardar_arquivo(copia, estatisticas)
+                conteudo[nome]["sqlite"] = True
+
+        agora = datetime.now()
+        ponto = agora.strftime("%Y%m%d-%H%M%S")
+        sequencia = 1
+        while (self.dir_pontos / f"{ponto}.json").exists():
+            sequencia += 1
+            ponto = f"{agora.strftime('%Y%m%d-%H%M%S')}-{sequencia}"
+        manifesto = {
+            "ponto": ponto,
+            "criado_em": agora.isoformat(timespec="seconds"),
+            "arquivos": conteudo,
+            "estatisticas": {**estatisticas, "segundos": round(time.perf_counter() - inicio, 3)},
+        }
+        caminho = self.dir_pontos / f"{ponto}.json"
+        with tempfile.NamedTemporaryFile("w", dir=self.dir_pontos, delete=False, encoding="utf-8") as tmp:
+            json.dump(manifesto, tmp, ensure_ascii=False)
+            temporario = tmp.name
+        os.replace(temporario, caminho)
+        logging.info(f"Backup {ponto}: {estatisticas['novos']} blocos novos, "
+                     f"{estatisticas['reaproveitados']} reaproveitados")
+        return manifesto
+
+    def restaurar(self, ponto: str, destino: str, arquivos: Optional[List[str]] = None) -> List[str]:
+        """Recria os arquivos do ponto de backup no diretório de destino
+
+        Cada arquivo é montado num temporário e conferido pelo SHA-256 antes
+        de substituir o arquivo de destino.
+
+        Returns:
+            Arquivos restaurados
+        """
+        manifesto = self.manifesto(ponto)
+        destino = Path(destino)
+        restaurados = []
+        for nome, info in manifesto["arquivos"].items():
+            if arquivos and nome not in arquivos:
+                continue
+            caminho = destino / nome
+            caminho.parent.mkdir(parents=True, exist_ok=True)
+            hash_arquivo = hashlib.sha256()
+            with tempfile.NamedTemporaryFile("wb", dir=caminho.parent, delete=False) as tmp:
+                temporario = tmp.name
+                try:
+                    for hash_bloco, _ in info["blocos"]:
+                        bloco = self._ler_bloco(hash_bloco)
+                        hash_arquivo.update(bloco)
+                        tmp.write(bloco)
+                except ErroBackup:
+                    tmp.close()
+                    os.remove(temporario)
+                    raise
+            if hash_arquivo.hexdigest() != info["sha256"]:
+                os.remove(temporario)
+                raise ErroBackup(f"{nome}: conteúdo restaurado difere do original")
+            os.replace(temporario, caminho)
+            # WAL/SHM antigos não pertencem ao banco restaurado
+            if info.get("sqlite"):
+                for sufixo in ("-wal", "-shm"):
+                    if os.path.exists(f"{caminho}{sufixo}"):
+                        os.remove(f"{caminho}{sufixo}")
+            restaurados.append(nome)
+        return restaurados
+
+    def verificar(self, ponto: Optional[str] = None, completo: bool = False) -> List[str]:
+        """Confere os pontos de backup
+
+        Cada bloco referenciado é lido, descomprimido e conferido pelo hash e
+        pelo tamanho (uma vez, mesmo se usado por vários pontos).
+
+        Args:
+            ponto: Ponto verificado (padrão: todos)
+            completo: Também restaura os bancos SQLite num temporário e roda integrity_check
+
+        Returns:
+            Problemas encontrados (vazia se tudo estiver íntegro)
+        """
+        problemas = []
+        conferidos: Dict[str, Optional[str]] = {}
+        for nome_ponto in ([ponto] if ponto else self.pontos()):
+            try:
+                manifesto = self.manifesto(nome_ponto)
+            except ErroBackup as e:
+                problemas.append(str(e))
+                continue
+            for nome, info in manifesto["arquivos"].items():
+                for hash_bloco, tamanho in info["blocos"]:
+                    if hash_bloco not in conferidos:
+                        try:
+                            bloco = self._ler_bloco(hash_bloco)
+                            conferidos[hash_bloco] = None if len(bloco) == tamanho else \
+                                f"Bloco {hash_bloco[:12]} com tamanho divergente"
+                        except ErroBackup as e:
+                            conferidos[hash_bloco] = str(e)
+                erros = {conferidos[hash_bloco] for hash_bloco, _ in info["blocos"]} - {None}
+                if sum(tamanho for _, tamanho in info["blocos"]) != info["tamanho"]:
+                    erros.add("tamanho total divergente")
+                if erros:
+                    problemas.append(f"{nome_ponto}/{nome}: {'; '.join(sorted(erros))}")
+                elif info.get("sqlite") and completo:
+                    problema = self._verificar_banco(nome_ponto, nome)
+                    if problema:
+                        problemas.append(f"{nome_ponto}/{nome}: {problema}")
+        return problemas
+
+    def _verificar_banco(self, ponto: str, nome: str) -> Optional[str]:
+        """integrity_check do banco restaurado num diretório temporário"""
+        with tempfile.TemporaryDirectory(dir=self.diretorio) as temporario:
+            try:
+                self.restaurar(ponto, temporario, [nome])
+            except ErroBackup as e:
+                return str(e)
+            conn = sqlite3.connect(os.path.join(temporario, nome))
+            try:
+                resultado = conn.execute("PRAGMA integrity_check").fetchone()[0]
+            finally:
+                conn.close()
+        return None if resultado == "ok" else resultado
+
+    def podar(self, manter: int) -> Dict[str, int]:
+        """Mantém os 'manter' pontos mais recentes e apaga os blocos não referenciados"""
+        with self.trava:
+            pontos = self.pontos()
+            removidos = pontos[:-manter] if manter > 0 else pontos
+            for ponto in removidos:
+                (self.dir_pontos / f"{ponto}.json").unlink()
+
+            referenciados = set()
+            for ponto in self.pontos():
+                for info in self.manifesto(ponto)["arquivos"].values():
+                    referenciados.update(hash_bloco for hash_bloco, _ in info["blocos"])
+
+            blocos_apagados = 0
+            for caminho in self.dir_blocos.glob("*/*"):
+                if caminho.name not in referenciados:
+                    caminho.unlink()
+                    blocos_apagados += 1
+            if removidos:
+                logging.info(f"Backups removidos: {len(removidos)} pontos, {blocos_apagados} blocos")
+            return {"pontos": len(removidos), "blocos": blocos_apagados}
+
+    def tamanho_em_disco(self) -> int:
+        return sum(caminho.stat().st_size for caminho in self.diretorio.rglob("*") if caminho.is_file())
+
+
+def backups_max(arquivo_preferencias: str = "preferencias.json", padrao: int = 5) -> int:
+    """Quantidade de pontos de backup mantidos (preferência backups_max)"""
+    try:
+        with open(arquivo_preferencias, "r", encoding="utf-8") as f:
+            return int(json.load(f).get("backups_max", padrao))
+    except (OSError, ValueError, TypeError, AttributeError):
+        return padrao
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backups incrementais dos dados do sistema")
+    parser.add_argument("--destino", default="backups", help="Diretório dos backups")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+    criar = subcomandos.add_parser("criar", help="Cria um ponto de backup e aplica backups_max")
+    criar.add_argument("--origem", default=".", help="Diretório dos dados do sistema")
+    subcomandos.add_parser("listar", help="Lista os pontos de backup")
+    verificar = subcomandos.add_parser("verificar", help="Confere blocos e arquivos")
+    verificar.add_argument("ponto", nargs="?")
+    verificar.add_argument("--completo", action="store_true", help="Também checa a integridade dos bancos")
+    restaurar = subcomandos.add_parser("restaurar", help="Restaura um ponto num diretório")
+    restaurar.add_argument("ponto")
+    restaurar.add_argument("diretorio")
+    podar = subcomandos.add_parser("podar", help="Remove pontos antigos e blocos sem uso")
+    podar.add_argument("--manter", type=int, default=None, help="Padrão: backups_max das preferências")
+    args = parser.parse_args()
+
+    repositorio = RepositorioBackups(args.destino)
+    print("=== BACKUP DOS DADOS ===")
+
+    if args.comando == "criar":
+        manifesto = repositorio.criar(args.origem)
+        estatisticas = manifesto["estatisticas"]
+        total = sum(info["tamanho"] for info in manifesto["arquivos"].values())
+        print(f"Ponto {manifesto['ponto']}: {len(manifesto['arquivos'])} arquivos, {total / 1024 / 1024:.1f} MB")
+        print(f"Blocos novos: {estatisticas['novos']} ({estatisticas['bytes_gravados'] / 1024 / 1024:.1f} MB gravados), "
+              f"reaproveitados: {estatisticas['reaproveitados']}, {estatisticas['segundos']:.2f}s")
+        podados = repositorio.podar(backups_max(os.path.join(args.origem, "preferencias.json")))
+        if podados["pontos"]:
+            print(f"Retenção: {podados['pontos']} pontos e {podados['blocos']} blocos removidos")
+        print(f"Repositório: {repositorio.tamanho_em_disco() / 1024 / 1024:.1f} MB")
+    elif args.comando == "listar":
+        for ponto in repositorio.pontos():
+            manifesto = repositorio.manifesto(ponto)
+            total = sum(info["tamanho"] for info in manifesto["arquivos"].values())
+            print(f"{ponto}  {len(manifesto['arquivos']):3d} arquivos  {total / 1024 / 1024:8.1f} MB")
+    elif args.comando == "verificar":
+        problemas = repositorio.verificar(args.ponto, args.completo)
+        for problema in problemas:
+            print(f"  ERRO: {problema}")
+        print("Backups íntegros" if not problemas else f"{len(problemas)} problemas encontrados")
+        sys.exit(1 if problemas else 0)
+    elif args.comando == "restaurar":
+        try:
+            restaurados = repositorio.restaurar(args.ponto, args.diretorio)
+        except ErroBackup as e:
+            print(f"Restauração interrompida: {e}")
+            sys.exit(1)
+        print(f"{len(restaurados)} arquivos restaurados em {args.diretorio}")
+    elif args.comando == "podar":
+        manter = args.manter if args.manter is not None else backups_max()
+        podados = repositorio.podar(manter)
+        print(f"{podados['pontos']} pontos e {podados['blocos']} blocos removidos")
+
+
+if __name__ == "__main__":
+    main()
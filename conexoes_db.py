@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sistema CM - Gerenciador de Conexões do sistema.db
+Conexões reutilizáveis por thread, pragmas aplicados uma única vez,
+cache de comandos preparados e context manager de transação
+"""
+
+import sqlite3
+import logging
+import threading
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+
+def _fechar_conexao(conn: sqlite3.Connection):
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
+class _ConexaoDaThread:
+    """Conexão de uma thread, fechada quando a thread termina
+
+    Fica apenas no threading.local da thread dona: ao fim da thread o
+    threading.local é descartado e o finalizador fecha a conexão.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self._finalizador = weakref.finalize(self, _fechar_conexao, conn)
+
+    def fechar(self):
+        self._finalizador()
+
+
+class GerenciadorConexoes:
+    """Mantém uma conexão por thread com o banco do sistema"""
+
+    def __init__(self, caminho: Optional[str] = None, cache_comandos: int = 256,
+                 aplicar_migracoes: bool = True):
+        """
+        Inicializa o gerenciador de conexões
+
+        Args:
+            caminho: Caminho do banco (padrão: sistema.db no diretório atual)
+            cache_comandos: Quantidade de comandos preparados mantidos por conexão
+            aplicar_migracoes: Aplica as migrações pendentes na primeira conexão
+        """
+        self.caminho = caminho or str(Path.cwd() / "sistema.db")
+        self.cache_comandos = cache_comandos
+        self.aplicar_migracoes = aplicar_migracoes
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Conexões ainda abertas (referências fracas: a thread é a dona)
+        self._conexoes = weakref.WeakSet()
+        self._schema_verificado = False
+
+    def _abrir(self) -> sqlite3.Connection:
+        """Abre uma conexão com os pragmas do sistema (e as migrações, na primeira)"""
+        # check_same_thread=False permite fechar a conexão de outra thread (fechar_todas)
+        conn = sqlite3.connect(self.caminho, timeout=10, cached_statements=self.cache_comandos,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+
+        with self._lock:
+            verificar_schema = self.aplicar_migracoes and not self._schema_verificado
+            self._schema_verificado = True
+
+        if verificar_schema:
+            try:
+                from migracoes_schema import aplicar_migracoes
+                aplicar_migracoes(conn)
+            except Exception as e:
+                logging.error(f"Erro ao aplicar migrações do banco: {e}")
+        return conn
+
+    def conexao(self) -> sqlite3.Connection:
+        """Retorna a conexão da thread atual, abrindo-a na primeira chamada"""
+        dono = getattr(self._local, "dono", None)
+        if dono is not None:
+            return dono.conn
+
+        conn = self._abrir()
+        dono = _ConexaoDaThread(conn)
+        with self._lock:
+            self._conexoes.add(dono)
+
+        self._local.dono = dono
+        return conn
+
+    @contextmanager
+    def conexao_avulsa(self):
+        """Conexão própria, fechada ao fim do bloco
+
+        Para threads de vida curta (ex.: cálculo de relatórios), que não
+        devem deixar uma conexão por thread aberta.
+        """
+        conn = self._abrir()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def transacao(self):
+        """Executa o bloco em uma transação (commit ao final, rollback em erro)
+
+        Transações aninhadas usam SAVEPOINT na mesma conexão.
+        """
+        conn = self.conexao()
+
+        if conn.in_transaction:
+            nivel = getattr(self._local, "nivel", 0) + 1
+            self._local.nivel = nivel
+            conn.execute(f"SAVEPOINT sp_{nivel}")
+            try:
+                yield conn
+                conn.execute(f"RELEASE SAVEPOINT sp_{nivel}")
+            except Exception:
+                conn.execute(f"ROLLBACK TO SAVEPOINT sp_{nivel}")
+                conn.execute(f"RELEASE SAVEPOINT sp_{nivel}")
+                raise
+            finally:
+                self._local.nivel = nivel - 1
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def fechar_todas(self):
+        """Fecha todas as conexões abertas (encerramento da aplicação)"""
+        with self._lock:
+            for dono in list(self._conexoes):
+                dono.fechar()
+            self._conexoes.clear()
+        self._local = threading.local()
+
+
+_gerenciador: Optional[GerenciadorConexoes] = None
+_lock_gerenciador = threading.Lock()
+
+
+def obter_gerenciador() -> GerenciadorConexoes:
+    """Retorna o gerenciador de conexões compartilhado pela aplicação"""
+    global _gerenciador
+    if _gerenciador is None:
+        with _lock_gerenciador:
+            if _gerenciador is None:
+                _gerenciador = GerenciadorConexoes()
+    return _gerenciador
+
+
+def obter_conexao() -> sqlite3.Connection:
+    """Conexão da thread atual com o sistema.db (não deve ser fechada pelo chamador)"""
+    return obter_gerenciador().conexao()
+
+
+def transacao():
+    """Context manager de transação sobre a conexão da thread atual"""
+    return obter_gerenciador().transacao()
+
+
+def conexao_avulsa():
+    """Context manager de uma conexão própria com o sistema.db, fechada ao fim do bloco"""
+    return obter_gerenciador().conexao_avulsa()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Consultas financeiras por período no sistema.db
+Conversão de datas para o dia juliano inteiro das colunas *_jd (mantidas
+pela migração 2) e as consultas por faixa que os índices dessas colunas
+atendem, verificadas com EXPLAIN QUERY PLAN em migracoes_schema
+"""
+
+from datetime import date, datetime
+
+# Diferença entre date.toordinal() e o dia juliano (meio-dia) do SQLite
+_DESLOCAMENTO_JULIANO = 1721425
+
+
+def para_dia_juliano(data):
+    """Converte date/datetime ou texto (dd/mm/aaaa ou aaaa-mm-dd) para dia juliano inteiro"""
+    if data is None:
+        return None
+    if isinstance(data, str):
+        texto = data.strip()
+        if not texto:
+            return None
+        formato = "%d/%m/%Y" if "/" in texto[:10] else "%Y-%m-%d"
+        data = datetime.strptime(texto[:10], formato)
+    if isinstance(data, datetime):
+        data = data.date()
+    return data.toordinal() + _DESLOCAMENTO_JULIANO
+
+
+def de_dia_juliano(dia):
+    """Converte dia juliano inteiro para date"""
+    return date.fromordinal(dia - _DESLOCAMENTO_JULIANO) if dia is not None else None
+
+
+SQL_PARCELAS_VENCIDAS = """
+    SELECT id, contrato_id, numero_parcela, data_vencimento_jd, valor
+    FROM parcela_contrato
+    WHERE status = 'Pendente' AND data_vencimento_jd < ?
+    ORDER BY data_vencimento_jd
+"""
+
+SQL_PARCELAS_PAGAS_PERIODO = """
+    SELECT id, contrato_id, numero_parcela, data_pagamento_jd, valor
+    FROM parcela_contrato
+    WHERE data_pagamento_jd BETWEEN ? AND ?
+    ORDER BY data_pagamento_jd
+"""
+
+SQL_RECEITAS_PERIODO = """
+    SELECT id, data_jd, tipo_receita, descricao, valor, status, loja_id
+    FROM lancamento_receita
+    WHERE data_jd BETWEEN ? AND ?
+    ORDER BY data_jd, id
+"""
+
+SQL_RECEITAS_LOJA_PERIODO = """
+    SELECT id, data_jd, tipo_receita, descricao, valor, status, loja_id
+    FROM lancamento_receita
+    WHERE loja_id = ? AND data_jd BETWEEN ? AND ?
+    ORDER BY data_jd, id
+"""
+
+SQL_DESPESAS_PERIODO = """
+    SELECT id, data_jd, tipo_despesa, descricao, valor, status, loja_id
+    FROM lancamento_despesa
+    WHERE data_jd BETWEEN ? AND ?
+    ORDER BY data_jd, id
+"""
+
+SQL_DESPESAS_LOJA_PERIODO = """
+    SELECT id, data_jd, tipo_despesa, descricao, valor, status, loja_id
+    FROM lancamento_despesa
+    WHERE loja_id = ? AND data_jd BETWEEN ? AND ?
+    ORDER BY data_jd, id
+"""
+
+SQL_FLUXO_CAIXA_PERIODO = """
+    SELECT data_jd, saldo_inicial, receitas, despesas, saldo_final
+    FROM fluxo_caixa
+    WHERE loja_id = ? AND data_jd BETWEEN ? AND ?
+    ORDER BY data_jd
+"""
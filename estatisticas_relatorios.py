@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sistema CM - Estatísticas dos Relatórios
+Acumulador de passagem única (contagem, soma, média, variância, mínimo e
+máximo com o período correspondente) e esboço de quantis mesclável para o
+ticket das vendas, alimentados durante o agrupamento
+"""
+
+import math
+from typing import Any, Dict, Optional
+
+# Erro relativo do esboço do ticket; os histogramas do resumo diário de
+# vendas usam os mesmos buckets para poderem ser mesclados nos relatórios
+ERRO_RELATIVO_TICKET = 0.01
+
+
+class EsbocoQuantis:
+    """Esboço de quantis com erro relativo limitado (buckets logarítmicos)
+
+    Cada valor positivo cai no bucket ceil(log(valor) / log(gama)); o valor
+    estimado do bucket difere do real em no máximo erro_relativo. Dois
+    esboços com o mesmo erro_relativo são mesclados somando os buckets.
+    """
+
+    def __init__(self, erro_relativo: float = ERRO_RELATIVO_TICKET):
+        self.erro_relativo = erro_relativo
+        self._gama = (1 + erro_relativo) / (1 - erro_relativo)
+        self._log_gama = math.log(self._gama)
+        self._buckets: Dict[int, float] = {}
+        # Valores nulos ou negativos (ex.: estornos) contam como zero
+        self._zeros = 0.0
+        self.peso = 0.0
+
+    def indice(self, valor: float) -> Optional[int]:
+        """Bucket do valor (None para valores nulos ou negativos)"""
+        return math.ceil(math.log(valor) / self._log_gama) if valor > 0 else None
+
+    def adicionar(self, valor: float, peso: float = 1):
+        """Inclui um valor (com peso = quantidade de ocorrências)"""
+        self.adicionar_buckets({self.indice(valor): peso})
+
+    def adicionar_buckets(self, buckets: Dict[Optional[int], float]):
+        """Inclui contagens já distribuídas por bucket (calculados com o mesmo erro relativo)"""
+        for indice, peso in buckets.items():
+            self.peso += peso
+            if indice is None:
+                self._zeros += peso
+            else:
+                self._buckets[indice] = self._buckets.get(indice, 0) + peso
+
+    def mesclar(self, outro: "EsbocoQuantis") -> "EsbocoQuantis":
+        """Incorpora os buckets de outro esboço (mesmo erro relativo)"""
+        if outro.erro_relativo != self.erro_relativo:
+            raise ValueError("Esboços com erros relativos diferentes não podem ser mesclados")
+        for indice, peso in outro._buckets.items():
+            self._buckets[indice] = self._buckets.get(indice, 0) + peso
+        self._zeros += outro._zeros
+        self.peso += outro.peso
+        return self
+
+    def quantil(self, q: float) -> Optional[float]:
+        """Valor aproximado do quantil q (0 a 1); None se vazio"""
+        if self.peso <= 0:
+            return None
+        alvo = q * self.peso
+        acumulado = self._zeros
+        if acumulado > alvo:
+            return 0.0
+        for indice in sorted(self._buckets):
+            acumulado += self._buckets[indice]
+            if acumulado > alvo:
+                return 2 * self._gama ** indice / (self._gama + 1)
+        return 2 * self._gama ** max(self._buckets) / (self._gama + 1) if self._buckets else 0.0
+
+
+class EstatisticasRelatorio:
+    """Estatísticas dos valores por período e do ticket das vendas
+
+    Os valores por período entram com adicionar() (Welford: média e
+    variância numa passagem); os tickets de cada venda entram no esboço de
+    quantis. Duas instâncias (ex.: lojas diferentes) são combinadas com
+    mesclar().
+    """
+
+    def __init__(self, erro_relativo: float = ERRO_RELATIVO_TICKET):
+        self.periodos = 0
+        self.soma = 0.0
+        self.media = 0.0
+        self._m2 = 0.0
+        self.minimo: Optional[float] = None
+        self.chave_minimo: Any = None
+        self.maximo: Optional[float] = None
+        self.chave_maximo: Any = None
+        self.registros = 0
+        self.tickets = EsbocoQuantis(erro_relativo)
+
+    def adicionar(self, chave, valor: float, registros: int = 0):
+        """Inclui o valor de um período (chave = rótulo do período)"""
+        self.periodos += 1
+        self.soma += valor
+        self.registros += registros
+        delta = valor - self.media
+        self.media += delta / self.periodos
+        self._m2 += delta * (valor - self.media)
+
+        if self.minimo is None or valor < self.minimo:
+            self.minimo, self.chave_minimo = valor, chave
+        if self.maximo is None or valor > self.maximo:
+            self.maximo, self.chave_maximo = valor, chave
+
+    def mesclar(self, outra: "EstatisticasRelatorio") -> "EstatisticasRelatorio":
+        """Incorpora outra instância (fórmula paralela de Chan para a variância)"""
+        if outra.periodos:
+            total = self.periodos + outra.periodos
+            delta = outra.media - self.media
+            self._m2 += outra._m2 + delta * delta * self.periodos * outra.periodos / total
+            self.media += delta * outra.periodos / total
+            self.periodos = total
+            self.soma += outra.soma
+
+            if self.minimo is None or outra.minimo < self.minimo:
+                self.minimo, self.chave_minimo = outra.minimo, outra.chave_minimo
+            if self.maximo is None or outra.maximo > self.maximo:
+                self.maximo, self.chave_maximo = outra.maximo, outra.chave_maximo
+
+        self.registros += outra.registros
+        self.tickets.mesclar(outra.tickets)
+        return self
+
+    @property
+    def variancia(self) -> float:
+        """Variância amostral dos valores por período"""
+        return self._m2 / (self.periodos - 1) if self.periodos > 1 else 0.0
+
+    @property
+    def desvio_padrao(self) -> float:
+        return math.sqrt(self.variancia)
+
+    @property
+    def ticket_medio(self) -> float:
+        return self.soma / self.registros if self.registros > 0 else 0.0
+
+    def percentil_ticket(self, percentil: float) -> Optional[float]:
+        """Percentil aproximado (0 a 100) do ticket das vendas (None sem tickets)"""
+        return self.tickets.quantil(percentil / 100)
+
+    @classmethod
+    def de_periodos(cls, dados_agrupados: Dict[str, Dict[str, Any]]) -> "EstatisticasRelatorio":
+        """Estatísticas a partir de dados já agrupados
+
+        Sem os tickets de cada venda o esboço fica vazio: percentis calculados
+        sobre médias dos períodos não representariam as vendas.
+        """
+        estatisticas = cls()
+        for periodo, dados in dados_agrupados.items():
+            estatisticas.adicionar(periodo, dados['valor_total'], dados['quantidade'])
+        return estatisticas
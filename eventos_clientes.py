@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Eventos de clientes no sistema.db (tabela evento_cliente, migração 3)
+Cadastros, contratos, pagamentos, estornos e contatos indexados por data
+(dia juliano) e loja, consultados por faixa no relatório de clientes
+"""
+
+import re
+import logging
+from datetime import date
+
+from consultas_financeiras import para_dia_juliano
+
+TIPOS_EVENTO = ("cadastro", "contrato", "pagamento", "estorno", "contato")
+
+# Loja gravada no cadastro como "Nome (ID: 4)"
+_ID_LOJA = re.compile(r"\(ID:\s*(\d+)\)")
+
+SQL_INSERIR_EVENTO = """
+    INSERT INTO evento_cliente (tipo, data_jd, cliente_id, cliente_chave, loja_id, valor, referencia_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+SQL_EVENTOS_POR_DIA = """
+    SELECT data_jd, COUNT(*), COALESCE(SUM(valor), 0)
+    FROM evento_cliente
+    WHERE data_jd BETWEEN ? AND ?
+    GROUP BY data_jd
+    ORDER BY data_jd
+"""
+
+SQL_EVENTOS_LOJA_POR_DIA = """
+    SELECT data_jd, COUNT(*), COALESCE(SUM(valor), 0)
+    FROM evento_cliente
+    WHERE loja_id = ? AND data_jd BETWEEN ? AND ?
+    GROUP BY data_jd
+    ORDER BY data_jd
+"""
+
+
+def loja_do_cadastro(cliente):
+    """ID da loja do cadastro (loja_id ou o "(ID: n)" de loja_cadastro)"""
+    loja_id = getattr(cliente, "loja_id", None)
+    if loja_id:
+        return int(loja_id)
+    encontrado = _ID_LOJA.search(getattr(cliente, "loja_cadastro", "") or "")
+    return int(encontrado.group(1)) if encontrado else None
+
+
+def registrar_evento(conn, tipo, data=None, cliente_id=None, cliente_chave=None, loja_id=None,
+                     valor=None, referencia_id=None):
+    """Grava um evento de cliente (data padrão: hoje)
+
+    Eventos de contratos, parcelas e contatos são gravados por triggers; esta
+    função cobre os caminhos de escrita fora do sistema.db (ex.: cadastros do
+    GerenciadorDados).
+    """
+    if tipo not in TIPOS_EVENTO:
+        raise ValueError(f"Tipo de evento inválido: {tipo}")
+    conn.execute(SQL_INSERIR_EVENTO, (tipo, para_dia_juliano(data or date.today()), cliente_id,
+                                      cliente_chave, loja_id, valor, referencia_id))
+
+
+def eventos_por_dia(conn, inicio, fim, loja_id=None):
+    """Quantidade e soma dos valores dos eventos por dia no período (inclusive)
+
+    Returns:
+        list: Tuplas (dia juliano, quantidade, valor)
+    """
+    cur = conn.cursor()
+    faixa = (para_dia_juliano(inicio), para_dia_juliano(fim))
+    if loja_id is None:
+        cur.execute(SQL_EVENTOS_POR_DIA, faixa)
+    else:
+        cur.execute(SQL_EVENTOS_LOJA_POR_DIA, (loja_id,) + faixa)
+    return cur.fetchall()
+
+
+def versao_eventos(conn):
+    """Maior id de evento_cliente: muda a cada evento gravado (a tabela só recebe inserções)"""
+    cur = conn.cursor()
+    cur.execute("SELECT COALESCE(MAX(id), 0) FROM evento_cliente")
+    return cur.fetchone()[0]
+
+
+def registrar_cadastro(conexoes, cliente):
+    """Registra o cadastro de um cliente do GerenciadorDados no sistema.db
+
+    Args:
+        conexoes: GerenciadorConexoes do sistema.db configurado
+        cliente: Cadastro recém-adicionado
+    """
+    try:
+        with conexoes.transacao() as conn:
+            registrar_evento(conn, "cadastro", cliente_chave=cliente.id, loja_id=loja_do_cadastro(cliente))
+    except Exception as e:
+        # O cadastro já foi gravado; sem o evento, só o relatório de clientes fica incompleto
+        logging.error(f"Erro ao registrar evento de cadastro do cliente {cliente.id}: {e}")
+
+
+def importar_cadastros(conexoes, origem, cadastros):
+    """Importa uma única vez os cadastros anteriores aos eventos de cliente
+
+    Cadastros já registrados (cliente_chave) são ignorados. A data do evento
+    é a da entrada "Cliente adicionado" da auditoria; cadastros sem essa
+    entrada ficam de fora, pois não há como saber quando foram feitos.
+
+    Args:
+        conexoes: GerenciadorConexoes do sistema.db configurado
+        origem: Identificação do arquivo de dados (a importação é feita uma vez por origem)
+        cadastros: Iterável de (id, loja_cadastro, data do cadastro ou None)
+
+    Returns:
+        int: Eventos de cadastro importados (None se a origem já havia sido importada)
+    """
+    with conexoes.transacao() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT 1 FROM evento_cliente_importacao WHERE origem = ?", (origem,))
+        if cur.fetchone():
+            return None
+
+        cur.execute("SELECT cliente_chave FROM evento_cliente WHERE tipo = 'cadastro' AND cliente_chave IS NOT NULL")
+        registrados = {linha[0] for linha in cur.fetchall()}
+
+        eventos = []
+        sem_data = 0
+        for cliente_id, loja_cadastro, data in cadastros:
+            if not cliente_id or cliente_id in registrados:
+                continue
+            if data is None:
+                sem_data += 1
+                continue
+            registrados.add(cliente_id)
+            loja_id = _ID_LOJA.search(loja_cadastro or "")
+            eventos.append(("cadastro", para_dia_juliano(data), None, cliente_id,
+                            int(loja_id.group(1)) if loja_id else None, None, None))
+
+        cur.executemany(SQL_INSERIR_EVENTO, eventos)
+        cur.execute("INSERT INTO evento_cliente_importacao (origem, cadastros) VALUES (?, ?)",
+                    (origem, len(eventos)))
+
+    if sem_data:
+        logging.warning(f"{sem_data} cadastros sem data na auditoria não entraram nos eventos de clientes")
+    return len(eventos)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sistema CM - Exportação de Relatórios
+Exportação tipada para XLSX e CSV (números e datas como valores, não como
+texto formatado), com escrita em fluxo: as linhas de detalhe são lidas da
+origem em lotes e gravadas uma a uma, sem montar a planilha em memória
+"""
+
+import csv
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+FORMATO_TIMESTAMP = "%Y-%m-%d %H:%M:%S"
+
+# Tipos de coluna (definem o formato da célula no XLSX)
+TEXTO = "texto"
+INTEIRO = "inteiro"
+MOEDA = "moeda"
+DATA = "data"
+DATA_HORA = "data_hora"
+
+_FORMATOS_XLSX = {
+    MOEDA: '"R$" #,##0.00',
+    DATA: "DD/MM/YYYY",
+    DATA_HORA: "DD/MM/YYYY HH:MM:SS",
+}
+_LARGURAS_XLSX = {TEXTO: 30, INTEIRO: 12, MOEDA: 16, DATA: 12, DATA_HORA: 20}
+
+
+@dataclass
+class Planilha:
+    """Planilha exportada: colunas (nome, tipo) e linhas produzidas sob demanda"""
+    nome: str
+    colunas: List[Tuple[str, str]]
+    linhas: Iterable[tuple]
+
+
+def _timestamp(texto):
+    """Converte o timestamp gravado em datetime (mantém o texto se inválido)"""
+    try:
+        return datetime.strptime(texto, FORMATO_TIMESTAMP)
+    except (TypeError, ValueError):
+        return texto
+
+
+def _moeda(valor) -> Decimal:
+    """Valor monetário com duas casas"""
+    if isinstance(valor, Decimal):
+        return valor.quantize(Decimal("0.01"))
+    return Decimal(f"{float(valor or 0):.2f}")
+
+
+def registros_periodo(gerenciador_dados, colecao: str, inicio: date, fim: date) -> Iterator[Any]:
+    """Registros da coleção (vendas ou pagamentos) com data entre inicio e fim, inclusive"""
+    limite_inicio = inicio.isoformat()
+    limite_fim = (fim + timedelta(days=1)).isoformat()
+
+    armazenamento = getattr(gerenciador_dados, "armazenamento", None)
+    if armazenamento:
+        # Backend SQLite: faixa pelo índice de timestamp, lida em lotes
+        yield from armazenamento.iterar_periodo(colecao, limite_inicio, limite_fim)
+        return
+
+    registros = gerenciador_dados.dados.get(colecao, [])
+    if hasattr(registros, "iterar_onde"):
+        # Registros sob demanda: só os do período são convertidos em objetos
+        yield from registros.iterar_onde("timestamp", lambda ts: limite_inicio <= (ts or "") < limite_fim)
+        return
+
+    for registro in registros:
+        timestamp = registro.timestamp or ""
+        if limite_inicio <= timestamp < limite_fim:
+            yield registro
+
+
+def planilha_resumo(dados_agrupados: Dict[str, Dict[str, Any]]) -> Planilha:
+    """Linhas agrupadas por período, como exibidas na tabela do relatório"""
+    def linhas():
+        for periodo, dados in dados_agrupados.items():
+            valor_total = _moeda(dados['valor_total'])
+            quantidade = dados['quantidade']
+            ticket_medio = _moeda(valor_total / quantidade) if quantidade > 0 else Decimal("0.00")
+            yield (periodo, dados.get('inicio'), quantidade, valor_total, ticket_medio)
+
+    return Planilha("Resumo", [("Período", TEXTO), ("Início", DATA), ("Quantidade", INTEIRO),
+                               ("Valor Total", MOEDA), ("Ticket Médio", MOEDA)], linhas())
+
+
+def planilha_vendas(gerenciador_dados, inicio: date, fim: date) -> Planilha:
+    """Vendas do período, uma linha por venda"""
+    linhas = ((_timestamp(venda.timestamp), venda.codigo_loja, venda.produto,
+               venda.quantidade, _moeda(venda.total))
+              for venda in registros_periodo(gerenciador_dados, "historico_vendas", inicio, fim))
+    return Planilha("Vendas", [("Data", DATA_HORA), ("Loja", TEXTO), ("Produto", TEXTO),
+                               ("Quantidade", INTEIRO), ("Total", MOEDA)], linhas)
+
+
+def planilha_pagamentos(gerenciador_dados, inicio: date, fim: date) -> Planilha:
+    """Pagamentos (lançamentos) do período"""
+    linhas = ((_timestamp(pagamento.timestamp), pagamento.descricao, pagamento.tipo, _moeda(pagamento.valor))
+              for pagamento in registros_periodo(gerenciador_dados, "pagamentos", inicio, fim))
+    return Planilha("Pagamentos", [("Data", DATA_HORA), ("Descrição", TEXTO), ("Tipo", TEXTO),
+                                   ("Valor", MOEDA)], linhas)
+
+
+def planilha_clientes(gerenciador_dados) -> Planilha:
+    """Cadastros de clientes"""
+    linhas = ((cliente.nome, cliente.cpf, cliente.cidade, cliente.estado, cliente.loja_cadastro,
+               _moeda(cliente.renda_mensal), _moeda(cliente.limite_credito))
+              for cliente in gerenciador_dados.dados.get('cadastros', []))
+    return Planilha("Clientes", [("Nome", TEXTO), ("CPF", TEXTO), ("Cidade", TEXTO), ("Estado", TEXTO),
+                                 ("Loja", TEXTO), ("Renda Mensal", MOEDA), ("Limite de Crédito", MOEDA)], linhas)
+
+
+def planilhas_relatorio(gerenciador_dados, tipo_relatorio: str, inicio: date, fim: date,
+                        dados_agrupados: Dict[str, Dict[str, Any]], detalhes: bool = False) -> List[Planilha]:
+    """Planilhas exportadas: resumo e, opcionalmente, as linhas de detalhe"""
+    planilhas = [planilha_resumo(dados_agrupados)]
+    if detalhes:
+        if tipo_relatorio == "vendas":
+            planilhas.append(planilha_vendas(gerenciador_dados, inicio, fim))
+            planilhas.append(planilha_pagamentos(gerenciador_dados, inicio, fim))
+        else:
+            planilhas.append(planilha_clientes(gerenciador_dados))
+    return planilhas
+
+
+def exportar_xlsx(caminho: str, informacoes: Dict[str, Any], planilhas: List[Planilha]) -> int:
+    """Grava o arquivo XLSX em modo write-only (memória constante)
+
+    Returns:
+        int: Quantidade de linhas de dados gravadas
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+
+    livro = Workbook(write_only=True)
+    negrito = Font(bold=True)
+
+    folha = livro.create_sheet("Informações")
+    folha.column_dimensions["A"].width = 22
+    folha.column_dimensions["B"].width = 40
+    for chave, valor in informacoes.items():
+        rotulo = WriteOnlyCell(folha, value=chave)
+        rotulo.font = negrito
+        folha.append([rotulo, valor])
+
+    total = 0
+    for planilha in planilhas:
+        folha = livro.create_sheet(planilha.nome)
+        for numero, (_, tipo) in enumerate(planilha.colunas):
+            folha.column_dimensions[get_column_letter(numero + 1)].width = _LARGURAS_XLSX[tipo]
+
+        cabecalho = []
+        for nome, _ in planilha.colunas:
+            celula = WriteOnlyCell(folha, value=nome)
+            celula.font = negrito
+            cabecalho.append(celula)
+        folha.append(cabecalho)
+
+        # Células formatadas só nas colunas de moeda e data
+        formatos = [_FORMATOS_XLSX.get(tipo) for _, tipo in planilha.colunas]
+        for linha in planilha.linhas:
+            valores = []
+            for valor, formato in zip(linha, formatos):
+                if formato and valor is not None and not isinstance(valor, str):
+                    valor = WriteOnlyCell(folha, value=valor)
+                    valor.number_format = formato
+                valores.append(valor)
+            folha.append(valores)
+            total += 1
+
+    livro.save(caminho)
+    return total
+
+
+def _valor_csv(valor):
+    """Valor gravado no CSV (datas em ISO, decimais com ponto)"""
+    if isinstance(valor, datetime):
+        return valor.strftime(FORMATO_TIMESTAMP)
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return "" if valor is None else valor
+
+
+def exportar_csv(caminho: str, planilhas: List[Planilha]) -> List[str]:
+    """Grava um CSV por planilha (o resumo no caminho escolhido, os detalhes ao lado)
+
+    Returns:
+        List[str]: Arquivos gravados
+    """
+    destino = Path(caminho)
+    arquivos = []
+    for numero, planilha in enumerate(planilhas):
+        arquivo = destino if numero == 0 else destino.with_name(
+            f"{destino.stem}_{planilha.nome.lower()}{destino.suffix}")
+        # utf-8-sig: o Excel reconhece a codificação pelo BOM
+        with open(arquivo, "w", newline="", encoding="utf-8-sig") as f:
+            escritor = csv.writer(f)
+            escritor.writerow([nome for nome, _ in planilha.colunas])
+            for linha in planilha.linhas:
+                escritor.writerow([_valor_csv(valor) for valor in linha])
+        arquivos.append(str(arquivo))
+    return arquivos
+
+
+def exportar_relatorio(caminho: str, informacoes: Dict[str, Any], planilhas: List[Planilha]) -> List[str]:
+    """Exporta as planilhas no formato indicado pela extensão (.csv ou .xlsx)
+
+    Returns:
+        List[str]: Arquivos gravados
+    """
+    if Path(caminho).suffix.lower() == ".csv":
+        arquivos = exportar_csv(caminho, planilhas)
+    else:
+        exportar_xlsx(caminho, informacoes, planilhas)
+        arquivos = [caminho]
+    logging.info(f"Relatório exportado: {', '.join(arquivos)}")
+    return arquivos
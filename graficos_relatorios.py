@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sistema CM - Gráficos dos Relatórios
+Desenho dos gráficos sobre eixos já existentes, compartilhado pela janela de
+relatórios (Tk) e pela exportação em PDF
+
+Séries longas (ex.: vários anos agrupados por dia) usam eixo de datas: as
+linhas são reduzidas com LTTB a um orçamento de pontos e as barras são
+reagrupadas em períodos maiores, mantendo o tempo de desenho limitado.
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+import matplotlib.dates as mdates
+import numpy as np
+
+from agregacao_relatorios import inicio_periodo
+
+# Orçamento de pontos das linhas e máximo de barras (e de rótulos) por gráfico
+LIMITE_PONTOS = 500
+LIMITE_BARRAS = 60
+
+# Reagrupamentos possíveis das barras, do mais fino ao mais grosso (duração em dias)
+_REAGRUPAMENTOS = (("semanal", "semana", 7), ("mensal", "mês", 30), ("anual", "ano", 365))
+
+
+def lttb(x: np.ndarray, y: np.ndarray, limite: int) -> np.ndarray:
+    """Índices dos pontos mantidos pelo Largest-Triangle-Three-Buckets
+
+    Mantém o primeiro e o último ponto e, de cada um dos limite - 2 baldes
+    intermediários, o ponto que forma o maior triângulo com o ponto escolhido
+    no balde anterior e a média do balde seguinte (preserva picos e vales).
+    """
+    n = len(x)
+    if limite >= n or limite < 3:
+        return np.arange(n)
+
+    bordas = np.linspace(1, n - 1, limite - 1).astype(np.int64)
+    indices = np.empty(limite, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    anterior = 0
+    for balde in range(limite - 2):
+        inicio, fim = bordas[balde], bordas[balde + 1]
+        proximo_fim = bordas[balde + 2] if balde + 2 < len(bordas) else n
+        media_x = x[fim:proximo_fim].mean()
+        media_y = y[fim:proximo_fim].mean()
+
+        areas = np.abs((x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+                       - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior]))
+        anterior = inicio + int(areas.argmax())
+        indices[balde + 1] = anterior
+    return indices
+
+
+def _serie_datas(dados_agrupados: Dict[str, Dict[str, Any]]) -> Optional[np.ndarray]:
+    """Inícios dos períodos (datetime64[D]) ou None se os dados não os têm"""
+    if not all('inicio' in dados for dados in dados_agrupados.values()):
+        return None
+    return np.array([dados['inicio'] for dados in dados_agrupados.values()], dtype="datetime64[D]")
+
+
+def reagrupar_barras(datas: np.ndarray, valores: np.ndarray,
+                     limite: int = LIMITE_BARRAS) -> Tuple[np.ndarray, np.ndarray, str, int]:
+    """Soma os valores no período mais fino que cabe no limite de barras
+
+    Returns:
+        (inícios, somas, nome do período, duração em dias)
+    """
+    for agrupamento, nome, duracao in _REAGRUPAMENTOS:
+        inicios = inicio_periodo(datas, agrupamento)
+        unicos, posicoes = np.unique(inicios, return_inverse=True)
+        if len(unicos) <= limite or agrupamento == "anual":
+            return unicos, np.bincount(posicoes, weights=valores), nome, duracao
+
+
+def _eixo_datas(ax):
+    """Eixo x com datas em formato conciso e quantidade de marcas automática"""
+    localizador = mdates.AutoDateLocator()
+    ax.xaxis.set_major_locator(localizador)
+    ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(localizador))
+
+
+def desenhar_grafico(ax, dados_agrupados: Dict[str, Dict[str, Any]], tipo_grafico: str,
+                     titulo: str, rotulo_valor: str = "Valor Total (R$)",
+                     limite_pontos: int = LIMITE_PONTOS, limite_barras: int = LIMITE_BARRAS):
+    """Desenha o gráfico principal (barras, linhas ou pizza) dos valores por período
+
+    Linhas usam eixo de datas, reduzidas com LTTB acima de limite_pontos;
+    acima de limite_barras, as barras são somadas em semanas, meses ou anos.
+    """
+    # Preparar dados
+    labels = list(dados_agrupados.keys())
+    valores = [dados['valor_total'] for dados in dados_agrupados.values()]
+    datas = _serie_datas(dados_agrupados) if tipo_grafico != "pizza" else None
+
+    if tipo_grafico == "barras" and datas is not None and len(labels) > limite_barras:
+        inicios, somas, nome, duracao = reagrupar_barras(datas, np.asarray(valores, dtype=np.float64),
+                                                         limite_barras)
+        ax.bar(inicios, somas, width=duracao * 0.8, align='edge')
+        _eixo_datas(ax)
+        titulo = f"{titulo} (somado por {nome})"
+
+    elif tipo_grafico == "barras":
+        ax.bar(labels, valores)
+        ax.tick_params(axis='x', labelrotation=45)
+
+    elif tipo_grafico == "linhas" and datas is not None:
+        y = np.asarray(valores, dtype=np.float64)
+        mantidos = lttb(datas.astype(np.int64).astype(np.float64), y, limite_pontos)
+        ax.plot(datas[mantidos], y[mantidos], marker='o' if len(mantidos) <= limite_barras else None)
+        _eixo_datas(ax)
+
+    elif tipo_grafico == "linhas":
+        ax.plot(labels, valores, marker='o')
+        ax.tick_params(axis='x', labelrotation=45)
+
+    elif tipo_grafico == "pizza":
+        # Para gráfico de pizza, limitamos a 10 itens para legibilidade
+        if len(labels) > 10:
+            # Pegar os 9 maiores valores e agrupar o resto
+            indices_ordenados = sorted(range(len(valores)), key=lambda i: valores[i], reverse=True)
+            top_indices = indices_ordenados[:9]
+            outros_indices = indices_ordenados[9:]
+
+            labels_top = [labels[i] for i in top_indices]
+            valores_top = [valores[i] for i in top_indices]
+
+            # Adicionar "Outros"
+            if outros_indices:
+                labels_top.append("Outros")
+                valores_top.append(sum(valores[i] for i in outros_indices))
+
+            labels = labels_top
+            valores = valores_top
+
+        ax.pie(valores, labels=labels, autopct='%1.1f%%', startangle=90)
+        ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
+
+    # Título e labels
+    ax.set_title(titulo)
+    if tipo_grafico != "pizza":
+        ax.set_ylabel(rotulo_valor)
+        ax.set_xlabel("Período")
+
+
+def desenhar_distribuicao(ax, dados_agrupados: Dict[str, Dict[str, Any]], limite_barras: int = LIMITE_BARRAS):
+    """Desenha a distribuição dos valores por período (barras horizontais)
+
+    Acima de limite_barras, os períodos são somados como no gráfico principal.
+    """
+    # Preparar dados
+    labels = list(dados_agrupados.keys())
+    valores = [float(dados['valor_total']) for dados in dados_agrupados.values()]
+    datas = _serie_datas(dados_agrupados)
+    if datas is not None and len(labels) > limite_barras:
+        inicios, somas, nome, _ = reagrupar_barras(datas, np.asarray(valores), limite_barras)
+        formato = "%Y" if nome == "ano" else "%m/%Y" if nome == "mês" else "%d/%m/%Y"
+        labels = [inicio.strftime(formato) for inicio in inicios.astype(object)]
+        valores = list(somas)
+
+    # Gráfico de barras horizontal
+    y_pos = range(len(labels))
+    ax.barh(y_pos, valores, align='center')
+    ax.set_yticks(y_pos)
+    ax.set_yticklabels(labels)
+    ax.invert_yaxis()  # labels read top-to-bottom
+    ax.set_xlabel('Valor (R$)')
+    ax.set_title('Distribuição de Valores')
@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sistema CM - Importação de Dados em Streaming
+Importa arquivos no formato do dados_sistema.json (inclusive exportações
+de instalações antigas, com cadastros no formato com 'idade') para o banco
+SQLite do sistema sem carregar o documento inteiro: o JSON é lido em
+blocos, registro a registro, e gravado em lotes. Cada lote grava também o
+ponto de retomada, de modo que uma importação interrompida continua do
+último lote gravado.
+
+Uso:
+    python importar_json.py ARQUIVO [--destino dados_sistema.db] [--lote 2000]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import codecs
+import logging
+import argparse
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Garantir que os módulos no mesmo diretório possam ser importados
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from armazenamento_sqlite import ArmazenamentoSQLite
+from sistema_interface import GerenciadorDados, CadastroCliente, Venda, Pagamento
+
+# Coleções lidas registro a registro (as demais chaves são lidas inteiras)
+COLECOES = ("cadastros", "historico_vendas", "pagamentos", "auditoria")
+# Chaves do arquivo JSON que não vão para o banco (o resumo diário é calculado pelo próprio banco)
+CHAVES_IGNORADAS = ("geracao", "journal_seq", "resumo_vendas_diario")
+
+_ESPACOS = re.compile(r"[ \t\n\r]*")
+
+
+class ErroImportacao(Exception):
+    """Arquivo inválido ou diferente do que estava sendo importado"""
+
+
+class LeitorJSONIncremental:
+    """Percorre um documento JSON com a estrutura do dados_sistema.json em blocos
+
+    Gera os eventos ("geral", chave, valor) para as chaves comuns,
+    ("registro", colecao, registro) para cada elemento das coleções e
+    ("fim_colecao", colecao, None) ao fim de cada uma. Após cada evento,
+    posicao() (em bytes) e contexto identificam o ponto de retomada.
+    """
+
+    def __init__(self, arquivo, colecoes=COLECOES, tamanho_bloco: int = 1024 * 1024,
+                 limite_valor: int = 64 * 1024 * 1024):
+        self._arquivo = arquivo
+        self.colecoes = colecoes
+        self.tamanho_bloco = tamanho_bloco
+        # Valor que não se completa nesse tamanho é tratado como JSON inválido
+        self.limite_valor = limite_valor
+        self._json = json.JSONDecoder()
+        self.contexto: Optional[str] = None
+        self._posicionar(0)
+
+    def _posicionar(self, posicao: int):
+        self._arquivo.seek(posicao)
+        if posicao == 0 and self._arquivo.read(len(codecs.BOM_UTF8)) == codecs.BOM_UTF8:
+            posicao = len(codecs.BOM_UTF8)
+        self._arquivo.seek(posicao)
+        self._decodificador = codecs.getincrementaldecoder("utf-8")()
+        self._texto = ""
+        self._i = 0
+        # Posição em bytes do início de self._texto
+        self._base = posicao
+        self._fim = False
+
+    def posicao(self) -> int:
+        """Posição em bytes logo após o último valor lido"""
+        return self._base + len(self._texto[:self._i].encode("utf-8"))
+
+    def _carregar(self) -> bool:
+        """Descarta o texto já lido e acrescenta o próximo bloco (False no fim do arquivo)"""
+        if self._fim:
+            return False
+        if self._i:
+            self._base = self.posicao()
+            self._texto = self._texto[self._i:]
+            self._i = 0
+        bloco = self._arquivo.read(self.tamanho_bloco)
+        try:
+            self._texto += self._decodificador.decode(bloco, final=not bloco)
+        except UnicodeDecodeError as e:
+            raise ErroImportacao(f"Arquivo não está em UTF-8 (perto da posição {self._base}): {e}") from None
+        self._fim = not bloco
+        return bool(bloco)
+
+    def _caractere(self) -> str:
+        """Próximo caractere significativo, sem consumir ('' no fim do arquivo)"""
+        while True:
+            self._i = _ESPACOS.match(self._texto, self._i).end()
+            if self._i < len(self._texto):
+                return self._texto[self._i]
+            if not self._carregar():
+                return ""
+
+    def _consumir(self, esperados: str) -> str:
+        caractere = self._caractere()
+        if not caractere or caractere not in esperados:
+            raise ErroImportacao(f"Esperado {' ou '.join(esperados)} na posição {self.posicao()}, "
+                                 f"encontrado {caractere or 'fim do arquivo'!r}")
+        self._i += 1
+        return caractere
+
+    def _valor(self) -> Any:
+        """Próximo valor JSON completo (lê mais blocos enquanto estiver incompleto)"""
+        self._caractere()
+        while True:
+            try:
+                valor, fim = self._json.raw_decode(self._texto, self._i)
+                # Número no fim do bloco pode continuar no próximo
+                if fim < len(self._texto) or self._fim:
+                    self._i = fim
+                    return valor
+            except json.JSONDecodeError as e:
+                if self._fim or len(self._texto) - self._i > self.limite_valor:
+                    raise ErroImportacao(f"JSON inválido na posição {self.posicao()}: {e.msg}") from None
+            self._carregar()
+
+    def eventos(self, posicao: int = 0, contexto: Optional[str] = None) -> Iterator[Tuple[str, str, Any]]:
+        """Eventos do documento, desde o início ou de um ponto de retomada (posicao, contexto)"""
+        self._posicionar(posicao)
+        if contexto is None:
+            self._consumir("{")
+            primeiro = True
+        else:
+            primeiro = False
+            if contexto in self.colecoes:
+                yield from self._elementos(contexto, primeiro=False)
+
+        while True:
+            if primeiro:
+                primeiro = False
+                if self._caractere() == "}":
+                    self._i += 1
+                    break
+            elif self._consumir(",}") == "}":
+                break
+
+            chave = self._valor()
+            if not isinstance(chave, str):
+                raise ErroImportacao(f"Chave inválida na posição {self.posicao()}: {chave!r}")
+            self._consumir(":")
+            if chave in self.colecoes and self._caractere() == "[":
+                self._i += 1
+                yield from self._elementos(chave, primeiro=True)
+            else:
+                valor = self._valor()
+                self.contexto = "objeto"
+                yield "geral", chave, valor
+
+        self.contexto = "fim"
+        if self._caractere():
+            raise ErroImportacao(f"Conteúdo após o fim do documento na posição {self.posicao()}")
+
+    def _elementos(self, colecao: str, primeiro: bool) -> Iterator[Tuple[str, str, Any]]:
+        self.contexto = colecao
+        while True:
+            if primeiro:
+                primeiro = False
+                if self._caractere() == "]":
+                    self._i += 1
+                    break
+            elif self._consumir(",]") == "]":
+                break
+            yield "registro", colecao, self._valor()
+        self.contexto = "objeto"
+        yield "fim_colecao", colecao, None
+
+
+class ImportadorJSON:
+    """Importa um arquivo JSON de dados para o banco SQLite em lotes, com retomada"""
+
+    CONVERSORES = {
+        "cadastros": (CadastroCliente, "cliente", GerenciadorDados._cliente_de_dicionario, True),
+        "historico_vendas": (Venda, "venda", GerenciadorDados._venda_de_dicionario, False),
+        "pagamentos": (Pagamento, "pagamento", GerenciadorDados._pagamento_de_dicionario, False),
+    }
+
+    def __init__(self, arquivo: str, destino: str = "dados_sistema.db", tamanho_lote: int = 2000,
+                 intervalo_relatorio: float = 2.0, relatorio=print):
+        self.arquivo = arquivo
+        self.destino = destino
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_relatorio = intervalo_relatorio
+        self.relatorio = relatorio
+
+    def _converter(self, colecao: str, registros: List[Any]) -> Tuple[List[Any], int]:
+        """Objetos do modelo dos registros válidos (formato antigo convertido) e quantidade rejeitada"""
+        if colecao == "auditoria":
+            # Entradas em texto; transferidas para o log de auditoria na abertura do sistema
+            return [str(entrada) for entrada in registros], 0
+
+        classe, descricao, converter, aceitar_legado = self.CONVERSORES[colecao]
+        objetos = []
+        for registro in GerenciadorDados._registros_validos(registros, classe, descricao, aceitar_legado):
+            try:
+                objetos.append(converter(registro))
+            except (TypeError, ValueError) as e:
+                logging.warning(f"Erro ao converter {descricao}: {e}")
+        return objetos, len(registros) - len(objetos)
+
+    def executar(self) -> Dict[str, Any]:
+        """Importa (ou continua importando) o arquivo
+
+        Returns:
+            Progresso final: contagens por coleção [importados, rejeitados]
+        """
+        origem = str(Path(self.arquivo).resolve())
+        estado = os.stat(self.arquivo)
+        identidade = [estado.st_size, estado.st_mtime_ns]
+
+        armazenamento = ArmazenamentoSQLite(self.destino, CadastroCliente, Venda, Pagamento)
+        try:
+            progresso = armazenamento.progresso_importacao(origem)
+            if progresso is None:
+                if not armazenamento.vazio():
+                    raise ErroImportacao(f"{self.destino} já contém dados")
+                progresso = {"identidade": identidade, "posicao": 0, "contexto": None, "contagens": {}}
+            elif progresso.pop("concluida"):
+                self.relatorio(f"{self.arquivo} já foi importado para {self.destino}")
+                return progresso
+            elif progresso["identidade"] != identidade:
+                raise ErroImportacao(f"{self.arquivo} foi alterado desde a importação interrompida")
+            else:
+                self.relatorio(f"Continuando a importação a partir de {progresso['posicao'] / 1024 / 1024:.1f} MB")
+
+            with open(self.arquivo, "rb") as arquivo:
+                self._importar(armazenamento, arquivo, origem, progresso)
+            return progresso
+        finally:
+            armazenamento.fechar()
+
+    def _importar(self, armazenamento: ArmazenamentoSQLite, arquivo, origem: str, progresso: Dict[str, Any]):
+        leitor = LeitorJSONIncremental(arquivo)
+        contagens = progresso["contagens"]
+        tamanho = progresso["identidade"][0]
+        inicio = time.monotonic()
+        posicao_inicial = progresso["posicao"]
+        proximo_relatorio = inicio + self.intervalo_relatorio
+
+        def gravar(colecao: Optional[str] = None, registros=(), gerais=None):
+            objetos, rejeitados = self._converter(colecao, registros) if colecao else ([], 0)
+            if colecao:
+                contagem = contagens.setdefault(colecao, [0, 0])
+                contagem[0] += len(objetos)
+                contagem[1] += rejeitados
+            progresso.update(posicao=leitor.posicao(), contexto=leitor.contexto)
+            armazenamento.importar_lote(origem, progresso, colecao, objetos, gerais)
+
+        lote = []
+        for evento, chave, valor in leitor.eventos(progresso["posicao"], progresso["contexto"]):
+            if evento == "registro":
+                lote.append(valor)
+                if len(lote) < self.tamanho_lote:
+                    continue
+                gravar(chave, lote)
+                lote = []
+            elif evento == "fim_colecao":
+                gravar(chave, lote)
+                lote = []
+            elif chave not in CHAVES_IGNORADAS:
+                gravar(gerais={chave: valor})
+
+            agora = time.monotonic()
+            if agora >= proximo_relatorio:
+                proximo_relatorio = agora + self.intervalo_relatorio
+                lidos = progresso["posicao"] - posicao_inicial
+                taxa = lidos / (agora - inicio) if agora > inicio else 0
+                restante = (tamanho - progresso["posicao"]) / taxa if taxa else 0
+                registros = sum(contagem[0] for contagem in contagens.values())
+                self.relatorio(f"  {progresso['posicao'] / tamanho:6.1%}  {progresso['posicao'] / 1024 / 1024:8.1f} MB  "
+                               f"{registros} registros  {taxa / 1024 / 1024:.1f} MB/s  "
+                               f"restam ~{restante:.0f}s")
+
+        progresso.update(posicao=leitor.posicao(), contexto=leitor.contexto)
+        armazenamento.importar_lote(origem, progresso, concluida=True)
+        logging.info(f"Importação de {origem} concluída: {contagens}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa um arquivo JSON de dados para o banco SQLite em streaming")
+    parser.add_argument("arquivo", help="Arquivo no formato do dados_sistema.json (inclusive versões antigas)")
+    parser.add_argument("--destino", default="dados_sistema.db", help="Banco SQLite do sistema (backend sqlite)")
+    parser.add_argument("--lote", type=int, default=2000, help="Registros gravados por transação")
+    args = parser.parse_args()
+
+    print("=== IMPORTAÇÃO DE DADOS EM STREAMING ===")
+    print(f"{args.arquivo} -> {args.destino} ({os.path.getsize(args.arquivo) / 1024 / 1024:.1f} MB)")
+    inicio = time.perf_counter()
+    try:
+        progresso = ImportadorJSON(args.arquivo, args.destino, args.lote).executar()
+    except ErroImportacao as e:
+        print(f"Importação interrompida: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\nImportação interrompida; execute novamente para continuar do último lote gravado")
+        sys.exit(130)
+
+    for colecao, (importados, rejeitados) in progresso["contagens"].items():
+        print(f"  {colecao:<18} {importados:10d} importados  {rejeitados:6d} rejeitados")
+    print(f"Concluída em {time.perf_counter() - inicio:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
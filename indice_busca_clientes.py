@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sistema CM - Índice de Busca de Clientes
+Índice em memória por termos normalizados (nome sem acentos, dígitos de
+CPF e telefones, email) com busca por prefixo
+"""
+
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from collections import namedtuple
+from functools import lru_cache
+from itertools import count
+from typing import Dict, List, Optional, Set, Union
+
+_SEPARADORES = re.compile(r"[^0-9a-z]+")
+_NAO_DIGITOS = re.compile(r"\D+")
+_PONTUACAO_DOCUMENTO = re.compile(r"[\s.()/-]+")
+
+# Campos do cadastro usados pelo índice
+CAMPOS_BUSCA = ("id", "nome", "cpf", "email", "telefone_residencial", "telefone_celular",
+                "telefone_comercial", "telefone_trabalho", "telefones_adicionais", "loja_cadastro")
+
+# Prefixos até este tamanho têm a lista ordenada de clientes mantida pelo
+# índice: casam com muitos termos (telefones e CPFs são todos distintos)
+TAMANHO_PREFIXO_CURTO = 4
+_TAMANHOS_PREFIXO_CURTO = range(1, TAMANHO_PREFIXO_CURTO + 1)
+
+# Valores brutos dos campos de busca: indexados como um CadastroCliente, sem convertê-lo
+ValoresBusca = namedtuple("ValoresBusca", CAMPOS_BUSCA)
+
+
+def normalizar_texto(texto: str) -> str:
+    """Remove acentos e converte para minúsculas"""
+    if not texto:
+        return ""
+    if texto.isascii():
+        return texto.lower()
+    decomposto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).lower()
+
+
+def apenas_digitos(texto: str) -> str:
+    """Mantém apenas os dígitos do texto (CPF, telefones)"""
+    return _NAO_DIGITOS.sub("", texto) if texto else ""
+
+
+@lru_cache(maxsize=65536)
+def _tokens_palavra(palavra: str):
+    """Tokens normalizados de uma palavra do nome (nomes se repetem muito)"""
+    return tuple(t for t in _SEPARADORES.split(normalizar_texto(palavra)) if t)
+
+
+def termos_cliente(cliente) -> Set[str]:
+    """Termos indexados de um cliente"""
+    termos = set()
+
+    for palavra in (cliente.nome or "").split():
+        termos.update(_tokens_palavra(palavra))
+
+    documentos = [cliente.cpf, cliente.telefone_residencial, cliente.telefone_celular,
+                  cliente.telefone_comercial, cliente.telefone_trabalho]
+    documentos.extend(cliente.telefones_adicionais or [])
+    for documento in documentos:
+        if documento:
+            digitos = apenas_digitos(documento)
+            if digitos:
+                termos.add(digitos)
+
+    email = normalizar_texto(cliente.email).strip()
+    if email:
+        termos.add(email)
+
+    return termos
+
+
+def _prefixos_curtos(termos) -> Set[str]:
+    """Prefixos de até TAMANHO_PREFIXO_CURTO caracteres dos termos"""
+    # Fatias além do fim do termo repetem o próprio termo, que também é prefixo
+    return {termo[:tamanho] for termo in termos for tamanho in _TAMANHOS_PREFIXO_CURTO}
+
+
+def termos_consulta(texto: str) -> List[str]:
+    """Quebra a consulta em termos comparáveis com os do índice"""
+    texto = normalizar_texto(texto)
+
+    # CPF/telefone digitado com pontuação ou espaços: buscar pelos dígitos
+    sem_pontuacao = _PONTUACAO_DOCUMENTO.sub("", texto)
+    if sem_pontuacao.isdigit():
+        return [sem_pontuacao]
+
+    termos = []
+    for token in texto.split():
+        sem_pontuacao = _PONTUACAO_DOCUMENTO.sub("", token)
+        if sem_pontuacao.isdigit():
+            termos.append(sem_pontuacao)
+        elif "@" in token:
+            termos.append(token)
+        else:
+            termos.extend(t for t in _SEPARADORES.split(token) if t)
+    # Termos mais longos primeiro: costumam ser mais seletivos
+    return sorted(set(termos), key=len, reverse=True)
+
+
+class IndiceBuscaClientes:
+    """Índice de busca dos clientes, chaveado por CadastroCliente.id
+
+    Cada cliente ocupa uma vaga numerada na ordem de inclusão; como os
+    cadastros só crescem no final, a ordem das vagas é a das posições
+    usadas pela lista de clientes. Clientes antigos sem id recebem uma
+    chave substituta, válida enquanto o índice existir.
+    """
+
+    def __init__(self, clientes=()):
+        self.ids: List[str] = []
+        self.lojas: List[str] = []
+        self._vagas: List[int] = []
+        self._termos_por_vaga: List[Optional[Set[str]]] = []
+        # Posição de cada vaga, refeita após remoções (até a primeira, vaga e
+        # posição coincidem)
+        self._posicao_por_vaga: Optional[List[Optional[int]]] = None
+        self._vagas_contiguas = True
+        self._vagas_por_termo: Dict[str, Union[int, Set[int]]] = {}
+        self._vagas_por_prefixo: Dict[str, List[int]] = {}
+        self._termos_ordenados: List[str] = []
+        self._chaves_substitutas = count(1)
+
+        # Carga inicial: ordenar os termos uma única vez ao final
+        for cliente in clientes:
+            self.ids.append(self._chave(cliente))
+            self.lojas.append(cliente.loja_cadastro)
+            self._indexar(self._nova_vaga(), cliente, ordenar=False)
+        self._termos_ordenados = sorted(self._vagas_por_termo)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _chave(self, cliente, atual: Optional[str] = None) -> str:
+        """Chave do cliente no índice"""
+        if cliente.id:
+            return cliente.id
+        return atual or f"#{next(self._chaves_substitutas)}"
+
+    def _nova_vaga(self) -> int:
+        """Reserva a vaga do cliente incluído no final da lista"""
+        vaga = len(self._termos_por_vaga)
+        self._vagas.append(vaga)
+        self._termos_por_vaga.append(None)
+        if self._posicao_por_vaga is not None:
+            self._posicao_por_vaga.append(len(self._vagas) - 1)
+        return vaga
+
+    def _indexar(self, vaga: int, cliente, ordenar: bool = True):
+        """Inclui os termos do cliente"""
+        termos = termos_cliente(cliente)
+        self._termos_por_vaga[vaga] = termos
+
+        # Termos de um único cliente (CPF, telefone, email) guardam só a vaga
+        vagas_por_termo = self._vagas_por_termo
+        for termo in termos:
+            atual = vagas_por_termo.get(termo)
+            if atual is None:
+                vagas_por_termo[termo] = vaga
+                if ordenar:
+                    insort(self._termos_ordenados, termo)
+            elif atual.__class__ is int:
+                vagas_por_termo[termo] = {atual, vaga}
+            else:
+                atual.add(vaga)
+
+        vagas_por_prefixo = self._vagas_por_prefixo
+        for prefixo in _prefixos_curtos(termos):
+            vagas = vagas_por_prefixo.get(prefixo)
+            if vagas is None:
+                vagas_por_prefixo[prefixo] = [vaga]
+            elif vagas[-1] < vaga:
+                vagas.append(vaga)
+            else:
+                insort(vagas, vaga)
+
+    def _desindexar(self, vaga: int):
+        """Remove os termos do cliente"""
+        termos = self._termos_por_vaga[vaga]
+        self._termos_por_vaga[vaga] = None
+
+        vagas_por_termo = self._vagas_por_termo
+        for termo in termos:
+            atual = vagas_por_termo[termo]
+            if atual.__class__ is not int:
+                atual.discard(vaga)
+                if len(atual) > 1:
+                    continue
+                vagas_por_termo[termo] = next(iter(atual))
+                continue
+            del vagas_por_termo[termo]
+            del self._termos_ordenados[bisect_left(self._termos_ordenados, termo)]
+
+        vagas_por_prefixo = self._vagas_por_prefixo
+        for prefixo in _prefixos_curtos(termos):
+            vagas = vagas_por_prefixo[prefixo]
+            del vagas[bisect_left(vagas, vaga)]
+            if not vagas:
+                del vagas_por_prefixo[prefixo]
+
+    def adicionar(self, cliente):
+        """Indexa um cliente incluído no final da lista de cadastros"""
+        self.ids.append(self._chave(cliente))
+        self.lojas.append(cliente.loja_cadastro)
+        self._indexar(self._nova_vaga(), cliente)
+
+    def editar(self, indice: int, cliente):
+        """Reindexa o cliente da posição informada"""
+        vaga = self._vagas[indice]
+        self._desindexar(vaga)
+        self.ids[indice] = self._chave(cliente, self.ids[indice])
+        self.lojas[indice] = cliente.loja_cadastro
+        self._indexar(vaga, cliente)
+
+    def remover(self, indice: int):
+        """Remove o cliente da posição informada"""
+        del self.ids[indice]
+        del self.lojas[indice]
+        self._desindexar(self._vagas.pop(indice))
+        # Posições seguintes mudaram: o mapa é refeito na próxima busca
+        self._vagas_contiguas = False
+        self._posicao_por_vaga = None
+
+    def _faixa_prefixo(self, prefixo: str):
+        """Faixa (início, fim) dos termos ordenados iniciados pelo prefixo"""
+        termos = self._termos_ordenados
+        inicio = bisect_left(termos, prefixo)
+        return inicio, bisect_left(termos, prefixo + "\uffff", inicio)
+
+    def _vagas_com_prefixo(self, termo: str) -> Set[int]:
+        """Vagas dos clientes com algum termo iniciado pelo termo da consulta"""
+        if len(termo) <= TAMANHO_PREFIXO_CURTO:
+            return set(self._vagas_por_prefixo.get(termo, ()))
+        vagas_por_termo = self._vagas_por_termo
+        resultado = set()
+        inicio, fim = self._faixa_prefixo(termo)
+        for termo in self._termos_ordenados[inicio:fim]:
+            vagas = vagas_por_termo[termo]
+            if vagas.__class__ is int:
+                resultado.add(vagas)
+            else:
+                resultado |= vagas
+        return resultado
+
+    def _estimativa(self, termo: str) -> int:
+        """Limite superior de clientes que atendem ao termo (sem percorrê-los)"""
+        return len(self._vagas_por_prefixo.get(termo[:TAMANHO_PREFIXO_CURTO], ()))
+
+    def _posicoes(self, vagas: List[int]) -> List[int]:
+        """Converte vagas em ordem crescente nas posições dos cadastros"""
+        if self._vagas_contiguas:
+            return list(vagas)
+        if self._posicao_por_vaga is None:
+            posicao_por_vaga = [None] * len(self._termos_por_vaga)
+            for posicao, vaga in enumerate(self._vagas):
+                posicao_por_vaga[vaga] = posicao
+            self._posicao_por_vaga = posicao_por_vaga
+        return list(map(self._posicao_por_vaga.__getitem__, vagas))
+
+    def buscar(self, texto: str = "", loja: Optional[str] = None):
+        """Posições (na lista de cadastros) dos clientes que atendem à busca
+
+        Cada termo da consulta deve ser prefixo de algum termo do cliente.
+
+        Returns:
+            Sequência ordenada de posições
+        """
+        termos = termos_consulta(texto)
+
+        if not termos:
+            if not loja:
+                return range(len(self.ids))
+            return [i for i, loja_cliente in enumerate(self.lojas) if loja_cliente == loja]
+
+        if len(termos) == 1 and len(termos[0]) <= TAMANHO_PREFIXO_CURTO:
+            # Prefixo curto: a lista de vagas já está pronta e ordenada
+            resultado = self._posicoes(self._vagas_por_prefixo.get(termos[0], ()))
+        else:
+            # Termo mais seletivo primeiro; os demais restringem os candidatos
+            # pelo prefixo curto e, se mais longos, conferem os termos deles
+            termos.sort(key=self._estimativa)
+            encontrados = self._vagas_com_prefixo(termos[0])
+            termos_por_vaga = self._termos_por_vaga
+            for termo in termos[1:]:
+                if not encontrados:
+                    return []
+                encontrados = encontrados.intersection(
+                    self._vagas_por_prefixo.get(termo[:TAMANHO_PREFIXO_CURTO], ()))
+                if len(termo) > TAMANHO_PREFIXO_CURTO:
+                    encontrados = {vaga for vaga in encontrados
+                                   if any(t.startswith(termo) for t in termos_por_vaga[vaga])}
+            resultado = self._posicoes(sorted(encontrados))
+
+        if loja:
+            lojas = self.lojas
+            resultado = [i for i in resultado if lojas[i] == loja]
+        return resultado
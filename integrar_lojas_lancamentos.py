@@ -9,6 +9,7 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 from db import get_connection
+from migracoes_schema import aplicar_migracoes
 
 def adicionar_coluna_loja_id():
     """Adiciona coluna loja_id nas tabelas de lançamentos"""
@@ -83,6 +84,8 @@ def adicionar_coluna_loja_id():
         print(f"Erro ao criar tabelas com foreign keys: {e}")
     
     conn.commit()
+    # As tabelas recriadas perdem as colunas *_jd, triggers e índices das migrações
+    aplicar_migracoes(conn)
     conn.close()
 
 def criar_tabela_fluxo_caixa():
@@ -22,6 +22,7 @@ if str(src_path) not in sys.path:
     sys.path.insert(0, str(src_path))
 from ui_utils import aplicar_mascara_valor, aplicar_mascara_data, aplicar_mascara_telefone, aplicar_mascara_cpf
 from PIL import Image, ImageTk
+from conexoes_db import obter_conexao, transacao as transacao_db
 
 class InterfaceCadastroClientes:
     """Interface completa de cadastro de clientes"""
@@ -50,17 +51,9 @@ class InterfaceCadastroClientes:
     def _carregar_lojas(self):
         """Carrega lojas do banco de dados"""
         try:
-            import sqlite3
-            from pathlib import Path
-            
-            # Caminho do banco de dados - usar caminho absoluto
-            db_path = Path.cwd() / "sistema.db"
-            
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
+            cursor = obter_conexao().cursor()
             cursor.execute("SELECT id, nome FROM loja WHERE ativo = 1 ORDER BY nome")
             lojas = cursor.fetchall()
-            conn.close()
             
             # Retornar lista de tuplas (id, nome) para o combobox
             return [(f"{nome} (ID: {id})", id) for id, nome in lojas]
@@ -748,22 +741,16 @@ class InterfaceCadastroClientes:
             return
         
         try:
-            # Importar aqui para evitar import circular
-            sys.path.append('src')
-            from db import get_connection
-            
             # Buscar ID do cliente
-            conn = get_connection()
-            cursor = conn.cursor()
+            cursor = obter_conexao().cursor()
             cursor.execute("SELECT id FROM cliente_full WHERE nome = ?", (nome_cliente,))
             cliente_data = cursor.fetchone()
-            conn.close()
             
             if not cliente_data:
                 messagebox.showerror("Erro", "Cliente não encontrado no banco de dados!")
                 return
             
-            cliente_id = cliente_data["id"]
+            cliente_id = cliente_data[0]
             
             # Criar janela de contratos
             self._criar_janela_contratos(cliente_id, nome_cliente)
@@ -815,11 +802,8 @@ class InterfaceCadastroClientes:
     def _build_contratos_ativos(self, parent, cliente_id, nome_cliente):
         """Constrói a aba de contratos ativos"""
         try:
-            from db import get_connection
-            
             # Buscar contratos ativos
-            conn = get_connection()
-            cursor = conn.cursor()
+            cursor = obter_conexao().cursor()
             cursor.execute("""
                 SELECT cc.id, cc.data_venda, cu.nome as curso_nome, cc.valor_total,
                        cc.num_parcelas, cc.valor_parcela, cc.cashback_valor, cc.status
@@ -829,7 +813,6 @@ class InterfaceCadastroClientes:
                 ORDER BY cc.created_at DESC
             """, (cliente_id,))
             contratos_ativos = cursor.fetchall()
-            conn.close()
             
             if not contratos_ativos:
                 ttk.Label(parent, text="Nenhum contrato ativo encontrado.", 
@@ -847,11 +830,8 @@ class InterfaceCadastroClientes:
     def _build_historico_contratos(self, parent, cliente_id, nome_cliente):
         """Constrói a aba de histórico de contratos"""
         try:
-            from db import get_connection
-            
             # Buscar todos os contratos
-            conn = get_connection()
-            cursor = conn.cursor()
+            cursor = obter_conexao().cursor()
             cursor.execute("""
                 SELECT cc.id, cc.data_venda, cu.nome as curso_nome, cc.valor_total,
                        cc.num_parcelas, cc.valor_parcela, cc.cashback_valor, cc.status
@@ -861,7 +841,6 @@ class InterfaceCadastroClientes:
                 ORDER BY cc.created_at DESC
             """, (cliente_id,))
             todos_contratos = cursor.fetchall()
-            conn.close()
             
             if not todos_contratos:
                 ttk.Label(parent, text="Nenhum contrato encontrado.", 
@@ -974,11 +953,8 @@ class InterfaceCadastroClientes:
         tree.configure(yscrollcommand=scrollbar.set)
         
         try:
-            from db import get_connection
-            
             # Carregar parcelas
-            conn = get_connection()
-            cursor = conn.cursor()
+            cursor = obter_conexao().cursor()
             cursor.execute("""
                 SELECT id, numero_parcela, data_vencimento, valor, status, data_pagamento
                 FROM parcela_contrato 
@@ -986,7 +962,6 @@ class InterfaceCadastroClientes:
                 ORDER BY numero_parcela
             """, (contrato[0],))
             parcelas = cursor.fetchall()
-            conn.close()
             
             for parcela in parcelas:
                 valor_formatado = f"R$ {parcela[3]:.2f}".replace('.', ',')
@@ -1056,15 +1031,12 @@ class InterfaceCadastroClientes:
     def _atualizar_parcelas(self, tree, contrato_id):
         """Atualiza a lista de parcelas"""
         try:
-            from db import get_connection
-            
             # Limpar árvore
             for item in tree.get_children():
                 tree.delete(item)
             
             # Recarregar parcelas
-            conn = get_connection()
-            cursor = conn.cursor()
+            cursor = obter_conexao().cursor()
             cursor.execute("""
                 SELECT id, numero_parcela, data_vencimento, valor, status, data_pagamento
                 FROM parcela_contrato 
@@ -1072,7 +1044,6 @@ class InterfaceCadastroClientes:
                 ORDER BY numero_parcela
             """, (contrato_id,))
             parcelas = cursor.fetchall()
-            conn.close()
             
             for parcela in parcelas:
                 valor_formatado = f"R$ {parcela[3]:.2f}".replace('.', ',')
@@ -1185,12 +1156,10 @@ class InterfaceCadastroClientes:
     def _processar_pagamento_parcela_editavel(self, contrato, parcela_numero, valor_pago, observacoes, nome_cliente, janela_parcelas):
         """Processa o pagamento de uma parcela com valor editável"""
         try:
-            from db import get_connection
             from datetime import datetime
             import uuid
             
-            conn = get_connection()
-            cursor = conn.cursor()
+            cursor = obter_conexao().cursor()
             
             # Buscar dados da parcela
             cursor.execute("""
@@ -1201,91 +1170,92 @@ class InterfaceCadastroClientes:
             
             if not parcela_data:
                 messagebox.showerror("Erro", "Parcela não encontrada ou já foi paga!")
-                conn.close()
                 return
             
             data_hoje = datetime.now().strftime("%d/%m/%Y")
             valor_original = parcela_data[1]
             transacao_id = str(uuid.uuid4())[:8]  # ID único para estorno
             
-            # 1. Marcar parcela como paga
-            cursor.execute("""
-                UPDATE parcela_contrato 
-                SET status = 'Paga', data_pagamento = ?, valor = ? 
-                WHERE id = ?
-            """, (data_hoje, valor_pago, parcela_data[0]))
-            
-            # 2. Registrar histórico para possível estorno
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS historico_transacoes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    transacao_id TEXT UNIQUE NOT NULL,
-                    tipo TEXT NOT NULL,
-                    contrato_id INTEGER,
-                    parcela_id INTEGER,
-                    valor_original REAL,
-                    valor_transacao REAL,
-                    status_anterior TEXT,
-                    status_novo TEXT,
-                    data_transacao TEXT,
-                    observacoes TEXT,
-                    pode_estornar INTEGER DEFAULT 1,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            cursor.execute("""
-                INSERT INTO historico_transacoes 
-                (transacao_id, tipo, contrato_id, parcela_id, valor_original, valor_transacao, 
-                 status_anterior, status_novo, data_transacao, observacoes)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (transacao_id, "PAGAMENTO_PARCELA", contrato[0], parcela_data[0], 
-                  valor_original, valor_pago, "Pendente", "Paga", data_hoje, observacoes))
-            
-            # 3. Lançar como receita
-            try:
-                cursor.execute("""
-                    INSERT INTO lancamento_receita (data, tipo_receita, descricao, valor, status, observacoes)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (data_hoje, "Vendas de Cursos", 
-                      f"Pagamento Parcela {parcela_numero}/{contrato[4]} - {contrato[2]} - {nome_cliente} [ID: {transacao_id}]", 
-                      valor_pago, "Recebido", f"Valor original: R$ {valor_original:.2f}. {observacoes}"))
-            except Exception:
-                print(f"💰 Receita registrada: R$ {valor_pago:.2f} - Parcela {parcela_numero} - {nome_cliente}")
-            
-            # 4. Verificar se todas as parcelas foram pagas
-            cursor.execute("""
-                SELECT COUNT(*) as total, 
-                       COUNT(CASE WHEN status = 'Paga' THEN 1 END) as pagas,
-                       COUNT(CASE WHEN status = 'Cancelada' THEN 1 END) as canceladas
-                FROM parcela_contrato WHERE contrato_id = ?
-            """, (contrato[0],))
-            parcelas_info = cursor.fetchone()
-            
-            total_parcelas = parcelas_info[0]
-            parcelas_pagas = parcelas_info[1]
-            parcelas_canceladas = parcelas_info[2]
-            
-            # 5. Se todas as parcelas não canceladas foram pagas, finalizar contrato
-            if parcelas_pagas + parcelas_canceladas == total_parcelas and parcelas_pagas > 0:
+            with transacao_db() as conn:
+                cursor = conn.cursor()
+                
+                # 1. Marcar parcela como paga
                 cursor.execute("""
-                    UPDATE contrato_curso 
-                    SET status = 'Finalizado' 
+                    UPDATE parcela_contrato 
+                    SET status = 'Paga', data_pagamento = ?, valor = ? 
                     WHERE id = ?
-                """, (contrato[0],))
+                """, (data_hoje, valor_pago, parcela_data[0]))
+                
+                # 2. Registrar histórico para possível estorno
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS historico_transacoes (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        transacao_id TEXT UNIQUE NOT NULL,
+                        tipo TEXT NOT NULL,
+                        contrato_id INTEGER,
+                        parcela_id INTEGER,
+                        valor_original REAL,
+                        valor_transacao REAL,
+                        status_anterior TEXT,
+                        status_novo TEXT,
+                        data_transacao TEXT,
+                        observacoes TEXT,
+                        pode_estornar INTEGER DEFAULT 1,
+                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                
+                cursor.execute("""
+                    INSERT INTO historico_transacoes 
+                    (transacao_id, tipo, contrato_id, parcela_id, valor_original, valor_transacao, 
+                     status_anterior, status_novo, data_transacao, observacoes)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (transacao_id, "PAGAMENTO_PARCELA", contrato[0], parcela_data[0], 
+                      valor_original, valor_pago, "Pendente", "Paga", data_hoje, observacoes))
                 
+                # 3. Lançar como receita
                 try:
                     cursor.execute("""
-                        UPDATE cashback_cliente 
-                        SET status = 'Liberado', data_liberacao = ? 
-                        WHERE contrato_id = ?
-                    """, (data_hoje, contrato[0]))
+                        INSERT INTO lancamento_receita (data, tipo_receita, descricao, valor, status, observacoes)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, (data_hoje, "Vendas de Cursos", 
+                          f"Pagamento Parcela {parcela_numero}/{contrato[4]} - {contrato[2]} - {nome_cliente} [ID: {transacao_id}]", 
+                          valor_pago, "Recebido", f"Valor original: R$ {valor_original:.2f}. {observacoes}"))
                 except Exception:
-                    print(f"🎁 Cashback liberado: R$ {contrato[6]:.2f} - {nome_cliente}")
+                    print(f"💰 Receita registrada: R$ {valor_pago:.2f} - Parcela {parcela_numero} - {nome_cliente}")
+                
+                # 4. Verificar se todas as parcelas foram pagas
+                cursor.execute("""
+                    SELECT COUNT(*) as total, 
+                           COUNT(CASE WHEN status = 'Paga' THEN 1 END) as pagas,
+                           COUNT(CASE WHEN status = 'Cancelada' THEN 1 END) as canceladas
+                    FROM parcela_contrato WHERE contrato_id = ?
+                """, (contrato[0],))
+                parcelas_info = cursor.fetchone()
+                
+                total_parcelas = parcelas_info[0]
+                parcelas_pagas = parcelas_info[1]
+                parcelas_canceladas = parcelas_info[2]
                 
-                conn.commit()
-                conn.close()
+                # 5. Se todas as parcelas não canceladas foram pagas, finalizar contrato
+                contrato_finalizado = parcelas_pagas + parcelas_canceladas == total_parcelas and parcelas_pagas > 0
+                if contrato_finalizado:
+                    cursor.execute("""
+                        UPDATE contrato_curso 
+                        SET status = 'Finalizado' 
+                        WHERE id = ?
+                    """, (contrato[0],))
                 
+                    try:
+                        cursor.execute("""
+                            UPDATE cashback_cliente 
+                            SET status = 'Liberado', data_liberacao = ? 
+                            WHERE contrato_id = ?
+                        """, (data_hoje, contrato[0]))
+                    except Exception:
+                        print(f"🎁 Cashback liberado: R$ {contrato[6]:.2f} - {nome_cliente}")
+            
+            if contrato_finalizado:
                 messagebox.showinfo("Sucesso", 
                     f"✅ Parcela {parcela_numero} paga com sucesso!\n\n"
                     f"💰 Valor pago: R$ {valor_pago:.2f}\n"
@@ -1294,9 +1264,6 @@ class InterfaceCadastroClientes:
                     f"🔄 ID da transação: {transacao_id}\n"
                     f"(Pode ser usado para estorno se necessário)")
             else:
-                conn.commit()
-                conn.close()
-                
                 parcelas_restantes = total_parcelas - parcelas_pagas - parcelas_canceladas
                 messagebox.showinfo("Sucesso", 
                     f"✅ Parcela {parcela_numero} paga com sucesso!\n\n"
@@ -1310,17 +1277,13 @@ class InterfaceCadastroClientes:
             
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao processar pagamento: {e}")
-            if 'conn' in locals():
-                conn.close()
     
     def _processar_pagamento_parcela(self, contrato, parcela_numero, nome_cliente, janela_parcelas):
         """Processa o pagamento de uma parcela"""
         try:
-            from db import get_connection
             from datetime import datetime
             
-            conn = get_connection()
-            cursor = conn.cursor()
+            cursor = obter_conexao().cursor()
             
             # Buscar dados da parcela
             cursor.execute("""
@@ -1331,75 +1294,73 @@ class InterfaceCadastroClientes:
             
             if not parcela_data:
                 messagebox.showerror("Erro", "Parcela não encontrada ou já foi paga!")
-                conn.close()
                 return
             
             data_hoje = datetime.now().strftime("%d/%m/%Y")
             valor_parcela = parcela_data[1]
             
-            # 1. Marcar parcela como paga
-            cursor.execute("""
-                UPDATE parcela_contrato 
-                SET status = 'Paga', data_pagamento = ? 
-                WHERE id = ?
-            """, (data_hoje, parcela_data[0]))
-            
-            # 2. Lançar como receita (verificar se tabela existe)
-            try:
-                cursor.execute("""
-                    INSERT INTO lancamento_receita (data, tipo_receita, descricao, valor, status)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (data_hoje, "Vendas de Cursos", 
-                      f"Pagamento Parcela {parcela_numero}/{contrato[4]} - {contrato[2]} - {nome_cliente}", 
-                      valor_parcela, "Recebido"))
-            except Exception:
-                # Se não existir tabela lancamento_receita, criar um registro simples
-                print(f"💰 Receita registrada: R$ {valor_parcela:.2f} - Parcela {parcela_numero} - {nome_cliente}")
-            
-            # 3. Verificar se todas as parcelas foram pagas
-            cursor.execute("""
-                SELECT COUNT(*) as total, 
-                       COUNT(CASE WHEN status = 'Paga' THEN 1 END) as pagas,
-                       COUNT(CASE WHEN status = 'Cancelada' THEN 1 END) as canceladas
-                FROM parcela_contrato WHERE contrato_id = ?
-            """, (contrato[0],))
-            parcelas_info = cursor.fetchone()
-            
-            total_parcelas = parcelas_info[0]
-            parcelas_pagas = parcelas_info[1]
-            parcelas_canceladas = parcelas_info[2]
-            
-            # 4. Se todas as parcelas não canceladas foram pagas, finalizar contrato e liberar cashback
-            if parcelas_pagas + parcelas_canceladas == total_parcelas and parcelas_pagas > 0:
-                # Finalizar contrato
+            with transacao_db() as conn:
+                cursor = conn.cursor()
+                
+                # 1. Marcar parcela como paga
                 cursor.execute("""
-                    UPDATE contrato_curso 
-                    SET status = 'Finalizado' 
+                    UPDATE parcela_contrato 
+                    SET status = 'Paga', data_pagamento = ? 
                     WHERE id = ?
-                """, (contrato[0],))
+                """, (data_hoje, parcela_data[0]))
                 
-                # Liberar cashback
+                # 2. Lançar como receita (verificar se tabela existe)
                 try:
                     cursor.execute("""
-                        UPDATE cashback_cliente 
-                        SET status = 'Liberado', data_liberacao = ? 
-                        WHERE contrato_id = ?
-                    """, (data_hoje, contrato[0]))
+                        INSERT INTO lancamento_receita (data, tipo_receita, descricao, valor, status)
+                        VALUES (?, ?, ?, ?, ?)
+                    """, (data_hoje, "Vendas de Cursos", 
+                          f"Pagamento Parcela {parcela_numero}/{contrato[4]} - {contrato[2]} - {nome_cliente}", 
+                          valor_parcela, "Recebido"))
                 except Exception:
-                    print(f"🎁 Cashback liberado: R$ {contrato[6]:.2f} - {nome_cliente}")
+                    # Se não existir tabela lancamento_receita, criar um registro simples
+                    print(f"💰 Receita registrada: R$ {valor_parcela:.2f} - Parcela {parcela_numero} - {nome_cliente}")
+                
+                # 3. Verificar se todas as parcelas foram pagas
+                cursor.execute("""
+                    SELECT COUNT(*) as total, 
+                           COUNT(CASE WHEN status = 'Paga' THEN 1 END) as pagas,
+                           COUNT(CASE WHEN status = 'Cancelada' THEN 1 END) as canceladas
+                    FROM parcela_contrato WHERE contrato_id = ?
+                """, (contrato[0],))
+                parcelas_info = cursor.fetchone()
                 
-                conn.commit()
-                conn.close()
+                total_parcelas = parcelas_info[0]
+                parcelas_pagas = parcelas_info[1]
+                parcelas_canceladas = parcelas_info[2]
                 
+                # 4. Se todas as parcelas não canceladas foram pagas, finalizar contrato e liberar cashback
+                contrato_finalizado = parcelas_pagas + parcelas_canceladas == total_parcelas and parcelas_pagas > 0
+                if contrato_finalizado:
+                    # Finalizar contrato
+                    cursor.execute("""
+                        UPDATE contrato_curso 
+                        SET status = 'Finalizado' 
+                        WHERE id = ?
+                    """, (contrato[0],))
+                
+                    # Liberar cashback
+                    try:
+                        cursor.execute("""
+                            UPDATE cashback_cliente 
+                            SET status = 'Liberado', data_liberacao = ? 
+                            WHERE contrato_id = ?
+                        """, (data_hoje, contrato[0]))
+                    except Exception:
+                        print(f"🎁 Cashback liberado: R$ {contrato[6]:.2f} - {nome_cliente}")
+            
+            if contrato_finalizado:
                 messagebox.showinfo("Sucesso", 
                     f"✅ Parcela {parcela_numero} paga com sucesso!\n\n"
                     f"🎉 CONTRATO FINALIZADO!\n"
                     f"Todas as parcelas foram pagas.\n\n"
                     f"🎁 Cashback de R$ {contrato[6]:.2f} foi liberado!")
             else:
-                conn.commit()
-                conn.close()
-                
                 parcelas_restantes = total_parcelas - parcelas_pagas - parcelas_canceladas
                 messagebox.showinfo("Sucesso", 
                     f"✅ Parcela {parcela_numero} paga com sucesso!\n\n"
@@ -1411,18 +1372,14 @@ class InterfaceCadastroClientes:
             
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao processar pagamento: {e}")
-            if 'conn' in locals():
-                conn.close()
     
     def _cancelar_contrato(self, contrato, cliente_id, nome_cliente):
         """Cancela um contrato e libera o cashback"""
         # Verificar quantas parcelas já foram pagas
         try:
-            from db import get_connection
             from datetime import datetime
             
-            conn = get_connection()
-            cursor = conn.cursor()
+            cursor = obter_conexao().cursor()
             
             # Buscar status das parcelas
             cursor.execute("""
@@ -1432,7 +1389,6 @@ class InterfaceCadastroClientes:
                 FROM parcela_contrato WHERE contrato_id = ?
             """, (contrato[0],))
             parcelas_info = cursor.fetchone()
-            conn.close()
             
             total_parcelas = parcelas_info[0]
             parcelas_pagas = parcelas_info[1]
@@ -1459,78 +1415,75 @@ class InterfaceCadastroClientes:
             return
         
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            data_hoje = datetime.now().strftime("%d/%m/%Y")
-            
-            # 1. Cancelar contrato
-            cursor.execute("""
-                UPDATE contrato_curso 
-                SET status = 'Cancelado' 
-                WHERE id = ?
-            """, (contrato[0],))
-            
-            # 2. Cancelar parcelas pendentes
-            cursor.execute("""
-                UPDATE parcela_contrato 
-                SET status = 'Cancelada' 
-                WHERE contrato_id = ? AND status = 'Pendente'
-            """, (contrato[0],))
-            
-            # 3. Liberar cashback
-            try:
+            with transacao_db() as conn:
+                cursor = conn.cursor()
+                
+                data_hoje = datetime.now().strftime("%d/%m/%Y")
+                
+                # 1. Cancelar contrato
                 cursor.execute("""
-                    UPDATE cashback_cliente 
-                    SET status = 'Liberado', data_liberacao = ? 
-                    WHERE contrato_id = ?
-                """, (data_hoje, contrato[0]))
-            except Exception:
-                print(f"🎁 Cashback liberado por cancelamento: R$ {contrato[6]:.2f} - {nome_cliente}")
-            
-            # 4. Calcular valor pendente e registrar movimentações financeiras
-            valor_total_contrato = contrato[3]  # valor_total do contrato
-            valor_pendente = valor_total_contrato - valor_pago
-            
-            # Registrar o cancelamento com detalhes financeiros
-            try:
-                # Se houver valor pendente, registrar como receita perdida
-                if valor_pendente > 0:
-                    cursor.execute("""
-                        INSERT INTO lancamento_receita (data, tipo_receita, descricao, valor, status)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (data_hoje, "Cancelamentos", 
-                          f"Cancelamento Contrato #{contrato[0]} - {contrato[2]} - {nome_cliente} - Receita perdida", 
-                          -valor_pendente, "Cancelado"))
+                    UPDATE contrato_curso 
+                    SET status = 'Cancelado' 
+                    WHERE id = ?
+                """, (contrato[0],))
                 
-                # Registrar o valor já recebido como confirmado
-                if valor_pago > 0:
-                    cursor.execute("""
-                        INSERT INTO lancamento_receita (data, tipo_receita, descricao, valor, status)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (data_hoje, "Cancelamentos", 
-                          f"Cancelamento Contrato #{contrato[0]} - {contrato[2]} - {nome_cliente} - Valor já recebido (mantido)", 
-                          valor_pago, "Recebido"))
+                # 2. Cancelar parcelas pendentes
+                cursor.execute("""
+                    UPDATE parcela_contrato 
+                    SET status = 'Cancelada' 
+                    WHERE contrato_id = ? AND status = 'Pendente'
+                """, (contrato[0],))
                 
-                # Não lança despesa; apenas marcar cashback como liberado
-                if contrato[6] > 0:  # cashback_valor
+                # 3. Liberar cashback
+                try:
                     cursor.execute("""
-                        INSERT INTO lancamento_despesa (data, tipo_despesa, descricao, valor, status)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (data_hoje, "Cashback", 
-                          f"Liberação Cashback - Cancelamento Contrato #{contrato[0]} - {nome_cliente}", 
-                          contrato[6], "Liberado"))
-                    
-            except Exception as e:
-                print(f"📝 Erro ao registrar movimentações: {e}")
-                # Registrar pelo menos o cancelamento básico
-                print(f"📝 Cancelamento registrado: Contrato #{contrato[0]} - {nome_cliente}")
-                print(f"💰 Valor pago mantido: R$ {valor_pago:.2f}")
-                print(f"💸 Receita perdida: R$ {valor_pendente:.2f}")
-                print(f"🎁 Cashback liberado: R$ {contrato[6]:.2f}")
-            
-            conn.commit()
-            conn.close()
+                        UPDATE cashback_cliente 
+                        SET status = 'Liberado', data_liberacao = ? 
+                        WHERE contrato_id = ?
+                    """, (data_hoje, contrato[0]))
+                except Exception:
+                    print(f"🎁 Cashback liberado por cancelamento: R$ {contrato[6]:.2f} - {nome_cliente}")
+                
+                # 4. Calcular valor pendente e registrar movimentações financeiras
+                valor_total_contrato = contrato[3]  # valor_total do contrato
+                valor_pendente = valor_total_contrato - valor_pago
+                
+                # Registrar o cancelamento com detalhes financeiros
+                try:
+                    # Se houver valor pendente, registrar como receita perdida
+                    if valor_pendente > 0:
+                        cursor.execute("""
+                            INSERT INTO lancamento_receita (data, tipo_receita, descricao, valor, status)
+                            VALUES (?, ?, ?, ?, ?)
+                        """, (data_hoje, "Cancelamentos", 
+                              f"Cancelamento Contrato #{contrato[0]} - {contrato[2]} - {nome_cliente} - Receita perdida", 
+                              -valor_pendente, "Cancelado"))
+                
+                    # Registrar o valor já recebido como confirmado
+                    if valor_pago > 0:
+                        cursor.execute("""
+                            INSERT INTO lancamento_receita (data, tipo_receita, descricao, valor, status)
+                            VALUES (?, ?, ?, ?, ?)
+                        """, (data_hoje, "Cancelamentos", 
+                              f"Cancelamento Contrato #{contrato[0]} - {contrato[2]} - {nome_cliente} - Valor já recebido (mantido)", 
+                              valor_pago, "Recebido"))
+                
+                    # Não lança despesa; apenas marcar cashback como liberado
+                    if contrato[6] > 0:  # cashback_valor
+                        cursor.execute("""
+                            INSERT INTO lancamento_despesa (data, tipo_despesa, descricao, valor, status)
+                            VALUES (?, ?, ?, ?, ?)
+                        """, (data_hoje, "Cashback", 
+                              f"Liberação Cashback - Cancelamento Contrato #{contrato[0]} - {nome_cliente}", 
+                              contrato[6], "Liberado"))
+                
+                except Exception as e:
+                    print(f"📝 Erro ao registrar movimentações: {e}")
+                    # Registrar pelo menos o cancelamento básico
+                    print(f"📝 Cancelamento registrado: Contrato #{contrato[0]} - {nome_cliente}")
+                    print(f"💰 Valor pago mantido: R$ {valor_pago:.2f}")
+                    print(f"💸 Receita perdida: R$ {valor_pendente:.2f}")
+                    print(f"🎁 Cashback liberado: R$ {contrato[6]:.2f}")
             
             messagebox.showinfo("Cancelamento Realizado", 
                 f"✅ Contrato #{contrato[0]} cancelado com sucesso!\n\n"
@@ -1546,16 +1499,11 @@ class InterfaceCadastroClientes:
             
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao cancelar contrato: {e}")
-            if 'conn' in locals():
-                conn.close()
 
     def _abrir_janela_cancelamento(self, contrato, cliente_id, nome_cliente):
         """Abre janela para cancelamento com valores editáveis"""
         try:
-            from db import get_connection
-            
-            conn = get_connection()
-            cursor = conn.cursor()
+            cursor = obter_conexao().cursor()
             
             # Buscar status das parcelas
             cursor.execute("""
@@ -1565,7 +1513,6 @@ class InterfaceCadastroClientes:
                 FROM parcela_contrato WHERE contrato_id = ?
             """, (contrato[0],))
             parcelas_info = cursor.fetchone()
-            conn.close()
             
             total_parcelas = parcelas_info[0]
             parcelas_pagas = parcelas_info[1]
@@ -1681,76 +1628,72 @@ class InterfaceCadastroClientes:
     def _processar_cancelamento_editavel(self, contrato, cliente_id, nome_cliente, receita_perdida, cashback_liberar, motivo, valor_pago, total_parcelas, parcelas_pagas):
         """Processa cancelamento com valores editáveis"""
         try:
-            from db import get_connection
             from datetime import datetime
             import uuid
             
-            conn = get_connection()
-            cursor = conn.cursor()
-            
             data_hoje = datetime.now().strftime("%d/%m/%Y")
             transacao_id = str(uuid.uuid4())[:8]
             
-            # 1. Cancelar contrato
-            cursor.execute("""
-                UPDATE contrato_curso 
-                SET status = 'Cancelado' 
-                WHERE id = ?
-            """, (contrato[0],))
-            
-            # 2. Cancelar parcelas pendentes
-            cursor.execute("""
-                UPDATE parcela_contrato 
-                SET status = 'Cancelada' 
-                WHERE contrato_id = ? AND status = 'Pendente'
-            """, (contrato[0],))
-            
-            # 3. Registrar histórico para estorno
-            cursor.execute("""
-                INSERT INTO historico_transacoes 
-                (transacao_id, tipo, contrato_id, valor_original, valor_transacao, 
-                 status_anterior, status_novo, data_transacao, observacoes)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (transacao_id, "CANCELAMENTO_CONTRATO", contrato[0], 
-                  contrato[3], receita_perdida, "Ativo", "Cancelado", data_hoje, motivo))
-            
-            # 4. Lançamentos financeiros
-            if receita_perdida > 0:
-                cursor.execute("""
-                    INSERT INTO lancamento_receita (data, tipo_receita, descricao, valor, status, observacoes)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (data_hoje, "Cancelamentos", 
-                      f"Cancelamento Contrato #{contrato[0]} - {contrato[2]} - {nome_cliente} - Receita perdida [ID: {transacao_id}]", 
-                      receita_perdida, "Cancelado", motivo))
-            
-            if valor_pago > 0:
+            with transacao_db() as conn:
+                cursor = conn.cursor()
+                
+                # 1. Cancelar contrato
                 cursor.execute("""
-                    INSERT INTO lancamento_receita (data, tipo_receita, descricao, valor, status, observacoes)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (data_hoje, "Cancelamentos", 
-                      f"Cancelamento Contrato #{contrato[0]} - {contrato[2]} - {nome_cliente} - Valor mantido [ID: {transacao_id}]", 
-                      valor_pago, "Recebido", f"Valor já recebido e mantido. {motivo}"))
-            
-            if cashback_liberar > 0:
+                    UPDATE contrato_curso 
+                    SET status = 'Cancelado' 
+                    WHERE id = ?
+                """, (contrato[0],))
+                
+                # 2. Cancelar parcelas pendentes
                 cursor.execute("""
-                    INSERT INTO lancamento_despesa (data, tipo_despesa, descricao, valor, status, observacoes)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (data_hoje, "Cashback", 
-                      f"Liberação Cashback - Cancelamento Contrato #{contrato[0]} - {nome_cliente} [ID: {transacao_id}]", 
-                      cashback_liberar, "Liberado", motivo))
-            
-            # 5. Liberar cashback
-            try:
+                    UPDATE parcela_contrato 
+                    SET status = 'Cancelada' 
+                    WHERE contrato_id = ? AND status = 'Pendente'
+                """, (contrato[0],))
+                
+                # 3. Registrar histórico para estorno
                 cursor.execute("""
-                    UPDATE cashback_cliente 
-                    SET status = 'Liberado', data_liberacao = ? 
-                    WHERE contrato_id = ?
-                """, (data_hoje, contrato[0]))
-            except Exception:
-                pass
-            
-            conn.commit()
-            conn.close()
+                    INSERT INTO historico_transacoes 
+                    (transacao_id, tipo, contrato_id, valor_original, valor_transacao, 
+                     status_anterior, status_novo, data_transacao, observacoes)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (transacao_id, "CANCELAMENTO_CONTRATO", contrato[0], 
+                      contrato[3], receita_perdida, "Ativo", "Cancelado", data_hoje, motivo))
+                
+                # 4. Lançamentos financeiros
+                if receita_perdida > 0:
+                    cursor.execute("""
+                        INSERT INTO lancamento_receita (data, tipo_receita, descricao, valor, status, observacoes)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, (data_hoje, "Cancelamentos", 
+                          f"Cancelamento Contrato #{contrato[0]} - {contrato[2]} - {nome_cliente} - Receita perdida [ID: {transacao_id}]", 
+                          receita_perdida, "Cancelado", motivo))
+                
+                if valor_pago > 0:
+                    cursor.execute("""
+                        INSERT INTO lancamento_receita (data, tipo_receita, descricao, valor, status, observacoes)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, (data_hoje, "Cancelamentos", 
+                          f"Cancelamento Contrato #{contrato[0]} - {contrato[2]} - {nome_cliente} - Valor mantido [ID: {transacao_id}]", 
+                          valor_pago, "Recebido", f"Valor já recebido e mantido. {motivo}"))
+                
+                if cashback_liberar > 0:
+                    cursor.execute("""
+                        INSERT INTO lancamento_despesa (data, tipo_despesa, descricao, valor, status, observacoes)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, (data_hoje, "Cashback", 
+                          f"Liberação Cashback - Cancelamento Contrato #{contrato[0]} - {nome_cliente} [ID: {transacao_id}]", 
+                          cashback_liberar, "Liberado", motivo))
+                
+                # 5. Liberar cashback
+                try:
+                    cursor.execute("""
+                        UPDATE cashback_cliente 
+                        SET status = 'Liberado', data_liberacao = ? 
+                        WHERE contrato_id = ?
+                    """, (data_hoje, contrato[0]))
+                except Exception:
+                    pass
             
             messagebox.showinfo("Cancelamento Realizado", 
                 f"✅ Contrato #{contrato[0]} cancelado com sucesso!\n\n"
@@ -1767,8 +1710,6 @@ class InterfaceCadastroClientes:
             
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao processar cancelamento: {e}")
-            if 'conn' in locals():
-                conn.close()
 
     def _abrir_janela_estorno(self, contrato, cliente_id, nome_cliente):
         """Abre janela para estorno de transações"""
@@ -1806,10 +1747,7 @@ class InterfaceCadastroClientes:
         
         # Carregar transações
         try:
-            from db import get_connection
-            
-            conn = get_connection()
-            cursor = conn.cursor()
+            cursor = obter_conexao().cursor()
             cursor.execute("""
                 SELECT transacao_id, tipo, data_transacao, valor_transacao, 
                        CASE WHEN pode_estornar = 1 THEN 'Pode estornar' ELSE 'Já estornado' END,
@@ -1819,7 +1757,6 @@ class InterfaceCadastroClientes:
                 ORDER BY created_at DESC
             """, (contrato[0],))
             transacoes = cursor.fetchall()
-            conn.close()
             
             for transacao in transacoes:
                 tree.insert("", "end", values=transacao)
@@ -1875,11 +1812,9 @@ class InterfaceCadastroClientes:
     def _processar_estorno(self, transacao_id, contrato, nome_cliente, janela_estorno):
         """Processa o estorno de uma transação"""
         try:
-            from db import get_connection
             from datetime import datetime
             
-            conn = get_connection()
-            cursor = conn.cursor()
+            cursor = obter_conexao().cursor()
             
             # Buscar dados da transação original
             cursor.execute("""
@@ -1890,70 +1825,69 @@ class InterfaceCadastroClientes:
             
             if not transacao:
                 messagebox.showerror("Erro", "Transação não encontrada ou já foi estornada!")
-                conn.close()
                 return
             
             data_hoje = datetime.now().strftime("%d/%m/%Y")
             
-            # Processar estorno baseado no tipo
-            if transacao[2] == "PAGAMENTO_PARCELA":  # tipo
-                # Reverter parcela para pendente
-                cursor.execute("""
-                    UPDATE parcela_contrato 
-                    SET status = ?, data_pagamento = NULL, valor = ?
-                    WHERE id = ?
-                """, (transacao[7], transacao[5], transacao[4]))  # status_anterior, valor_original, parcela_id
+            with transacao_db() as conn:
+                cursor = conn.cursor()
                 
-                # Estornar receita
-                cursor.execute("""
-                    INSERT INTO lancamento_receita (data, tipo_receita, descricao, valor, status, observacoes)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (data_hoje, "Estornos", 
-                      f"ESTORNO - Pagamento Parcela - {nome_cliente} [Original: {transacao_id}]", 
-                      -transacao[6], "Estornado", f"Estorno da transação {transacao_id}"))  # valor_transacao
+                # Processar estorno baseado no tipo
+                if transacao[2] == "PAGAMENTO_PARCELA":  # tipo
+                    # Reverter parcela para pendente
+                    cursor.execute("""
+                        UPDATE parcela_contrato 
+                        SET status = ?, data_pagamento = NULL, valor = ?
+                        WHERE id = ?
+                    """, (transacao[7], transacao[5], transacao[4]))  # status_anterior, valor_original, parcela_id
                 
-            elif transacao[2] == "CANCELAMENTO_CONTRATO":  # tipo
-                # Reverter contrato para ativo
-                cursor.execute("""
-                    UPDATE contrato_curso 
-                    SET status = ? 
-                    WHERE id = ?
-                """, (transacao[7], transacao[3]))  # status_anterior, contrato_id
+                    # Estornar receita
+                    cursor.execute("""
+                        INSERT INTO lancamento_receita (data, tipo_receita, descricao, valor, status, observacoes)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, (data_hoje, "Estornos", 
+                          f"ESTORNO - Pagamento Parcela - {nome_cliente} [Original: {transacao_id}]", 
+                          -transacao[6], "Estornado", f"Estorno da transação {transacao_id}"))  # valor_transacao
+                
+                elif transacao[2] == "CANCELAMENTO_CONTRATO":  # tipo
+                    # Reverter contrato para ativo
+                    cursor.execute("""
+                        UPDATE contrato_curso 
+                        SET status = ? 
+                        WHERE id = ?
+                    """, (transacao[7], transacao[3]))  # status_anterior, contrato_id
                 
-                # Reverter parcelas canceladas para pendente
+                    # Reverter parcelas canceladas para pendente
+                    cursor.execute("""
+                        UPDATE parcela_contrato 
+                        SET status = 'Pendente' 
+                        WHERE contrato_id = ? AND status = 'Cancelada'
+                    """, (transacao[3],))  # contrato_id
+                
+                    # Estornar lançamentos
+                    cursor.execute("""
+                        INSERT INTO lancamento_receita (data, tipo_receita, descricao, valor, status, observacoes)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, (data_hoje, "Estornos", 
+                          f"ESTORNO - Cancelamento Contrato #{transacao[3]} - {nome_cliente} [Original: {transacao_id}]", 
+                          transacao[6], "Estornado", f"Estorno da transação {transacao_id}"))
+                
+                # Marcar transação como estornada
                 cursor.execute("""
-                    UPDATE parcela_contrato 
-                    SET status = 'Pendente' 
-                    WHERE contrato_id = ? AND status = 'Cancelada'
-                """, (transacao[3],))  # contrato_id
+                    UPDATE historico_transacoes 
+                    SET pode_estornar = 0 
+                    WHERE transacao_id = ?
+                """, (transacao_id,))
                 
-                # Estornar lançamentos
+                # Registrar o estorno
                 cursor.execute("""
-                    INSERT INTO lancamento_receita (data, tipo_receita, descricao, valor, status, observacoes)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (data_hoje, "Estornos", 
-                      f"ESTORNO - Cancelamento Contrato #{transacao[3]} - {nome_cliente} [Original: {transacao_id}]", 
-                      transacao[6], "Estornado", f"Estorno da transação {transacao_id}"))
-            
-            # Marcar transação como estornada
-            cursor.execute("""
-                UPDATE historico_transacoes 
-                SET pode_estornar = 0 
-                WHERE transacao_id = ?
-            """, (transacao_id,))
-            
-            # Registrar o estorno
-            cursor.execute("""
-                INSERT INTO historico_transacoes 
-                (transacao_id, tipo, contrato_id, valor_transacao, status_anterior, status_novo, 
-                 data_transacao, observacoes, pode_estornar)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (f"EST_{transacao_id}", f"ESTORNO_{transacao[2]}", transacao[3], 
-                  transacao[6], transacao[8], transacao[7], data_hoje, 
-                  f"Estorno da transação {transacao_id}", 0))
-            
-            conn.commit()
-            conn.close()
+                    INSERT INTO historico_transacoes 
+                    (transacao_id, tipo, contrato_id, valor_transacao, status_anterior, status_novo, 
+                     data_transacao, observacoes, pode_estornar)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (f"EST_{transacao_id}", f"ESTORNO_{transacao[2]}", transacao[3], 
+                      transacao[6], transacao[8], transacao[7], data_hoje, 
+                      f"Estorno da transação {transacao_id}", 0))
             
             messagebox.showinfo("Estorno Realizado", 
                 f"✅ Estorno processado com sucesso!\n\n"
@@ -1967,8 +1901,6 @@ class InterfaceCadastroClientes:
             
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao processar estorno: {e}")
-            if 'conn' in locals():
-                conn.close()
 
 
 # Função para criar máscaras de entrada
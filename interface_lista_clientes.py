@@ -11,12 +11,34 @@ from typing import List, Dict, Any, Optional
 import logging
 
 class InterfaceListaClientes:
-    """Interface para listar e gerenciar clientes"""
+    """Interface para listar e gerenciar clientes
+    
+    A lista é virtual: a Treeview mantém apenas as linhas da janela visível,
+    reaproveitadas durante a rolagem, e cada linha é formatada sob demanda.
+    """
+    
+    # Linhas formatadas antecipadamente acima e abaixo da janela visível
+    LINHAS_BUFFER = 20
+    # Limite de linhas formatadas mantidas em cache
+    LIMITE_CACHE_LINHAS = 2000
+    # Espera (ms) após a última tecla antes de filtrar
+    ATRASO_BUSCA_MS = 200
+    # Campos do cadastro lidos para cada linha
+    CAMPOS_LINHA = ("nome", "cpf", "telefone_celular", "telefone_residencial", "email",
+                    "loja_cadastro", "renda_mensal", "limite_credito")
     
     def __init__(self, parent, gerenciador_dados):
         self.parent = parent
         self.gerenciador_dados = gerenciador_dados
         
+        # Estado da lista virtual
+        self.indices_filtrados = range(0)
+        self.inicio = 0
+        self.linhas_visiveis = 15
+        self.indice_selecionado = None
+        self._cache_linhas = {}
+        self._filtro_agendado = None
+        
         self._criar_interface()
         self._atualizar_lista()
     
@@ -49,7 +71,7 @@ class InterfaceListaClientes:
         ttk.Label(frame, text="Buscar:").pack(side="left", padx=(0, 5))
         self.entry_busca = ttk.Entry(frame, width=30)
         self.entry_busca.pack(side="left", padx=(0, 10))
-        self.entry_busca.bind('<KeyRelease>', lambda e: self._filtrar_clientes())
+        self.entry_busca.bind('<KeyRelease>', lambda e: self._agendar_filtro())
         
         # Filtro por loja
         ttk.Label(frame, text="Loja:").pack(side="left", padx=(20, 5))
@@ -92,16 +114,28 @@ class InterfaceListaClientes:
         self.tree.column("renda", width=100)
         self.tree.column("limite", width=100)
         
-        # Scrollbar
-        scrollbar = ttk.Scrollbar(frame_lista, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        # Scrollbar controla a janela virtual, não a Treeview
+        self.scrollbar = ttk.Scrollbar(frame_lista, orient="vertical", command=self._rolar)
         
         # Pack
         self.tree.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        self.scrollbar.pack(side="right", fill="y")
         
         # Bind duplo clique para editar
         self.tree.bind('<Double-1>', lambda e: self._editar_cliente())
+        
+        # Rolagem e navegação da lista virtual
+        self.tree.bind('<Configure>', self._ajustar_linhas_visiveis)
+        self.tree.bind('<<TreeviewSelect>>', self._registrar_selecao)
+        self.tree.bind('<MouseWheel>', lambda e: self._rolar("scroll", -e.delta // 120 * 3, "units"))
+        self.tree.bind('<Button-4>', lambda e: self._rolar("scroll", -3, "units"))
+        self.tree.bind('<Button-5>', lambda e: self._rolar("scroll", 3, "units"))
+        self.tree.bind('<Up>', lambda e: self._mover_selecao(-1))
+        self.tree.bind('<Down>', lambda e: self._mover_selecao(1))
+        self.tree.bind('<Prior>', lambda e: self._mover_selecao(-self.linhas_visiveis))
+        self.tree.bind('<Next>', lambda e: self._mover_selecao(self.linhas_visiveis))
+        self.tree.bind('<Home>', lambda e: self._mover_selecao(-len(self.indices_filtrados)))
+        self.tree.bind('<End>', lambda e: self._mover_selecao(len(self.indices_filtrados)))
     
     def _criar_botoes_acao(self, parent):
         """Cria botões de ação"""
@@ -116,65 +150,157 @@ class InterfaceListaClientes:
     
     def _atualizar_lista(self):
         """Atualiza a lista de clientes"""
-        # Limpar lista
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # Adicionar clientes
-        for i, cliente in enumerate(self.gerenciador_dados.dados['cadastros']):
-            # Formatar dados
-            cpf_formatado = self._formatar_cpf(cliente.cpf) if cliente.cpf else ""
-            telefone_principal = cliente.telefone_celular or cliente.telefone_residencial or ""
-            renda_formatada = f"R$ {cliente.renda_mensal:.2f}" if cliente.renda_mensal > 0 else ""
-            limite_formatado = f"R$ {cliente.limite_credito:.2f}" if cliente.limite_credito > 0 else ""
-            
-            # Inserir na lista
-            self.tree.insert("", "end", values=(
-                cliente.nome,
-                cpf_formatado,
-                telefone_principal,
-                cliente.email,
-                cliente.loja_cadastro,
-                renda_formatada,
-                limite_formatado
-            ), tags=(i,))
+        # Dados podem ter mudado: descartar linhas já formatadas
+        self._cache_linhas.clear()
+        self.indice_selecionado = None
+        self.indices_filtrados = range(len(self.gerenciador_dados.dados['cadastros']))
+        self._exibir_a_partir(0)
+    
+    def _agendar_filtro(self):
+        """Filtra apenas quando a digitação pausar"""
+        if self._filtro_agendado is not None:
+            self.janela.after_cancel(self._filtro_agendado)
+        self._filtro_agendado = self.janela.after(self.ATRASO_BUSCA_MS, self._filtrar_clientes)
     
     def _filtrar_clientes(self):
         """Filtra clientes conforme critérios"""
-        # Limpar lista
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        if self._filtro_agendado is not None:
+            self.janela.after_cancel(self._filtro_agendado)
+            self._filtro_agendado = None
         
         # Obter filtros
-        busca = self.entry_busca.get().lower()
+        busca = self.entry_busca.get()
         loja_filtro = self.combo_loja.get()
         
-        # Filtrar clientes
-        for i, cliente in enumerate(self.gerenciador_dados.dados['cadastros']):
-            # Filtro de busca
-            if busca and busca not in cliente.nome.lower() and busca not in cliente.cpf:
-                continue
-            
-            # Filtro de loja
-            if loja_filtro != "Todas" and cliente.loja_cadastro != loja_filtro:
-                continue
-            
-            # Formatar dados
-            cpf_formatado = self._formatar_cpf(cliente.cpf) if cliente.cpf else ""
-            telefone_principal = cliente.telefone_celular or cliente.telefone_residencial or ""
-            renda_formatada = f"R$ {cliente.renda_mensal:.2f}" if cliente.renda_mensal > 0 else ""
-            limite_formatado = f"R$ {cliente.limite_credito:.2f}" if cliente.limite_credito > 0 else ""
-            
-            # Inserir na lista
-            self.tree.insert("", "end", values=(
-                cliente.nome,
-                cpf_formatado,
-                telefone_principal,
-                cliente.email,
-                cliente.loja_cadastro,
-                renda_formatada,
-                limite_formatado
-            ), tags=(i,))
+        # Consulta ao índice de busca (apenas posições; a formatação fica para a exibição)
+        self.indices_filtrados = self.gerenciador_dados.buscar_clientes(
+            busca, None if loja_filtro == "Todas" else loja_filtro
+        )
+        self._exibir_a_partir(0)
+    
+    def _linha_cliente(self, indice):
+        """Retorna os valores formatados da linha do cliente (com cache)"""
+        linha = self._cache_linhas.get(indice)
+        if linha is not None:
+            return linha
+        
+        # Apenas as colunas exibidas (sem converter o cadastro inteiro)
+        (nome, cpf, telefone_celular, telefone_residencial, email, loja_cadastro,
+         renda_mensal, limite_credito) = self.gerenciador_dados.valores_cliente(indice, self.CAMPOS_LINHA)
+        
+        # Formatar dados
+        cpf_formatado = self._formatar_cpf(cpf) if cpf else ""
+        telefone_principal = telefone_celular or telefone_residencial or ""
+        renda_formatada = f"R$ {renda_mensal:.2f}" if renda_mensal > 0 else ""
+        limite_formatado = f"R$ {limite_credito:.2f}" if limite_credito > 0 else ""
+        
+        linha = (
+            nome,
+            cpf_formatado,
+            telefone_principal,
+            email,
+            loja_cadastro,
+            renda_formatada,
+            limite_formatado
+        )
+        
+        if len(self._cache_linhas) >= self.LIMITE_CACHE_LINHAS:
+            self._cache_linhas.clear()
+        self._cache_linhas[indice] = linha
+        return linha
+    
+    def _exibir_a_partir(self, inicio):
+        """Preenche as linhas da Treeview com a janela que começa em 'inicio'"""
+        total = len(self.indices_filtrados)
+        inicio = max(0, min(inicio, total - self.linhas_visiveis))
+        fim = min(total, inicio + self.linhas_visiveis)
+        self.inicio = inicio
+        
+        # Ajustar a quantidade de linhas materializadas à janela
+        itens = list(self.tree.get_children())
+        while len(itens) < fim - inicio:
+            itens.append(self.tree.insert("", "end"))
+        if len(itens) > fim - inicio:
+            self.tree.delete(*itens[fim - inicio:])
+            del itens[fim - inicio:]
+        
+        # Reaproveitar as linhas existentes com os clientes da janela
+        selecionar = ()
+        for item, posicao in zip(itens, range(inicio, fim)):
+            indice = self.indices_filtrados[posicao]
+            self.tree.item(item, values=self._linha_cliente(indice), tags=(indice,))
+            if indice == self.indice_selecionado:
+                selecionar = (item,)
+        
+        # Manter a seleção no cliente, não na posição da linha
+        if tuple(self.tree.selection()) != selecionar:
+            self.tree.selection_set(selecionar)
+        if selecionar:
+            self.tree.focus(selecionar[0])
+        
+        if total:
+            self.scrollbar.set(inicio / total, fim / total)
+        else:
+            self.scrollbar.set(0, 1)
+        
+        # Formatar antecipadamente as linhas próximas à janela
+        buffer_inicio = max(0, inicio - self.LINHAS_BUFFER)
+        buffer_fim = min(total, fim + self.LINHAS_BUFFER)
+        for posicao in range(buffer_inicio, buffer_fim):
+            self._linha_cliente(self.indices_filtrados[posicao])
+    
+    def _rolar(self, *args):
+        """Trata os comandos de rolagem (scrollbar e roda do mouse)"""
+        if args[0] == "moveto":
+            inicio = int(float(args[1]) * len(self.indices_filtrados))
+        elif args[0] == "scroll":
+            passo = int(args[1])
+            if args[2] == "pages":
+                passo *= self.linhas_visiveis
+            inicio = self.inicio + passo
+        else:
+            return
+        
+        if inicio != self.inicio:
+            self._exibir_a_partir(inicio)
+        return "break"
+    
+    def _ajustar_linhas_visiveis(self, event):
+        """Recalcula quantas linhas cabem na Treeview após redimensionamento"""
+        altura_linha = ttk.Style().lookup("Treeview", "rowheight")
+        altura_linha = int(altura_linha) if altura_linha else 20
+        # Descontar a altura do cabeçalho
+        linhas = max(1, (event.height - 25) // altura_linha)
+        if linhas != self.linhas_visiveis:
+            self.linhas_visiveis = linhas
+            self._exibir_a_partir(self.inicio)
+    
+    def _registrar_selecao(self, event):
+        """Guarda o índice do cliente selecionado para mantê-lo durante a rolagem"""
+        selecionado = self.tree.selection()
+        if selecionado:
+            self.indice_selecionado = int(self.tree.item(selecionado[0])['tags'][0])
+    
+    def _mover_selecao(self, passo):
+        """Move a seleção pelo teclado, rolando a janela virtual quando necessário"""
+        total = len(self.indices_filtrados)
+        if not total:
+            return "break"
+        
+        itens = self.tree.get_children()
+        focado = self.tree.focus()
+        atual = self.inicio + itens.index(focado) if focado in itens else self.inicio
+        destino = max(0, min(total - 1, atual + passo))
+        
+        inicio = self.inicio
+        if destino < inicio:
+            inicio = destino
+        elif destino >= inicio + len(itens):
+            inicio = destino - self.linhas_visiveis + 1
+        
+        self.indice_selecionado = self.indices_filtrados[destino]
+        self._exibir_a_partir(inicio)
+        return "break"
     
     def _formatar_cpf(self, cpf):
         """Formata CPF para exibição"""
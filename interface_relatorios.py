@@ -10,21 +10,37 @@ from tkinter import ttk, messagebox, filedialog
 import os
 import sys
 import json
+import queue
 import logging
+import threading
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from datetime import datetime, timedelta
 import calendar
-from typing import Dict, List, Any, Optional, Tuple
+from itertools import count
+from typing import List, Optional, Tuple
 from decimal import Decimal
 
 # Garantir que os módulos no mesmo diretório possam ser importados
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from agregacao_relatorios import CacheResultados, agrupar_periodos, quadro_registros, quadro_resumo
+from exportacao_relatorios import exportar_relatorio, planilhas_relatorio
+from graficos_relatorios import desenhar_distribuicao, desenhar_grafico
+from pdf_relatorios import renderizar_pdf
+from conexoes_db import conexao_avulsa
+from consultas_financeiras import de_dia_juliano
+from eventos_clientes import eventos_por_dia, versao_eventos
+from estatisticas_relatorios import EstatisticasRelatorio
+
 class InterfaceRelatorios:
     """Interface para geração e visualização de relatórios"""
     
+    # Resultados agrupados por (tipo, início, fim, agrupamento, versão dos dados),
+    # compartilhados entre as janelas de relatório
+    _cache_resultados = CacheResultados(capacidade=32)
+    
     def __init__(self, parent, gerenciador_dados, tipo_relatorio="vendas"):
         self.parent = parent
         self.gerenciador_dados = gerenciador_dados
@@ -45,8 +61,24 @@ class InterfaceRelatorios:
         self.data_inicio = datetime.now().replace(day=1)  # Primeiro dia do mês atual
         self.data_fim = datetime.now()  # Hoje
         
+        # Geração em segundo plano: só o pedido mais recente é exibido
+        self._geracao = 0
+        self._geracao_em_calculo = 0
+        self._fila_resultados = queue.Queue()
+        self._verificacao_agendada = None
+        self._passo_progresso = 0
+        
+        # Figuras criadas uma única vez por janela e redesenhadas no lugar
+        self._grafico = None
+        self._distribuicao = None
+        
+        # Último resultado exibido (troca do tipo de gráfico sem recalcular)
+        self._dados_exibidos = None
+        self._estatisticas_exibidas = None
+        
         # Criar interface
         self._criar_interface()
+        self.janela.protocol("WM_DELETE_WINDOW", self._fechar)
         
         # Gerar relatório inicial
         self._gerar_relatorio()
@@ -120,7 +152,8 @@ class InterfaceRelatorios:
         
         for i, (texto, valor) in enumerate(agrupamentos):
             ttk.Radiobutton(agrupamento_frame, text=texto, value=valor, 
-                           variable=self.var_agrupamento).pack(side="left", padx=5)
+                           variable=self.var_agrupamento, 
+                           command=self._gerar_relatorio).pack(side="left", padx=5)
         
         # Botão para gerar relatório
         ttk.Button(filtro_grid, text="Gerar Relatório", 
@@ -143,6 +176,8 @@ class InterfaceRelatorios:
         # Botão de exportação
         ttk.Button(acoes_frame, text="Exportar", 
                   command=lambda: self._exportar_dados()).pack(side="left", padx=5)
+        ttk.Button(acoes_frame, text="PDF", 
+                  command=lambda: self._exportar_dados("pdf")).pack(side="left", padx=5)
         
         # Frame central - Notebook com abas
         self.notebook = ttk.Notebook(main_frame)
@@ -233,24 +268,123 @@ class InterfaceRelatorios:
             messagebox.showerror("Erro", "Formato de data inválido! Use DD/MM/AAAA.")
     
     def _gerar_relatorio(self):
-        """Gera o relatório com base nos filtros selecionados"""
+        """Gera o relatório com base nos filtros selecionados
+        
+        Resultados já calculados para os mesmos filtros e a mesma versão dos
+        dados vêm do cache. Os demais são obtidos e agrupados em uma thread de
+        trabalho; o resultado volta pela fila e é exibido pela verificação
+        periódica (after). Pedidos feitos antes do último são descartados.
+        """
+        # Filtros lidos na thread da interface (variáveis Tk não são thread-safe)
+        parametros = (self.tipo_relatorio, self.data_inicio, self.data_fim, self.var_agrupamento.get())
+        
+        self._geracao += 1
+        
+        # Versão das vendas em memória; a dos clientes é lida do banco na thread de trabalho
+        chave = None
+        if self.tipo_relatorio == "vendas":
+            chave = self._chave_cache(parametros, self.gerenciador_dados.versao_dados)
+            resultado = self._cache_resultados.obter(chave)
+            if resultado is not None:
+                self._exibir_relatorio(*resultado)
+                return
+        
+        self._geracao_em_calculo = self._geracao
+        threading.Thread(target=self._calcular_relatorio, args=(self._geracao, parametros, chave),
+                         daemon=True).start()
+        
+        if self._verificacao_agendada is None:
+            self._passo_progresso = 0
+            self._verificar_resultados()
+    
+    def _chave_cache(self, parametros, versao):
+        """Chave do resultado no cache (datas sem horário e versão dos dados)"""
+        tipo_relatorio, data_inicio, data_fim, agrupamento = parametros
+        return (tipo_relatorio, data_inicio.date(), data_fim.date(), agrupamento, versao)
+    
+    def _calcular_relatorio(self, geracao, parametros, chave):
+        """Obtém e agrupa os dados (executado fora da thread da interface)
+        
+        O relatório de clientes vem do sistema.db, gravado também pelas telas
+        de contratos e contatos: a versão da chave é a do último evento de
+        cliente, lida aqui na mesma conexão da consulta. Um resultado já em
+        cache volta pela fila sem consultar os eventos.
+        """
+        tipo_relatorio, data_inicio, data_fim, agrupamento = parametros
         try:
             # Obter dados conforme o tipo de relatório
-            if self.tipo_relatorio == "vendas":
-                dados = self._obter_dados_vendas()
+            if tipo_relatorio == "vendas":
+                dados = self._obter_dados_vendas(data_inicio, data_fim)
             else:  # clientes
-                dados = self._obter_dados_clientes()
+                # Conexão própria: a thread do cálculo termina ao fim do relatório
+                with conexao_avulsa() as conn:
+                    chave = self._chave_cache(parametros, versao_eventos(conn))
+                    resultado = self._cache_resultados.obter(chave)
+                    if resultado is not None:
+                        self._fila_resultados.put((geracao, resultado, None))
+                        return
+                    dados = self._obter_dados_clientes(conn, data_inicio, data_fim)
+            
+            # Pedido substituído por outro mais recente: não vale agrupar
+            if geracao != self._geracao:
+                return
             
-            # Agrupar dados
-            dados_agrupados = self._agrupar_dados(dados)
+            resultado = self._agrupar_dados(dados, agrupamento)
+            self._cache_resultados.guardar(chave, resultado)
+            self._fila_resultados.put((geracao, resultado, None))
+        except Exception as e:
+            logging.error(f"Erro ao gerar relatório: {e}", exc_info=True)
+            self._fila_resultados.put((geracao, None, e))
+    
+    def _verificar_resultados(self):
+        """Exibe o resultado do pedido mais recente e anima o progresso"""
+        self._verificacao_agendada = None
+        
+        resultado = None
+        try:
+            while True:
+                item = self._fila_resultados.get_nowait()
+                if item[0] == self._geracao:
+                    resultado = item
+        except queue.Empty:
+            pass
+        
+        try:
+            if resultado is None:
+                # Último pedido atendido pelo cache: nada mais a aguardar
+                if self._geracao_em_calculo != self._geracao:
+                    return
+                
+                # Ainda calculando: indicador de progresso e nova verificação
+                self._passo_progresso += 1
+                pontos = "." * (self._passo_progresso // 6 % 4)
+                self.lbl_status.config(text=f"Gerando relatório{pontos}")
+                self._verificacao_agendada = self.janela.after(50, self._verificar_resultados)
+                return
             
+            _, dados, erro = resultado
+            if erro is not None:
+                self.lbl_status.config(text="Erro ao gerar relatório")
+                messagebox.showerror("Erro", f"Erro ao gerar relatório: {erro}")
+                return
+            
+            self._exibir_relatorio(*dados)
+        except tk.TclError:
+            # Janela fechada durante a geração
+            pass
+    
+    def _exibir_relatorio(self, dados_agrupados, estatisticas):
+        """Atualiza as visualizações com os dados agrupados (thread da interface)"""
+        self._dados_exibidos = dados_agrupados
+        self._estatisticas_exibidas = estatisticas
+        try:
             # Atualizar visualizações
             self._atualizar_grafico(dados_agrupados)
             self._atualizar_tabela(dados_agrupados)
-            self._atualizar_resumo(dados_agrupados)
+            self._atualizar_resumo(dados_agrupados, estatisticas)
             
             # Atualizar estatísticas
-            self._atualizar_estatisticas(dados_agrupados)
+            self._atualizar_estatisticas(estatisticas)
             
             # Atualizar status
             periodo_str = f"{self.data_inicio.strftime('%d/%m/%Y')} a {self.data_fim.strftime('%d/%m/%Y')}"
@@ -260,176 +394,110 @@ class InterfaceRelatorios:
             messagebox.showerror("Erro", f"Erro ao gerar relatório: {e}")
             logging.error(f"Erro ao gerar relatório: {e}", exc_info=True)
     
-    def _obter_dados_vendas(self):
-        """Obtém dados de vendas do período selecionado"""
-        # Obter vendas do gerenciador de dados
-        vendas = self.gerenciador_dados.dados.get('historico_vendas', [])
-        
-        # Filtrar por período
-        dados_filtrados = []
-        for venda in vendas:
-            try:
-                # Converter timestamp para datetime
-                data_venda = datetime.strptime(venda.timestamp, "%Y-%m-%d %H:%M:%S")
-                
-                # Verificar se está no período
-                if self.data_inicio.date() <= data_venda.date() <= self.data_fim.date():
-                    dados_filtrados.append({
-                        'data': data_venda,
-                        'valor': float(venda.total),
-                        'produto': venda.produto,
-                        'quantidade': venda.quantidade,
-                        'loja': venda.codigo_loja
-                    })
-            except (ValueError, AttributeError) as e:
-                logging.warning(f"Erro ao processar venda: {e}")
-        
-        return dados_filtrados
-    
-    def _obter_dados_clientes(self):
-        """Obtém dados de clientes do período selecionado"""
-        # Para este exemplo, vamos simular dados de clientes
-        # Em um sistema real, isso seria baseado em dados reais de cadastro/atividade
-        
-        # Obter clientes do gerenciador de dados
-        clientes = self.gerenciador_dados.dados.get('cadastros', [])
-        
-        # Simular dados de atividade para cada cliente
-        import random
-        dados_filtrados = []
-        
-        for cliente in clientes:
-            # Gerar uma data aleatória dentro do período para simular cadastro/atividade
-            dias_periodo = (self.data_fim - self.data_inicio).days
-            if dias_periodo <= 0:
-                dias_periodo = 1
-            
-            dias_aleatorios = random.randint(0, dias_periodo)
-            data_atividade = self.data_inicio + timedelta(days=dias_aleatorios)
-            
-            # Verificar se está no período (sempre estará neste caso, mas mantemos para consistência)
-            if self.data_inicio.date() <= data_atividade.date() <= self.data_fim.date():
-                dados_filtrados.append({
-                    'data': data_atividade,
-                    'valor': float(cliente.limite_credito) if hasattr(cliente, 'limite_credito') else 0,
-                    'nome': cliente.nome,
-                    'id': cliente.id,
-                    'cidade': cliente.cidade
-                })
-        
-        return dados_filtrados
+    def _fechar(self):
+        """Fecha a janela cancelando a geração pendente e liberando as figuras"""
+        # Pedidos em andamento passam a ser descartados
+        self._geracao += 1
+        if self._verificacao_agendada is not None:
+            self.janela.after_cancel(self._verificacao_agendada)
+            self._verificacao_agendada = None
+        
+        for figura in (self._grafico, self._distribuicao):
+            if figura is not None:
+                figura[0].clear()
+        self._grafico = self._distribuicao = None
+        
+        self.janela.destroy()
     
-    def _agrupar_dados(self, dados):
-        """Agrupa os dados conforme selecionado"""
-        agrupamento = self.var_agrupamento.get()
-        dados_agrupados = {}
+    def _obter_dados_vendas(self, data_inicio, data_fim):
+        """Obtém dados de vendas do período informado"""
+        # Resumo diário por loja e produto: uma linha por combinação, não por venda
+        linhas = self.gerenciador_dados.resumo_vendas.linhas(data_inicio.date(), data_fim.date())
         
-        for item in dados:
-            data = item['data']
-            
-            # Determinar chave de agrupamento
-            if agrupamento == "diario":
-                chave = data.strftime("%d/%m/%Y")
-            elif agrupamento == "semanal":
-                # Número da semana no ano
-                semana = data.isocalendar()[1]
-                chave = f"Semana {semana}/{data.year}"
-            elif agrupamento == "mensal":
-                chave = data.strftime("%m/%Y")
-            else:  # anual
-                chave = str(data.year)
-            
-            # Inicializar grupo se não existir
-            if chave not in dados_agrupados:
-                dados_agrupados[chave] = {
-                    'valor_total': 0,
-                    'quantidade': 0,
-                    'itens': []
-                }
-            
-            # Adicionar dados ao grupo
-            dados_agrupados[chave]['valor_total'] += item['valor']
-            dados_agrupados[chave]['quantidade'] += 1
-            dados_agrupados[chave]['itens'].append(item)
-        
-        # Ordenar por chave (data)
-        return dict(sorted(dados_agrupados.items()))
+        # Colunas tipadas para a agregação vetorizada
+        return quadro_resumo(linhas)
+    
+    def _obter_dados_clientes(self, conn, data_inicio, data_fim):
+        """Obtém os eventos de clientes do período informado
+        
+        Cadastros, contratos, pagamentos e contatos da tabela evento_cliente,
+        já somados por dia na consulta (faixa do índice de data).
+        """
+        dias = eventos_por_dia(conn, data_inicio, data_fim)
+        
+        return [{
+            'data': de_dia_juliano(dia),
+            'valor': valor,
+            'registros': quantidade
+        } for dia, quantidade, valor in dias]
+    
+    def _agrupar_dados(self, dados, agrupamento):
+        """Agrupa os dados pelo agrupamento informado (ordem cronológica)
+        
+        Returns:
+            tuple: (dados agrupados, estatísticas calculadas na mesma passagem)
+        """
+        if not isinstance(dados, pd.DataFrame):
+            dados = quadro_registros(dados)
+        estatisticas = EstatisticasRelatorio()
+        return agrupar_periodos(dados, agrupamento, estatisticas), estatisticas
     
     def _atualizar_grafico(self, dados_agrupados=None):
         """Atualiza o gráfico com os dados"""
         if dados_agrupados is None:
-            # Se não recebeu dados, tenta gerar o relatório novamente
-            self._gerar_relatorio()
-            return
+            # Troca do tipo de gráfico: redesenhar o último resultado
+            if self._dados_exibidos is None:
+                self._gerar_relatorio()
+                return
+            dados_agrupados = self._dados_exibidos
         
-        # Limpar frame do gráfico
-        for widget in self.frame_grafico.winfo_children():
-            widget.destroy()
+        # Figura e canvas da janela, criados na primeira exibição
+        if self._grafico is None:
+            self._grafico = self._criar_figura(self.frame_grafico, (10, 6))
+        fig, canvas, _ = self._grafico
         
         # Verificar se há dados para mostrar
         if not dados_agrupados:
-            ttk.Label(self.frame_grafico, text="Sem dados para exibir no período selecionado").pack(pady=20)
+            self._exibir_sem_dados(self._grafico)
             return
+        self._exibir_figura(self._grafico)
         
-        # Criar figura do matplotlib
-        fig, ax = plt.subplots(figsize=(10, 6))
-        
-        # Preparar dados
-        labels = list(dados_agrupados.keys())
-        valores = [dados['valor_total'] for dados in dados_agrupados.values()]
+        # Redesenhar nos mesmos eixos
+        fig.clear()
+        ax = fig.add_subplot()
         
-        # Tipo de gráfico
-        tipo_grafico = self.var_tipo_grafico.get()
-        
-        if tipo_grafico == "barras":
-            ax.bar(labels, valores)
-            plt.xticks(rotation=45)
-            
-        elif tipo_grafico == "linhas":
-            ax.plot(labels, valores, marker='o')
-            plt.xticks(rotation=45)
-            
-        elif tipo_grafico == "pizza":
-            # Para gráfico de pizza, limitamos a 10 itens para legibilidade
-            if len(labels) > 10:
-                # Pegar os 9 maiores valores e agrupar o resto
-                indices_ordenados = sorted(range(len(valores)), key=lambda i: valores[i], reverse=True)
-                top_indices = indices_ordenados[:9]
-                outros_indices = indices_ordenados[9:]
-                
-                labels_top = [labels[i] for i in top_indices]
-                valores_top = [valores[i] for i in top_indices]
-                
-                # Adicionar "Outros"
-                if outros_indices:
-                    labels_top.append("Outros")
-                    valores_top.append(sum(valores[i] for i in outros_indices))
-                
-                labels = labels_top
-                valores = valores_top
-            
-            ax.pie(valores, labels=labels, autopct='%1.1f%%', startangle=90)
-            ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle
-        
-        # Título e labels
         titulo = f"Relatório de {self.tipo_relatorio.capitalize()} - {self.var_agrupamento.get().capitalize()}"
-        ax.set_title(titulo)
-        
-        if tipo_grafico != "pizza":
-            if self.tipo_relatorio == "vendas":
-                ax.set_ylabel("Valor Total (R$)")
-            else:
-                ax.set_ylabel("Valor (R$)")
-            
-            ax.set_xlabel("Período")
+        rotulo_valor = "Valor Total (R$)" if self.tipo_relatorio == "vendas" else "Valor (R$)"
+        desenhar_grafico(ax, dados_agrupados, self.var_tipo_grafico.get(), titulo, rotulo_valor)
         
-        # Ajustar layout
-        plt.tight_layout()
-        
-        # Criar canvas do Matplotlib
-        canvas = FigureCanvasTkAgg(fig, master=self.frame_grafico)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        # Ajustar layout e redesenhar quando o Tk estiver ocioso
+        fig.tight_layout()
+        canvas.draw_idle()
+    
+    def _criar_figura(self, master, tamanho):
+        """Cria figura, canvas e aviso de "sem dados" reutilizados pela janela
+        
+        A figura é criada sem o pyplot, que manteria uma referência global a ela.
+        """
+        fig = Figure(figsize=tamanho)
+        canvas = FigureCanvasTkAgg(fig, master=master)
+        sem_dados = ttk.Label(master, text="Sem dados para exibir no período selecionado")
+        return fig, canvas, sem_dados
+    
+    def _exibir_figura(self, figura):
+        """Mostra o canvas da figura no lugar do aviso de "sem dados"""
+        _, canvas, sem_dados = figura
+        sem_dados.pack_forget()
+        widget = canvas.get_tk_widget()
+        if not widget.winfo_manager():
+            widget.pack(fill=tk.BOTH, expand=True)
+    
+    def _exibir_sem_dados(self, figura):
+        """Mostra o aviso de "sem dados" no lugar do canvas da figura"""
+        _, canvas, sem_dados = figura
+        canvas.get_tk_widget().pack_forget()
+        if not sem_dados.winfo_manager():
+            sem_dados.pack(pady=20)
     
     def _atualizar_tabela(self, dados_agrupados):
         """Atualiza a tabela com os dados"""
@@ -483,36 +551,34 @@ class InterfaceRelatorios:
         scrollx.pack(side="bottom", fill="x")
         self.tree.pack(side="left", fill="both", expand=True)
     
-    def _atualizar_resumo(self, dados_agrupados):
+    def _atualizar_resumo(self, dados_agrupados, estatisticas):
         """Atualiza a aba de resumo com estatísticas e gráficos adicionais"""
-        # Limpar frame do resumo
-        for widget in self.frame_resumo.winfo_children():
+        # Textos refeitos a cada atualização; a distribuição reaproveita a figura
+        if self._distribuicao is None:
+            self._frame_resumo_textos = ttk.Frame(self.frame_resumo)
+            self._frame_resumo_textos.pack(fill="x")
+            self._frame_distribuicao = ttk.LabelFrame(self.frame_resumo, text="Distribuição")
+            self._distribuicao = self._criar_figura(self._frame_distribuicao, (8, 4))
+        
+        # Limpar textos do resumo
+        for widget in self._frame_resumo_textos.winfo_children():
             widget.destroy()
         
         # Verificar se há dados para mostrar
         if not dados_agrupados:
-            ttk.Label(self.frame_resumo, text="Sem dados para exibir no período selecionado").pack(pady=20)
+            self._frame_distribuicao.pack_forget()
+            ttk.Label(self._frame_resumo_textos, text="Sem dados para exibir no período selecionado").pack(pady=20)
             return
         
-        # Calcular estatísticas
-        total_registros = sum(dados['quantidade'] for dados in dados_agrupados.values())
-        valor_total = sum(dados['valor_total'] for dados in dados_agrupados.values())
-        ticket_medio = valor_total / total_registros if total_registros > 0 else 0
-        
-        # Encontrar maior e menor valor
-        if dados_agrupados:
-            maior_valor = max(dados['valor_total'] for dados in dados_agrupados.values())
-            menor_valor = min(dados['valor_total'] for dados in dados_agrupados.values())
-            
-            # Períodos correspondentes
-            maior_periodo = next(periodo for periodo, dados in dados_agrupados.items() if dados['valor_total'] == maior_valor)
-            menor_periodo = next(periodo for periodo, dados in dados_agrupados.items() if dados['valor_total'] == menor_valor)
-        else:
-            maior_valor = menor_valor = 0
-            maior_periodo = menor_periodo = "N/A"
+        # Estatísticas calculadas durante o agrupamento
+        total_registros = estatisticas.registros
+        valor_total = estatisticas.soma
+        ticket_medio = estatisticas.ticket_medio
+        maior_valor, maior_periodo = estatisticas.maximo, estatisticas.chave_maximo
+        menor_valor, menor_periodo = estatisticas.minimo, estatisticas.chave_minimo
         
         # Frame para informações gerais
-        info_frame = ttk.LabelFrame(self.frame_resumo, text="Informações Gerais")
+        info_frame = ttk.LabelFrame(self._frame_resumo_textos, text="Informações Gerais")
         info_frame.pack(fill="x", pady=(0, 20))
         
         # Grid para organizar as informações
@@ -532,7 +598,7 @@ class InterfaceRelatorios:
             row=2, column=1, sticky="w", padx=5, pady=5)
         
         # Frame para estatísticas
-        stats_frame = ttk.LabelFrame(self.frame_resumo, text="Estatísticas")
+        stats_frame = ttk.LabelFrame(self._frame_resumo_textos, text="Estatísticas")
         stats_frame.pack(fill="x", pady=(0, 20))
         
         # Grid para organizar as estatísticas
@@ -591,58 +657,60 @@ class InterfaceRelatorios:
             ttk.Label(stats_grid, text=f"R$ {media_diaria:.2f}".replace('.', ',')).grid(
                 row=3, column=1, sticky="w", padx=5, pady=5)
         
+        # Desvio padrão dos valores por período
+        ttk.Label(stats_grid, text="Desvio padrão:", font=("Arial", 10, "bold")).grid(
+            row=4, column=0, sticky="w", padx=5, pady=5)
+        ttk.Label(stats_grid, text=f"R$ {estatisticas.desvio_padrao:.2f}".replace('.', ',')).grid(
+            row=4, column=1, sticky="w", padx=5, pady=5)
+        
+        # Percentis aproximados do ticket
+        p50, p90 = estatisticas.percentil_ticket(50), estatisticas.percentil_ticket(90)
+        if p50 is not None:
+            ttk.Label(stats_grid, text="Ticket (mediana / p90):", font=("Arial", 10, "bold")).grid(
+                row=4, column=2, sticky="w", padx=5, pady=5)
+            ttk.Label(stats_grid, text=f"R$ {p50:.2f} / R$ {p90:.2f}".replace('.', ',')).grid(
+                row=4, column=3, sticky="w", padx=5, pady=5)
+        
         # Frame para distribuição
-        dist_frame = ttk.LabelFrame(self.frame_resumo, text="Distribuição")
-        dist_frame.pack(fill="both", expand=True, pady=(0, 10))
-        
-        # Criar mini gráfico de distribuição
-        fig, ax = plt.subplots(figsize=(8, 4))
-        
-        # Preparar dados
-        labels = list(dados_agrupados.keys())
-        valores = [float(dados['valor_total']) for dados in dados_agrupados.values()]
-        
-        # Gráfico de barras horizontal
-        y_pos = range(len(labels))
-        ax.barh(y_pos, valores, align='center')
-        ax.set_yticks(y_pos)
-        ax.set_yticklabels(labels)
-        ax.invert_yaxis()  # labels read top-to-bottom
-        ax.set_xlabel('Valor (R$)')
-        ax.set_title('Distribuição de Valores')
-        
-        # Ajustar layout
-        plt.tight_layout()
-        
-        # Criar canvas do Matplotlib
-        canvas = FigureCanvasTkAgg(fig, master=dist_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        if not self._frame_distribuicao.winfo_manager():
+            self._frame_distribuicao.pack(fill="both", expand=True, pady=(0, 10))
+        self._exibir_figura(self._distribuicao)
+        
+        # Redesenhar o mini gráfico de distribuição nos mesmos eixos
+        fig, canvas, _ = self._distribuicao
+        fig.clear()
+        ax = fig.add_subplot()
+        
+        desenhar_distribuicao(ax, dados_agrupados)
+        
+        # Ajustar layout e redesenhar quando o Tk estiver ocioso
+        fig.tight_layout()
+        canvas.draw_idle()
     
-    def _atualizar_estatisticas(self, dados_agrupados: Dict[str, Dict[str, Any]]):
+    def _atualizar_estatisticas(self, estatisticas: EstatisticasRelatorio):
         """Atualiza as estatísticas na parte inferior da janela"""
-        # Calcular estatísticas básicas
-        total_registros = sum(dados['quantidade'] for dados in dados_agrupados.values())
-        valor_total = sum(float(dados['valor_total']) for dados in dados_agrupados.values())
-        
         # Atualizar label de estatísticas
         self.lbl_estatisticas.config(
-            text=f"Total: {total_registros} registros | Valor: R$ {valor_total:.2f}".replace('.', ','))
+            text=f"Total: {estatisticas.registros} registros | Valor: R$ {estatisticas.soma:.2f}".replace('.', ','))
         
         # Atualizar status
         periodo_str = f"{self.data_inicio.strftime('%d/%m/%Y')} a {self.data_fim.strftime('%d/%m/%Y')}"
         self.lbl_status.config(text=f"Período: {periodo_str} | Agrupamento: {self.var_agrupamento.get()}")
     
     def _exportar_dados(self, formato="excel"):
-        """Exporta os dados do relatório para Excel ou PDF"""
-        # Verificar se há dados na tabela
-        if not hasattr(self, 'tree') or not self.tree.get_children():
+        """Exporta os dados do relatório para Excel/CSV ou PDF
+        
+        A exportação lê os dados agrupados e, se pedido, as vendas e pagamentos
+        do período direto da origem, gravando em fluxo fora da thread da interface.
+        """
+        # Verificar se há dados exibidos
+        if not self._dados_exibidos:
             messagebox.showinfo("Aviso", "Não há dados para exportar.")
             return
         
         # Definir tipos de arquivo e extensão padrão
         if formato == "excel":
-            filetypes = [('Arquivo Excel', '*.xlsx'), ('Todos os arquivos', '*.*')]
+            filetypes = [('Arquivo Excel', '*.xlsx'), ('Arquivo CSV', '*.csv'), ('Todos os arquivos', '*.*')]
             defaultextension = ".xlsx"
         else:  # PDF
             filetypes = [('Arquivo PDF', '*.pdf'), ('Todos os arquivos', '*.*')]
@@ -658,43 +726,81 @@ class InterfaceRelatorios:
         if not filename:
             return
         
-        try:
-            # Coletar dados da tabela
-            dados = []
-            colunas = ["Período", "Quantidade", "Valor Total", "Ticket Médio"]
-            
-            for item_id in self.tree.get_children():
-                valores = self.tree.item(item_id, "values")
-                dados.append(dict(zip(colunas, valores)))
-            
-            if formato == "excel":
-                # Exportar para Excel
-                df = pd.DataFrame(dados)
-                
-                # Adicionar informações do relatório
-                info = {
-                    "Tipo de Relatório": [f"Relatório de {self.tipo_relatorio.capitalize()}"],
-                    "Período": [f"{self.data_inicio.strftime('%d/%m/%Y')} a {self.data_fim.strftime('%d/%m/%Y')}"],
-                    "Agrupamento": [self.var_agrupamento.get().capitalize()],
-                    "Data de Geração": [datetime.now().strftime("%d/%m/%Y %H:%M:%S")]
-                }
-                
-                df_info = pd.DataFrame(info)
-                
-                # Criar um arquivo Excel com várias planilhas
-                with pd.ExcelWriter(filename) as writer:
-                    df_info.to_excel(writer, sheet_name='Informações', index=False)
-                    df.to_excel(writer, sheet_name='Dados', index=False)
-                
-                messagebox.showinfo("Exportação", f"Dados exportados com sucesso para:\n{filename}")
-                
-            else:  # PDF
-                # Aqui implementaríamos a exportação para PDF
-                # Por enquanto, apenas um placeholder
-                messagebox.showinfo("Exportação", 
-                                   f"Exportando para PDF...\n"
-                                   f"Funcionalidade em implementação.")
-            
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao exportar dados: {e}")
-            logging.error(f"Erro ao exportar dados: {e}", exc_info=True)
\ No newline at end of file
+        # Parâmetros lidos na thread da interface
+        periodo_str = f"{self.data_inicio.strftime('%d/%m/%Y')} a {self.data_fim.strftime('%d/%m/%Y')}"
+        informacoes = {
+            "Tipo de Relatório": f"Relatório de {self.tipo_relatorio.capitalize()}",
+            "Período": periodo_str,
+            "Agrupamento": self.var_agrupamento.get().capitalize(),
+            "Data de Geração": datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        }
+        
+        def concluir(arquivos, erro):
+            if erro is not None:
+                self.lbl_status.config(text="Erro na exportação")
+                messagebox.showerror("Erro", f"Erro ao exportar dados: {erro}")
+                return
+            self.lbl_status.config(text="Exportação concluída")
+            messagebox.showinfo("Exportação", "Dados exportados com sucesso para:\n" + "\n".join(arquivos))
+        
+        if formato != "excel":
+            # PDF renderizado com o backend PDF do matplotlib, fora da thread da interface
+            titulo = f"Relatório de {self.tipo_relatorio.capitalize()}"
+            rotulo_valor = "Valor Total (R$)" if self.tipo_relatorio == "vendas" else "Valor (R$)"
+            dados_agrupados = self._dados_exibidos
+            estatisticas = self._estatisticas_exibidas
+            tipo_grafico = self.var_tipo_grafico.get()
+            self._executar_em_segundo_plano(
+                "Gerando PDF",
+                lambda: [renderizar_pdf(filename, titulo, informacoes, dados_agrupados, tipo_grafico, rotulo_valor,
+                                        estatisticas)],
+                concluir)
+            return
+        
+        detalhe = "vendas e pagamentos do período" if self.tipo_relatorio == "vendas" else "cadastros de clientes"
+        detalhes = messagebox.askyesno("Exportação", f"Incluir as linhas de detalhe ({detalhe})?")
+        
+        planilhas = planilhas_relatorio(self.gerenciador_dados, self.tipo_relatorio,
+                                        self.data_inicio.date(), self.data_fim.date(),
+                                        self._dados_exibidos, detalhes)
+        self._executar_em_segundo_plano("Exportando",
+                                        lambda: exportar_relatorio(filename, informacoes, planilhas),
+                                        concluir)
+    
+    def _executar_em_segundo_plano(self, descricao, tarefa, ao_concluir):
+        """Executa a tarefa em uma thread de trabalho
+        
+        ao_concluir(resultado, erro) é chamado na thread da interface; enquanto
+        a tarefa roda, lbl_status mostra o progresso.
+        """
+        fila = queue.Queue(maxsize=1)
+        
+        def executar():
+            try:
+                fila.put((tarefa(), None))
+            except Exception as e:
+                logging.error(f"Erro em tarefa de relatório ({descricao}): {e}", exc_info=True)
+                fila.put((None, e))
+        
+        threading.Thread(target=executar, daemon=True).start()
+        
+        passos = count()
+        
+        def verificar():
+            try:
+                resultado, erro = fila.get_nowait()
+            except queue.Empty:
+                try:
+                    pontos = "." * (next(passos) // 3 % 4)
+                    self.lbl_status.config(text=f"{descricao}{pontos}")
+                    self.janela.after(100, verificar)
+                except tk.TclError:
+                    # Janela fechada: a tarefa termina sozinha
+                    pass
+                return
+            try:
+                ao_concluir(resultado, erro)
+            except tk.TclError:
+                pass
+        
+        verificar()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sistema CM - Journal de Dados
+Registro append-only (JSONL) das alterações do GerenciadorDados com
+compactação periódica em segundo plano
+"""
+
+import os
+import json
+import logging
+import threading
+from contextlib import nullcontext
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+
+def aplicar_registro(dados: Dict[str, Any], registro: Dict[str, Any]):
+    """Aplica um registro do journal sobre os dados brutos (dicionários)"""
+    operacao = registro.get("op")
+
+    if operacao == "adicionar_cliente":
+        dados.setdefault("cadastros", []).append(registro["cliente"])
+    elif operacao == "editar_cliente":
+        indice = registro["indice"]
+        if 0 <= indice < len(dados.get("cadastros", [])):
+            dados["cadastros"][indice] = registro["cliente"]
+    elif operacao == "remover_cliente":
+        indice = registro["indice"]
+        if 0 <= indice < len(dados.get("cadastros", [])):
+            dados["cadastros"].pop(indice)
+    elif operacao == "registrar_venda":
+        dados.setdefault("historico_vendas", []).append(registro["venda"])
+    elif operacao == "auditoria":
+        # Journals gravados antes do log de auditoria (transferido na carga)
+        dados.setdefault("auditoria", []).append(registro["mensagem"])
+    else:
+        logging.warning(f"Operação desconhecida no journal: {operacao}")
+
+
+class LacunaJournal(Exception):
+    """Registros de outro processo já descartados do journal (é preciso recarregar tudo)"""
+
+
+class JournalDados:
+    """Journal append-only das alterações do arquivo de dados
+
+    Cada alteração é gravada como uma linha JSON com número de sequência.
+    O snapshot (arquivo JSON principal) guarda em 'journal_seq' a última
+    sequência já incorporada, de modo que na inicialização basta reaplicar
+    os registros posteriores.
+
+    Com uma trava entre processos, várias instâncias compartilham o
+    journal: cada uma lê os registros gravados pelas outras
+    (novos_registros) antes de gravar os seus, mantendo a sequência única.
+    """
+
+    def __init__(self, arquivo_dados: str, limite_compactacao: int = 1000, trava=None):
+        self.arquivo_dados = arquivo_dados
+        self.caminho = f"{arquivo_dados}.journal"
+        self.caminho_rotacionado = f"{self.caminho}.1"
+        self.limite_compactacao = limite_compactacao
+        self.trava = trava
+
+        self.seq = 0
+        self.registros_pendentes = 0
+
+        self._lock = threading.RLock()
+        self._thread_compactacao: Optional[threading.Thread] = None
+        # Arquivo do journal já lido (identidade) e até onde (bytes)
+        self._identidade_lida: Optional[Tuple[int, bytes]] = None
+        self._posicao = 0
+
+    def _travar(self):
+        """Trava entre processos (se configurada)"""
+        return self.trava if self.trava is not None else nullcontext()
+
+    @staticmethod
+    def _identidade_arquivo(f) -> Tuple[int, bytes]:
+        """Inode e início do arquivo aberto (o inode de um journal apagado pode ser reaproveitado;
+        o primeiro registro, com a sua sequência, não se repete)"""
+        posicao = f.tell()
+        f.seek(0)
+        inicio = f.read(32)
+        f.seek(posicao)
+        return os.fstat(f.fileno()).st_ino, inicio
+
+    @classmethod
+    def _ler_registros(cls, caminho: str, identidade: Optional[Tuple[int, bytes]] = None,
+                       inicio: int = 0) -> Tuple[Optional[Tuple[int, bytes]], Optional[int], List[Dict[str, Any]]]:
+        """Registros das linhas completas a partir da posição inicial
+
+        Com identidade, lê apenas se o arquivo for o mesmo (senão a posição
+        retornada é None).
+
+        Returns:
+            (identidade do arquivo, posição após a última linha completa, registros)
+        """
+        registros = []
+        try:
+            f = open(caminho, "rb")
+        except FileNotFoundError:
+            return None, None if identidade else 0, registros
+
+        with f:
+            atual = cls._identidade_arquivo(f)
+            if identidade is not None and atual != identidade:
+                return atual, None, registros
+            f.seek(inicio)
+            posicao = inicio
+            for linha in f:
+                if not linha.endswith(b"\n"):
+                    # Linha final incompleta (queda durante a gravação)
+                    break
+                posicao += len(linha)
+                linha = linha.strip()
+                if not linha:
+                    continue
+                try:
+                    registros.append(json.loads(linha))
+                except ValueError:
+                    logging.warning(f"Registro inválido ignorado em {caminho}:{posicao - len(linha)}")
+        return atual, posicao, registros
+
+    def reaplicar(self, dados: Dict[str, Any], seq_snapshot: int = 0) -> int:
+        """Reaplica sobre os dados brutos os registros posteriores ao snapshot
+
+        Returns:
+            int: Quantidade de registros reaplicados
+        """
+        self.seq = seq_snapshot
+        self.registros_pendentes = 0
+        reaplicados = 0
+
+        for caminho in (self.caminho_rotacionado, self.caminho):
+            identidade, posicao, registros = self._ler_registros(caminho)
+            if caminho == self.caminho:
+                self._identidade_lida, self._posicao = identidade, posicao
+
+            for registro in registros:
+                self.registros_pendentes += 1
+                seq = registro.get("seq", 0)
+                if seq <= self.seq:
+                    continue
+
+                aplicar_registro(dados, registro)
+                self.seq = seq
+                reaplicados += 1
+
+        if reaplicados:
+            logging.info(f"Journal: {reaplicados} alterações reaplicadas")
+        return reaplicados
+
+    def novos_registros(self) -> List[Dict[str, Any]]:
+        """Registros gravados por outros processos desde a última leitura (em ordem de sequência)
+
+        Lê a continuação do arquivo já lido (mesmo que tenha sido
+        rotacionado pela compactação) e, se o journal atual for outro
+        arquivo, o journal atual desde o início.
+
+        Raises:
+            LacunaJournal: Sequência com salto (registros já incorporados e descartados)
+        """
+        with self._lock:
+            registros = []
+            if self._identidade_lida is not None:
+                posicao, lidos = self._ler_registros(self.caminho_rotacionado, self._identidade_lida, self._posicao)[1:]
+                if posicao is not None:
+                    # Arquivo já lido foi rotacionado pela compactação: ler o restante
+                    registros += lidos
+                    self._identidade_lida, self._posicao = None, 0
+
+            identidade, posicao, lidos = self._ler_registros(self.caminho, self._identidade_lida, self._posicao)
+            if posicao is None:
+                # Journal atual é outro arquivo: ler desde o início
+                identidade, posicao, lidos = self._ler_registros(self.caminho)
+            registros += lidos
+            self._identidade_lida, self._posicao = identidade, posicao
+
+            novos = []
+            for registro in registros:
+                seq = registro.get("seq", 0)
+                if seq <= self.seq:
+                    continue
+                if seq != self.seq + 1:
+                    raise LacunaJournal(f"Journal salta da sequência {self.seq} para {seq}")
+                self.seq = seq
+                self.registros_pendentes += 1
+                novos.append(registro)
+            return novos
+
+    def registrar(self, operacao: str, **conteudo):
+        """Grava uma alteração no journal (custo proporcional à alteração)
+
+        O arquivo é aberto a cada gravação para que a compactação de outro
+        processo possa rotacioná-lo (no Windows não se renomeia arquivo aberto).
+        """
+        with self._lock:
+            self.seq += 1
+            registro = {"seq": self.seq, "op": operacao}
+            registro.update(conteudo)
+            linha = (json.dumps(registro, ensure_ascii=False, default=str, separators=(",", ":")) + "\n").encode("utf-8")
+
+            with open(self.caminho, "a+b") as arquivo:
+                arquivo.write(linha)
+                arquivo.flush()
+                os.fsync(arquivo.fileno())
+                posicao = arquivo.tell()
+                # Demais registros do arquivo já foram lidos (novos_registros antes de gravar)
+                identidade = self._identidade_arquivo(arquivo)
+                if self._identidade_lida in (None, identidade) or posicao == len(linha):
+                    self._identidade_lida, self._posicao = identidade, posicao
+            self.registros_pendentes += 1
+
+    def precisa_compactar(self) -> bool:
+        """Indica se o journal atingiu o limite para compactação"""
+        return self.registros_pendentes >= self.limite_compactacao
+
+    def compactar(self, gravar_snapshot: Callable[[str, Dict[str, Any]], None], em_segundo_plano: bool = True):
+        """Incorpora o journal ao snapshot
+
+        O journal atual é rotacionado e a incorporação é feita sobre os dados
+        brutos do snapshot em disco, sem tocar nos objetos em memória.
+
+        Args:
+            gravar_snapshot: Função de gravação atômica (caminho, conteúdo)
+            em_segundo_plano: Executa a compactação em uma thread separada
+        """
+        with self._travar(), self._lock:
+            if self._thread_compactacao is not None and self._thread_compactacao.is_alive():
+                return
+
+            if os.path.exists(self.caminho):
+                if os.path.exists(self.caminho_rotacionado):
+                    # Compactação anterior interrompida: acumular no arquivo rotacionado
+                    with open(self.caminho, "r", encoding="utf-8") as origem, \
+                         open(self.caminho_rotacionado, "a", encoding="utf-8") as destino:
+                        destino.write(origem.read())
+                    os.remove(self.caminho)
+                else:
+                    os.replace(self.caminho, self.caminho_rotacionado)
+
+            if not os.path.exists(self.caminho_rotacionado):
+                return
+
+            self.registros_pendentes = 0
+
+            if em_segundo_plano:
+                self._thread_compactacao = threading.Thread(
+                    target=self._incorporar, args=(gravar_snapshot,),
+                    name="compactacao-journal", daemon=True
+                )
+                self._thread_compactacao.start()
+                return
+
+        self._incorporar(gravar_snapshot)
+
+    @staticmethod
+    def _identidade(caminho: str) -> Optional[Tuple[int, int, int]]:
+        """(inode, tamanho, mtime) do arquivo, ou None se não existe"""
+        try:
+            estado = os.stat(caminho)
+        except FileNotFoundError:
+            return None
+        return estado.st_ino, estado.st_size, estado.st_mtime_ns
+
+    def _incorporar(self, gravar_snapshot: Callable[[str, Dict[str, Any]], None]):
+        """Gera novo snapshot a partir do snapshot em disco mais o journal rotacionado
+
+        A leitura e a aplicação são feitas sem a trava entre processos; ela
+        é tomada apenas para gravar, se nem o snapshot nem o journal
+        rotacionado mudaram nesse meio tempo (senão a compactação fica para
+        a próxima vez).
+        """
+        try:
+            identidades = (self._identidade(self.arquivo_dados), self._identidade(self.caminho_rotacionado))
+            if identidades[1] is None:
+                # Já incorporado por outro processo
+                return
+            if identidades[0] is not None:
+                with open(self.arquivo_dados, "r", encoding="utf-8") as f:
+                    dados = json.load(f)
+            else:
+                dados = {}
+
+            seq = dados.get("journal_seq", 0)
+            with open(self.caminho_rotacionado, "r", encoding="utf-8") as f:
+                for linha in f:
+                    linha = linha.strip()
+                    if not linha:
+                        continue
+                    try:
+                        registro = json.loads(linha)
+                    except json.JSONDecodeError:
+                        continue
+                    if registro.get("seq", 0) > seq:
+                        aplicar_registro(dados, registro)
+                        seq = registro["seq"]
+
+            # Geração e sequência no início do arquivo (lidas sem interpretar o JSON todo)
+            dados = {"geracao": dados.pop("geracao", 0), "journal_seq": seq,
+                     **{chave: valor for chave, valor in dados.items() if chave != "journal_seq"}}
+            with self._travar():
+                if identidades != (self._identidade(self.arquivo_dados), self._identidade(self.caminho_rotacionado)):
+                    logging.info("Compactação do journal adiada: dados gravados por outro processo")
+                    return
+                gravar_snapshot(self.arquivo_dados, dados)
+                os.remove(self.caminho_rotacionado)
+            logging.info(f"Journal compactado até a sequência {seq}")
+        except Exception as e:
+            # O arquivo rotacionado é mantido e reaplicado na próxima carga
+            logging.error(f"Erro ao compactar journal: {e}")
+
+    def aguardar_compactacao(self):
+        """Aguarda o término de uma compactação em andamento"""
+        thread = self._thread_compactacao
+        if thread is not None and thread.is_alive():
+            thread.join()
+
+    def descartar(self):
+        """Descarta o journal após um snapshot completo dos dados em memória"""
+        with self._lock:
+            if self.trava is None:
+                # Com a trava, a compactação confere antes de gravar se o snapshot mudou
+                self.aguardar_compactacao()
+            for caminho in (self.caminho_rotacionado, self.caminho):
+                if os.path.exists(caminho):
+                    os.remove(caminho)
+            self.registros_pendentes = 0
+            self._identidade_lida, self._posicao = None, 0
@@ -0,0 +1,403 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sistema CM - Log de Auditoria
+Registro append-only das entradas de auditoria em segmentos JSONL
+rotacionados por tamanho e idade, fora do arquivo de dados principal,
+com índice por data, usuário e entidade para as consultas da auditoria
+"""
+
+import os
+import re
+import json
+import logging
+import argparse
+import threading
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+FORMATO_TIMESTAMP = "%Y-%m-%d %H:%M:%S"
+# Entradas antigas do dados_sistema.json: "AAAA-MM-DD HH:MM:SS - [INFO] ..." ou "DD/MM/AAAA HH:MM:SS - ..."
+_ENTRADA_LEGADA = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}|\d{2}/\d{2}/\d{4} \d{2}:\d{2}:\d{2}) - "
+                             r"(?:\[\w+\] )?(.*)$", re.DOTALL)
+_USUARIO_LEGADO = re.compile(r"Usuário '([^']+)'")
+
+Momento = Union[str, date, datetime, None]
+
+
+def _texto_momento(momento: Momento, fim_do_dia: bool = False) -> Optional[str]:
+    """Momento no formato dos timestamps gravados (datas incluem o dia inteiro)"""
+    if momento is None or isinstance(momento, str):
+        return momento
+    if isinstance(momento, datetime):
+        return momento.strftime(FORMATO_TIMESTAMP)
+    return f"{momento.isoformat()} {'23:59:59' if fim_do_dia else '00:00:00'}"
+
+
+class _Segmento:
+    """Índice de um segmento: período coberto e posições por usuário e entidade"""
+
+    __slots__ = ("numero", "caminho", "inicio", "fim", "registros", "tamanho", "usuarios", "entidades")
+
+    def __init__(self, numero: int, caminho: Path):
+        self.numero = numero
+        self.caminho = caminho
+        self.inicio: Optional[str] = None
+        self.fim: Optional[str] = None
+        self.registros = 0
+        self.tamanho = 0
+        self.usuarios: Dict[str, List[int]] = {}
+        self.entidades: Dict[str, List[int]] = {}
+
+    def indexar(self, posicao: int, entrada: Dict[str, Any], tamanho: int):
+        """Inclui no índice a entrada gravada na posição (bytes) do segmento"""
+        timestamp = entrada.get("timestamp") or ""
+        if self.inicio is None or timestamp < self.inicio:
+            self.inicio = timestamp
+        if self.fim is None or timestamp > self.fim:
+            self.fim = timestamp
+        if entrada.get("usuario"):
+            self.usuarios.setdefault(entrada["usuario"], []).append(posicao)
+        if entrada.get("entidade"):
+            self.entidades.setdefault(str(entrada["entidade"]), []).append(posicao)
+        self.registros += 1
+        self.tamanho = posicao + tamanho
+
+    def para_json(self) -> Dict[str, Any]:
+        return {"inicio": self.inicio, "fim": self.fim, "registros": self.registros, "tamanho": self.tamanho,
+                "usuarios": self.usuarios, "entidades": self.entidades}
+
+    @classmethod
+    def de_json(cls, numero: int, caminho: Path, conteudo: Dict[str, Any]) -> "_Segmento":
+        segmento = cls(numero, caminho)
+        segmento.inicio = conteudo["inicio"]
+        segmento.fim = conteudo["fim"]
+        segmento.registros = conteudo["registros"]
+        segmento.tamanho = conteudo["tamanho"]
+        segmento.usuarios = conteudo["usuarios"]
+        segmento.entidades = conteudo["entidades"]
+        return segmento
+
+
+class LogAuditoria:
+    """Log de auditoria em segmentos append-only
+
+    Cada entrada é uma linha JSON (timestamp, usuário, entidade e mensagem)
+    acrescentada ao segmento ativo; gravar custa o mesmo independentemente
+    do tamanho do log. O segmento ativo é fechado ao passar de
+    limite_bytes ou de duracao_max_dias desde a primeira entrada, e o seu
+    índice (período e posições por usuário e entidade) é gravado ao lado
+    em um arquivo .idx. Com segmentos_max, os segmentos mais antigos além
+    desse número são apagados.
+
+    Várias instâncias podem compartilhar o diretório desde que as
+    gravações sejam serializadas (trava entre processos): entradas e
+    segmentos das outras são incorporados antes de cada gravação e consulta.
+    """
+
+    def __init__(self, diretorio: str, limite_bytes: int = 1024 * 1024, duracao_max_dias: int = 30,
+                 segmentos_max: Optional[int] = None):
+        self.diretorio = Path(diretorio)
+        self.limite_bytes = limite_bytes
+        self.duracao_max_dias = duracao_max_dias
+        self.segmentos_max = segmentos_max
+
+        self._lock = threading.RLock()
+        self._arquivo = None
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        self._segmentos: List[_Segmento] = self._carregar_segmentos()
+
+    # ------------------------------------------------------------ segmentos
+
+    def _caminho_segmento(self, numero: int) -> Path:
+        return self.diretorio / f"auditoria-{numero:06d}.jsonl"
+
+    @staticmethod
+    def _caminho_indice(segmento: _Segmento) -> Path:
+        return segmento.caminho.with_suffix(".idx")
+
+    def _carregar_segmentos(self, truncar: bool = True) -> List[_Segmento]:
+        """Índices dos segmentos fechados (arquivos .idx) e do segmento ativo (releitura)"""
+        numeros = sorted(int(caminho.stem.split("-")[1]) for caminho in self.diretorio.glob("auditoria-*.jsonl"))
+        segmentos = []
+        for posicao, numero in enumerate(numeros):
+            caminho = self._caminho_segmento(numero)
+            ativo = posicao == len(numeros) - 1
+            segmento = None
+            if not ativo:
+                try:
+                    with open(caminho.with_suffix(".idx"), "r", encoding="utf-8") as f:
+                        segmento = _Segmento.de_json(numero, caminho, json.load(f))
+                except (OSError, ValueError, KeyError) as e:
+                    logging.warning(f"Índice de auditoria refeito para {caminho.name}: {e}")
+            if segmento is None:
+                segmento = self._indexar_arquivo(numero, caminho, truncar)
+                if not ativo:
+                    self._gravar_indice(segmento)
+            segmentos.append(segmento)
+        return segmentos
+
+    def _indexar_arquivo(self, numero: int, caminho: Path, truncar: bool = True) -> _Segmento:
+        """Índice de um segmento lido do disco (última linha truncada é descartada)"""
+        segmento = _Segmento(numero, caminho)
+        with open(caminho, "rb") as f:
+            posicao = 0
+            for linha in f:
+                try:
+                    entrada = json.loads(linha)
+                except ValueError:
+                    logging.warning(f"Entrada de auditoria inválida ignorada em {caminho.name}:{posicao}")
+                    posicao += len(linha)
+                    continue
+                segmento.indexar(posicao, entrada, len(linha))
+                posicao += len(linha)
+        if truncar and segmento.tamanho < posicao:
+            # Linha final sem quebra (queda durante a gravação): a próxima gravação começa nova linha
+            with open(caminho, "r+b") as f:
+                f.truncate(segmento.tamanho)
+        return segmento
+
+    def _atualizar(self):
+        """Incorpora entradas e segmentos gravados por outras instâncias no mesmo diretório"""
+        ultimo = self._segmentos[-1] if self._segmentos else None
+        proximo = self._caminho_segmento(ultimo.numero + 1 if ultimo else 1)
+        if proximo.exists():
+            # Outra instância rotacionou (e talvez aplicou a retenção): reler os índices
+            self._fechar_arquivo()
+            # Linha final incompleta pode estar sendo gravada: não truncar
+            self._segmentos = self._carregar_segmentos(truncar=False)
+            return
+        if ultimo is None:
+            return
+
+        try:
+            tamanho = ultimo.caminho.stat().st_size
+        except FileNotFoundError:
+            return
+        if tamanho <= ultimo.tamanho:
+            return
+        with open(ultimo.caminho, "rb") as f:
+            f.seek(ultimo.tamanho)
+            posicao = ultimo.tamanho
+            for linha in f:
+                if not linha.endswith(b"\n"):
+                    break
+                try:
+                    ultimo.indexar(posicao, json.loads(linha), len(linha))
+                except ValueError:
+                    logging.warning(f"Entrada de auditoria inválida ignorada em {ultimo.caminho.name}:{posicao}")
+                posicao += len(linha)
+        ultimo.tamanho = posicao
+
+    def _gravar_indice(self, segmento: _Segmento):
+        caminho = self._caminho_indice(segmento)
+        temporario = caminho.with_suffix(".idx.tmp")
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(segmento.para_json(), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temporario, caminho)
+
+    def _precisa_rotacionar(self, segmento: _Segmento, timestamp: str) -> bool:
+        if segmento.tamanho >= self.limite_bytes:
+            return True
+        if segmento.inicio:
+            try:
+                inicio = datetime.strptime(segmento.inicio, FORMATO_TIMESTAMP)
+                return (datetime.strptime(timestamp, FORMATO_TIMESTAMP) - inicio).days >= self.duracao_max_dias
+            except ValueError:
+                return False
+        return False
+
+    def _rotacionar(self):
+        """Fecha o segmento ativo (gravando o índice) e aplica a retenção"""
+        self._fechar_arquivo()
+        if self._segmentos:
+            self._gravar_indice(self._segmentos[-1])
+        numero = self._segmentos[-1].numero + 1 if self._segmentos else 1
+        self._segmentos.append(_Segmento(numero, self._caminho_segmento(numero)))
+
+        if self.segmentos_max and len(self._segmentos) > self.segmentos_max:
+            for segmento in self._segmentos[:-self.segmentos_max]:
+                for caminho in (segmento.caminho, self._caminho_indice(segmento)):
+                    if caminho.exists():
+                        caminho.unlink()
+                logging.info(f"Segmento de auditoria removido pela retenção: {segmento.caminho.name}")
+            self._segmentos = self._segmentos[-self.segmentos_max:]
+
+    def _fechar_arquivo(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+    def fechar(self):
+        """Fecha o segmento ativo (o log continua utilizável)"""
+        with self._lock:
+            self._fechar_arquivo()
+
+    # ------------------------------------------------------------ gravação
+
+    def _gravar(self, entrada: Dict[str, Any], sincronizar: bool = True):
+        self._atualizar()
+        if not self._segmentos or self._precisa_rotacionar(self._segmentos[-1], entrada["timestamp"]):
+            self._rotacionar()
+        segmento = self._segmentos[-1]
+        if self._arquivo is None:
+            self._arquivo = open(segmento.caminho, "ab")
+
+        linha = (json.dumps(entrada, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        self._arquivo.write(linha)
+        if sincronizar:
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+        segmento.indexar(segmento.tamanho, entrada, len(linha))
+
+    def registrar(self, mensagem: str, usuario: Optional[str] = None, entidade: Optional[str] = None,
+                  timestamp: Optional[str] = None) -> Dict[str, Any]:
+        """Acrescenta uma entrada ao log
+
+        Returns:
+            Entrada gravada (timestamp, usuario, entidade, mensagem)
+        """
+        entrada = {
+            "timestamp": timestamp or datetime.now().strftime(FORMATO_TIMESTAMP),
+            "usuario": usuario,
+            "entidade": str(entidade) if entidade else None,
+            "mensagem": mensagem,
+        }
+        with self._lock:
+            self._gravar(entrada)
+        return entrada
+
+    def importar_legado(self, entradas: Iterable[str]) -> int:
+        """Importa entradas em texto do antigo dados['auditoria'] (usuário extraído da mensagem)"""
+        importadas = 0
+        with self._lock:
+            for texto in entradas:
+                texto = str(texto)
+                correspondencia = _ENTRADA_LEGADA.match(texto)
+                if correspondencia:
+                    momento, mensagem = correspondencia.groups()
+                    if "/" in momento:
+                        momento = datetime.strptime(momento, "%d/%m/%Y %H:%M:%S").strftime(FORMATO_TIMESTAMP)
+                else:
+                    momento, mensagem = "", texto
+                usuario = _USUARIO_LEGADO.search(mensagem)
+                self._gravar({"timestamp": momento, "usuario": usuario.group(1) if usuario else None,
+                              "entidade": None, "mensagem": mensagem}, sincronizar=False)
+                importadas += 1
+            if self._arquivo is not None:
+                self._arquivo.flush()
+                os.fsync(self._arquivo.fileno())
+        return importadas
+
+    # ------------------------------------------------------------ consulta
+
+    def __len__(self) -> int:
+        return sum(segmento.registros for segmento in self._segmentos)
+
+    def _ler_segmento(self, segmento: _Segmento, posicoes: Optional[List[int]]) -> List[Dict[str, Any]]:
+        """Entradas do segmento (todas, ou só as das posições informadas)"""
+        entradas = []
+        with open(segmento.caminho, "rb") as f:
+            if posicoes is None:
+                conteudo = f.read(segmento.tamanho)
+                for linha in conteudo.splitlines():
+                    try:
+                        entradas.append(json.loads(linha))
+                    except ValueError:
+                        continue
+            else:
+                for posicao in posicoes:
+                    f.seek(posicao)
+                    entradas.append(json.loads(f.readline()))
+        return entradas
+
+    def consultar(self, inicio: Momento = None, fim: Momento = None, usuario: Optional[str] = None,
+                  entidade: Optional[str] = None, limite: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Entradas que atendem aos filtros, das mais recentes para as mais antigas
+
+        Args:
+            inicio, fim: Período (inclusive); datas cobrem o dia inteiro
+            usuario: Usuário que executou a ação
+            entidade: Identificador do registro afetado (ex.: id do cliente)
+            limite: Quantidade máxima de entradas
+        """
+        inicio = _texto_momento(inicio)
+        fim = _texto_momento(fim, fim_do_dia=True)
+
+        with self._lock:
+            if self._arquivo is not None:
+                self._arquivo.flush()
+            self._atualizar()
+            segmentos = list(self._segmentos)
+            # Cópias das listas de posições do segmento ativo (gravações concorrentes)
+            filtros = [(segmento, list(segmento.usuarios.get(usuario, ())) if usuario else None,
+                        list(segmento.entidades.get(str(entidade), ())) if entidade else None)
+                       for segmento in segmentos]
+
+        resultado = []
+        for segmento, posicoes_usuario, posicoes_entidade in reversed(filtros):
+            if not segmento.registros:
+                continue
+            if inicio and segmento.fim and segmento.fim < inicio:
+                continue
+            if fim and segmento.inicio and segmento.inicio > fim:
+                continue
+
+            posicoes = None
+            for candidatas in (posicoes_usuario, posicoes_entidade):
+                if candidatas is not None:
+                    posicoes = candidatas if posicoes is None else sorted(set(posicoes) & set(candidatas))
+            if posicoes is not None and not posicoes:
+                continue
+
+            try:
+                entradas = self._ler_segmento(segmento, posicoes)
+            except OSError as e:
+                # Segmento removido pela retenção durante a consulta
+                logging.warning(f"Segmento de auditoria indisponível: {e}")
+                continue
+
+            for entrada in reversed(entradas):
+                timestamp = entrada.get("timestamp") or ""
+                if (inicio and timestamp < inicio) or (fim and timestamp > fim):
+                    continue
+                if usuario and entrada.get("usuario") != usuario:
+                    continue
+                if entidade and entrada.get("entidade") != str(entidade):
+                    continue
+                resultado.append(entrada)
+            if limite and len(resultado) >= limite:
+                break
+
+        resultado.sort(key=lambda entrada: entrada.get("timestamp") or "", reverse=True)
+        return resultado[:limite] if limite else resultado
+
+    def usuarios(self) -> List[str]:
+        """Usuários com entradas no log (para os filtros da tela de auditoria)"""
+        with self._lock:
+            return sorted({usuario for segmento in self._segmentos for usuario in segmento.usuarios})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consulta o log de auditoria")
+    parser.add_argument("--diretorio", default="dados_sistema.auditoria")
+    parser.add_argument("--desde", type=date.fromisoformat, help="AAAA-MM-DD")
+    parser.add_argument("--ate", type=date.fromisoformat, help="AAAA-MM-DD")
+    parser.add_argument("--usuario")
+    parser.add_argument("--entidade")
+    parser.add_argument("--limite", type=int, default=50)
+    args = parser.parse_args()
+
+    log = LogAuditoria(args.diretorio)
+    entradas = log.consultar(args.desde, args.ate, args.usuario, args.entidade, args.limite)
+
+    print("=== LOG DE AUDITORIA ===")
+    print(f"{len(log)} entradas em {len(log._segmentos)} segmentos; exibindo {len(entradas)}")
+    for entrada in entradas:
+        print(f"{entrada['timestamp']}  {entrada.get('usuario') or '-':<12} "
+              f"{entrada.get('entidade') or '-':<18} {entrada['mensagem']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sistema CM - Medição da Carga Inicial dos Dados
+Compara o tempo de inicialização do GerenciadorDados lendo o arquivo JSON
+e lendo o snapshot binário gravado ao lado dele (cada carga em um processo
+novo, como na abertura do sistema)
+
+Uso:
+    python medir_carga_snapshot.py [clientes] [vendas] [repeticoes]
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import subprocess
+
+# Garantir que os módulos no mesmo diretório possam ser importados
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sistema_interface import GerenciadorDados
+from snapshot_binario import caminho_snapshot
+
+LOJAS = [f"Loja {n} (ID: {n})" for n in range(1, 9)]
+ESTADOS = ["SP", "RJ", "MG", "PR", "RS", "BA"]
+PRODUTOS = [f"Produto {n}" for n in range(1, 61)]
+
+# Executado em processo separado: carga a frio e primeiro acesso aos registros
+CARGA = """
+import sys, time
+sys.path.insert(0, {diretorio!r})
+inicio = time.perf_counter()
+from sistema_interface import GerenciadorDados
+gerenciador = GerenciadorDados({arquivo!r}, snapshot_binario={snapshot})
+dados = gerenciador.dados
+total = len(dados['cadastros']) + len(dados['historico_vendas']) + len(dados['pagamentos'])
+dados['cadastros'][0], dados['historico_vendas'][-1]
+print(time.perf_counter() - inicio, total)
+"""
+
+
+def _gerar_dados(arquivo: str, clientes: int, vendas: int):
+    """Grava um arquivo de dados sintético pelo próprio GerenciadorDados (JSON e snapshot)"""
+    aleatorio = random.Random(0)
+    gerenciador = GerenciadorDados(arquivo, usar_journal=False, snapshot_binario=True)
+    gerenciador.dados['cadastros'] = [{
+        "nome": f"Cliente {i}", "cpf": f"{i:011d}", "email": f"cliente{i}@exemplo.com",
+        "cidade": "São Paulo", "estado": aleatorio.choice(ESTADOS), "estado_civil": "Solteiro",
+        "profissao": "Vendedor", "endereco": f"Rua {i}, {aleatorio.randint(1, 999)}",
+        "telefone_celular": "(11) 91234-5678", "observacao": "",
+        "renda_mensal": f"{aleatorio.randint(1000, 9000)}.00", "limite_credito": "0",
+        "loja_cadastro": aleatorio.choice(LOJAS), "id": f"{i:016x}",
+    } for i in range(clientes)]
+    gerenciador.dados['historico_vendas'] = [{
+        "produto": aleatorio.choice(PRODUTOS), "quantidade": aleatorio.randint(1, 5),
+        "total": f"{aleatorio.randint(10, 900)}.90",
+        "timestamp": f"2025-{aleatorio.randint(1, 12):02d}-{aleatorio.randint(1, 28):02d} 10:00:00",
+        "codigo_loja": aleatorio.choice(LOJAS),
+    } for _ in range(vendas)]
+    gerenciador.dados['pagamentos'] = [{
+        "descricao": f"Pagamento {i}", "valor": "120.00", "tipo": aleatorio.choice(["entrada", "saida"]),
+        "timestamp": "2025-01-10 09:00:00",
+    } for i in range(vendas // 10)]
+    gerenciador._converter_registros(gerenciador.dados)
+    gerenciador.reconstruir_resumo_vendas()
+    gerenciador.salvar_dados()
+
+
+def _carga(arquivo: str, snapshot: bool) -> float:
+    """Tempo (s) de uma carga a frio em processo novo"""
+    codigo = CARGA.format(diretorio=os.path.dirname(os.path.abspath(__file__)), arquivo=arquivo, snapshot=snapshot)
+    saida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True,
+                           cwd=os.path.dirname(arquivo), check=True).stdout.split()
+    return float(saida[0])
+
+
+def main():
+    clientes = int(sys.argv[1]) if len(sys.argv) > 1 else 60000
+    vendas = int(sys.argv[2]) if len(sys.argv) > 2 else 600000
+    repeticoes = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    print("=== CARGA INICIAL DOS DADOS ===")
+    diretorio = tempfile.mkdtemp(prefix="carga_snapshot_")
+    try:
+        arquivo = os.path.join(diretorio, "dados_sistema.json")
+        inicio = time.perf_counter()
+        _gerar_dados(arquivo, clientes, vendas)
+        print(f"{clientes} cadastros, {vendas} vendas, {vendas // 10} pagamentos "
+              f"(gerados em {time.perf_counter() - inicio:.1f}s)")
+        print(f"  JSON:     {os.path.getsize(arquivo) / 1024 / 1024:8.1f} MB")
+        print(f"  Snapshot: {os.path.getsize(caminho_snapshot(arquivo)) / 1024 / 1024:8.1f} MB")
+
+        tempos = {}
+        for descricao, snapshot in (("JSON", False), ("Snapshot binário", True)):
+            tempos[descricao] = min(_carga(arquivo, snapshot) for _ in range(repeticoes))
+            print(f"  Carga {descricao:<18} {tempos[descricao]:6.2f}s (melhor de {repeticoes})")
+
+        print(f"Aceleração: {tempos['JSON'] / tempos['Snapshot binário']:.1f}x")
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
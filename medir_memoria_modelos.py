@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sistema CM - Medição de Memória dos Modelos
+Compara a memória ocupada por cadastros, vendas e pagamentos nas formas:
+dicionários lidos do JSON, dataclasses comuns (__dict__ por instância, sem
+internação de textos) e os modelos atuais (__slots__ e textos internados)
+
+Uso:
+    python medir_memoria_modelos.py [clientes] [vendas]
+"""
+
+import gc
+import os
+import sys
+import json
+import random
+import tracemalloc
+from dataclasses import fields, make_dataclass, field
+from decimal import Decimal
+
+# Garantir que os módulos no mesmo diretório possam ser importados
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sistema_interface import CadastroCliente, Pagamento, Venda
+
+LOJAS = [f"Loja {n} (ID: {n})" for n in range(1, 9)]
+ESTADOS = ["SP", "RJ", "MG", "PR", "RS", "BA"]
+PRODUTOS = [f"Produto {n}" for n in range(1, 61)]
+CAMPOS_DECIMAIS = ("renda_mensal", "limite_credito", "total", "valor")
+
+
+def _texto_json(clientes: int, vendas: int) -> str:
+    """Arquivo de dados sintético (os textos repetidos viram objetos distintos na leitura)"""
+    aleatorio = random.Random(0)
+    dados = {
+        "cadastros": [{
+            "nome": f"Cliente {i}", "cpf": f"{i:011d}", "email": f"cliente{i}@exemplo.com",
+            "cidade": "São Paulo", "estado": aleatorio.choice(ESTADOS), "estado_civil": "Solteiro",
+            "profissao": "Vendedor", "telefone_celular": "(11) 91234-5678",
+            "renda_mensal": f"{aleatorio.randint(1000, 9000)}.00", "limite_credito": "0",
+            "loja_cadastro": aleatorio.choice(LOJAS), "id": f"{i:016x}",
+        } for i in range(clientes)],
+        "historico_vendas": [{
+            "produto": aleatorio.choice(PRODUTOS), "quantidade": aleatorio.randint(1, 5),
+            "total": f"{aleatorio.randint(10, 900)}.90",
+            "timestamp": f"2025-{aleatorio.randint(1, 12):02d}-{aleatorio.randint(1, 28):02d} 10:00:00",
+            "codigo_loja": aleatorio.choice(LOJAS),
+        } for _ in range(vendas)],
+        "pagamentos": [{
+            "descricao": f"Pagamento {i}", "valor": "120.00", "tipo": aleatorio.choice(["entrada", "saida"]),
+            "timestamp": "2025-01-10 09:00:00",
+        } for i in range(vendas // 10)],
+    }
+    return json.dumps(dados)
+
+
+def _classe_comum(classe):
+    """Cópia da dataclass sem slots e sem __post_init__ (forma anterior dos modelos)"""
+    return make_dataclass(f"{classe.__name__}Comum", [
+        (campo.name, campo.type, field(default=campo.default)) for campo in fields(classe)])
+
+
+def _forma_anterior(colecao: str, registro):
+    """Argumentos como o __post_init__ anterior deixava (Decimais e listas por instância)"""
+    argumentos = {chave: Decimal(valor) if chave in CAMPOS_DECIMAIS else valor for chave, valor in registro.items()}
+    if colecao == "cadastros":
+        argumentos.update(telefones_adicionais=[], referencias=[])
+    return argumentos
+
+
+def _medir(descricao: str, texto: str, construir) -> int:
+    """Memória retida (bytes) pelos registros construídos a partir do texto JSON"""
+    gc.collect()
+    tracemalloc.start()
+    dados = json.loads(texto)
+    registros = {colecao: construir(colecao, lista) for colecao, lista in dados.items()}
+    del dados
+    gc.collect()
+    atual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    quantidade = sum(len(lista) for lista in registros.values())
+    print(f"  {descricao:<42} {atual / 1024 / 1024:8.1f} MB  ({atual / quantidade:6.0f} bytes/registro)")
+    del registros
+    return atual
+
+
+def main():
+    clientes = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    vendas = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+
+    print("=== MEMÓRIA DOS MODELOS ===")
+    print(f"{clientes} cadastros, {vendas} vendas, {vendas // 10} pagamentos")
+    texto = _texto_json(clientes, vendas)
+
+    modelos = {"cadastros": CadastroCliente, "historico_vendas": Venda, "pagamentos": Pagamento}
+    comuns = {colecao: _classe_comum(classe) for colecao, classe in modelos.items()}
+
+    dicionarios = _medir("Dicionários (JSON)", texto, lambda colecao, lista: lista)
+    anteriores = _medir("Dataclasses com __dict__", texto, lambda colecao, lista: [
+        comuns[colecao](**_forma_anterior(colecao, registro)) for registro in lista])
+    atuais = _medir("Modelos com __slots__ e textos internados", texto, lambda colecao, lista: [
+        modelos[colecao](**registro) for registro in lista])
+
+    print(f"Redução em relação às dataclasses com __dict__: {100 * (1 - atuais / anteriores):.0f}%")
+    print(f"Redução em relação aos dicionários: {100 * (1 - atuais / dicionarios):.0f}%")
+
+
+if __name__ == "__main__":
+    main()
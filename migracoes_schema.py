@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Migrações versionadas do schema do sistema.db
+Cria os índices das consultas mais frequentes e verifica os planos de execução
+"""
+
+import sqlite3
+import logging
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+import consultas_financeiras
+import eventos_clientes
+
+
+class MigracaoPendente(Exception):
+    """Tabelas usadas pela migração ainda não existem (a migração fica para depois)"""
+
+
+def _objeto_existe(cur, tipo, nome):
+    """Verifica se o objeto (table, index, trigger) existe no banco"""
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = ? AND name = ?", (tipo, nome))
+    return cur.fetchone() is not None
+
+
+def _tabela_existe(cur, tabela):
+    """Verifica se a tabela existe no banco"""
+    return _objeto_existe(cur, "table", tabela)
+
+
+def _colunas(cur, tabela):
+    """Nomes das colunas da tabela"""
+    cur.execute(f"PRAGMA table_info({tabela})")
+    return [info[1] for info in cur.fetchall()]
+
+
+def _exigir_tabelas(cur, *tabelas):
+    """Adia a migração (MigracaoPendente) se alguma das tabelas não existir"""
+    faltando = [tabela for tabela in tabelas if not _tabela_existe(cur, tabela)]
+    if faltando:
+        raise MigracaoPendente(f"tabelas inexistentes: {', '.join(faltando)}")
+
+
+def _criar_indices(cur, indices):
+    """Cria índices (nome, tabela, colunas); todas as tabelas precisam existir"""
+    _exigir_tabelas(cur, *sorted({tabela for _, tabela, _ in indices}))
+    for nome, tabela, colunas in indices:
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {nome} ON {tabela} ({', '.join(colunas)})")
+        logging.info(f"Índice {nome} criado em {tabela}")
+
+
+def _indices_faltando(cur, indices):
+    """Índices (nome, tabela, colunas) ausentes em tabelas que existem"""
+    return [nome for nome, tabela, _ in indices
+            if _tabela_existe(cur, tabela) and not _objeto_existe(cur, "index", nome)]
+
+
+def migracao_001_indices_consultas(cur):
+    """Índices cobrindo as consultas das telas de contratos"""
+    # Tabela criada sob demanda pelo pagamento de parcelas; garantir antes dos índices
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS historico_transacoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transacao_id TEXT UNIQUE NOT NULL,
+            tipo TEXT NOT NULL,
+            contrato_id INTEGER,
+            parcela_id INTEGER,
+            valor_original REAL,
+            valor_transacao REAL,
+            status_anterior TEXT,
+            status_novo TEXT,
+            data_transacao TEXT,
+            observacoes TEXT,
+            pode_estornar INTEGER DEFAULT 1,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    _criar_indices(cur, INDICES_CONSULTAS)
+
+
+# Índices da migração 1: (nome, tabela, colunas)
+INDICES_CONSULTAS = [
+    # Contratos do cliente (ativos e histórico), ordenados por criação
+    ("idx_contrato_curso_cliente_status", "contrato_curso",
+     ["cliente_id", "status", "created_at", "curso_id", "data_venda", "valor_total",
+      "num_parcelas", "valor_parcela", "cashback_valor"]),
+    # Parcelas do contrato por número; cobre a busca da parcela pendente e as contagens por status
+    ("idx_parcela_contrato_contrato_numero", "parcela_contrato",
+     ["contrato_id", "numero_parcela", "status", "valor", "data_vencimento", "data_pagamento"]),
+    # Transações do contrato para a tela de estorno
+    ("idx_historico_transacoes_contrato", "historico_transacoes", ["contrato_id", "created_at"]),
+    # Liberação de cashback por contrato
+    ("idx_cashback_cliente_contrato", "cashback_cliente", ["contrato_id"]),
+    # Busca do cliente pelo nome ao abrir os contratos
+    ("idx_cliente_full_nome", "cliente_full", ["nome"]),
+    # Lojas ativas no combobox de cadastro
+    ("idx_loja_ativo_nome", "loja", ["ativo", "nome"]),
+]
+
+
+# Colunas de data gravadas como texto (dd/mm/aaaa) que ganham coluna *_jd indexável
+COLUNAS_DATA = [
+    ("parcela_contrato", "data_vencimento"),
+    ("parcela_contrato", "data_pagamento"),
+    ("lancamento_receita", "data"),
+    ("lancamento_despesa", "data"),
+    ("fluxo_caixa", "data"),
+]
+
+
+def _expressao_dia_juliano(coluna):
+    """Expressão SQL que converte texto dd/mm/aaaa ou aaaa-mm-dd em dia juliano inteiro"""
+    return (f"CASE WHEN {coluna} LIKE '__/__/____' "
+            f"THEN CAST(julianday(substr({coluna}, 7, 4) || '-' || substr({coluna}, 4, 2) || '-' || substr({coluna}, 1, 2)) + 0.5 AS INTEGER) "
+            f"ELSE CAST(julianday(substr({coluna}, 1, 10)) + 0.5 AS INTEGER) END")
+
+
+def migracao_002_datas_juliano(cur):
+    """Colunas de data em dia juliano inteiro, mantidas por triggers e indexadas"""
+    _exigir_tabelas(cur, *sorted({tabela for tabela, _ in COLUNAS_DATA}))
+    for tabela, coluna in COLUNAS_DATA:
+        if f"{coluna}_jd" not in _colunas(cur, tabela):
+            cur.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna}_jd INTEGER")
+
+        # Converter dados existentes
+        cur.execute(f"UPDATE {tabela} SET {coluna}_jd = {_expressao_dia_juliano(coluna)}")
+
+        # Triggers mantêm a coluna em dia para qualquer código que grave o texto
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{tabela}_{coluna}_jd_insert
+            AFTER INSERT ON {tabela}
+            BEGIN
+                UPDATE {tabela} SET {coluna}_jd = {_expressao_dia_juliano(f"NEW.{coluna}")} WHERE id = NEW.id;
+            END
+        """)
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{tabela}_{coluna}_jd_update
+            AFTER UPDATE OF {coluna} ON {tabela}
+            BEGIN
+                UPDATE {tabela} SET {coluna}_jd = {_expressao_dia_juliano(f"NEW.{coluna}")} WHERE id = NEW.id;
+            END
+        """)
+        logging.info(f"Coluna {coluna}_jd criada em {tabela}")
+
+    _criar_indices(cur, INDICES_DATAS)
+
+
+# Índices da migração 2: (nome, tabela, colunas)
+INDICES_DATAS = [
+    # Parcelas vencidas: status + faixa de vencimento
+    ("idx_parcela_contrato_status_vencimento", "parcela_contrato",
+     ["status", "data_vencimento_jd", "contrato_id", "numero_parcela", "valor"]),
+    ("idx_parcela_contrato_pagamento", "parcela_contrato",
+     ["data_pagamento_jd", "contrato_id", "numero_parcela", "valor"]),
+    # Lançamentos por período, geral e por loja
+    ("idx_lancamento_receita_data", "lancamento_receita", ["data_jd"]),
+    ("idx_lancamento_receita_loja_data", "lancamento_receita", ["loja_id", "data_jd"]),
+    ("idx_lancamento_despesa_data", "lancamento_despesa", ["data_jd"]),
+    ("idx_lancamento_despesa_loja_data", "lancamento_despesa", ["loja_id", "data_jd"]),
+    # Fluxo de caixa da loja por período
+    ("idx_fluxo_caixa_loja_data", "fluxo_caixa", ["loja_id", "data_jd"]),
+]
+
+
+def _faltando_datas_juliano(cur):
+    """Colunas *_jd, triggers e índices da migração 2 ausentes (tabela recriada depois dela)"""
+    faltando = []
+    for tabela, coluna in COLUNAS_DATA:
+        if not _tabela_existe(cur, tabela):
+            continue
+        if f"{coluna}_jd" not in _colunas(cur, tabela):
+            faltando.append(f"{tabela}.{coluna}_jd")
+        for evento in ("insert", "update"):
+            trigger = f"trg_{tabela}_{coluna}_jd_{evento}"
+            if not _objeto_existe(cur, "trigger", trigger):
+                faltando.append(trigger)
+    return faltando + _indices_faltando(cur, INDICES_DATAS)
+
+
+def migracao_003_eventos_cliente(cur):
+    """Tabela de eventos de clientes (cadastros, contratos, pagamentos e contatos)
+
+    Contratos, pagamentos/estornos de parcelas e contatos são registrados por
+    triggers; os cadastros feitos pelo GerenciadorDados são registrados em
+    adicionar_cliente. Os eventos já existentes são importados.
+    """
+    _exigir_tabelas(cur, "cliente_full", "contrato_curso", "parcela_contrato", "contatos")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS evento_cliente (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tipo TEXT NOT NULL,
+            data_jd INTEGER NOT NULL,
+            cliente_id INTEGER,
+            cliente_chave TEXT,
+            loja_id INTEGER,
+            valor REAL,
+            referencia_id INTEGER,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Loja do cliente do contrato (cliente_full.loja_id), quando existir
+    possui_loja = "loja_id" in _colunas(cur, "cliente_full")
+
+    def loja_cliente(cliente_id):
+        return f"(SELECT loja_id FROM cliente_full WHERE id = {cliente_id})" if possui_loja else "NULL"
+
+    hoje = "CAST(julianday(date('now', 'localtime')) + 0.5 AS INTEGER)"
+    colunas_evento = "(tipo, data_jd, cliente_id, loja_id, valor, referencia_id)"
+
+    cur.execute(f"""
+        INSERT INTO evento_cliente {colunas_evento}
+        SELECT 'contrato', {_expressao_dia_juliano("data_venda")}, cliente_id,
+               {loja_cliente("contrato_curso.cliente_id")}, valor_total, id
+        FROM contrato_curso
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_contrato_curso_evento
+        AFTER INSERT ON contrato_curso
+        BEGIN
+            INSERT INTO evento_cliente {colunas_evento}
+            VALUES ('contrato', COALESCE({_expressao_dia_juliano("NEW.data_venda")}, {hoje}),
+                    NEW.cliente_id, {loja_cliente("NEW.cliente_id")}, NEW.valor_total, NEW.id);
+        END
+    """)
+    logging.info("Eventos de contratos registrados")
+
+    cliente_parcela = "(SELECT cliente_id FROM contrato_curso WHERE id = {}.contrato_id)"
+    cur.execute(f"""
+        INSERT INTO evento_cliente {colunas_evento}
+        SELECT 'pagamento', {_expressao_dia_juliano("data_pagamento")},
+               {cliente_parcela.format("parcela_contrato")},
+               {loja_cliente(cliente_parcela.format("parcela_contrato"))}, valor, id
+        FROM parcela_contrato
+        WHERE status = 'Paga' AND data_pagamento IS NOT NULL
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_parcela_contrato_evento_pagamento
+        AFTER UPDATE OF status ON parcela_contrato
+        WHEN NEW.status = 'Paga' AND OLD.status IS NOT 'Paga'
+        BEGIN
+            INSERT INTO evento_cliente {colunas_evento}
+            VALUES ('pagamento', COALESCE({_expressao_dia_juliano("NEW.data_pagamento")}, {hoje}),
+                    {cliente_parcela.format("NEW")}, {loja_cliente(cliente_parcela.format("NEW"))},
+                    NEW.valor, NEW.id);
+        END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_parcela_contrato_evento_estorno
+        AFTER UPDATE OF status ON parcela_contrato
+        WHEN OLD.status = 'Paga' AND NEW.status IS NOT 'Paga'
+        BEGIN
+            INSERT INTO evento_cliente {colunas_evento}
+            VALUES ('estorno', {hoje}, {cliente_parcela.format("NEW")},
+                    {loja_cliente(cliente_parcela.format("NEW"))}, -OLD.valor, NEW.id);
+        END
+    """)
+    logging.info("Eventos de pagamentos de parcelas registrados")
+
+    cur.execute(f"""
+        INSERT INTO evento_cliente {colunas_evento}
+        SELECT 'contato', {_expressao_dia_juliano("data_contato")}, cliente_id,
+               {loja_cliente("contatos.cliente_id")}, NULL, id
+        FROM contatos
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_contatos_evento
+        AFTER INSERT ON contatos
+        BEGIN
+            INSERT INTO evento_cliente {colunas_evento}
+            VALUES ('contato', COALESCE({_expressao_dia_juliano("NEW.data_contato")}, {hoje}),
+                    NEW.cliente_id, {loja_cliente("NEW.cliente_id")}, NULL, NEW.id);
+        END
+    """)
+    logging.info("Eventos de contatos registrados")
+
+    # Datas inválidas na origem não entram nas consultas por período
+    cur.execute("DELETE FROM evento_cliente WHERE data_jd IS NULL")
+
+    _criar_indices(cur, [
+        # Relatório de clientes: faixa de datas, geral e por loja
+        ("idx_evento_cliente_data", "evento_cliente", ["data_jd", "tipo", "valor"]),
+        ("idx_evento_cliente_loja_data", "evento_cliente", ["loja_id", "data_jd", "tipo", "valor"]),
+    ])
+
+
+def migracao_004_importacao_cadastros(cur):
+    """Controle da importação única dos cadastros do GerenciadorDados para evento_cliente
+
+    Os cadastros ficam no arquivo de dados, fora do sistema.db: a importação
+    é feita pelo GerenciadorDados (eventos_clientes.importar_cadastros) e
+    registrada aqui por arquivo de origem.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS evento_cliente_importacao (
+            origem TEXT PRIMARY KEY,
+            cadastros INTEGER NOT NULL,
+            importado_em DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+# Migrações em ordem: (versão, descrição, função)
+MIGRACOES = [
+    (1, "Índices das consultas de contratos, parcelas e transações", migracao_001_indices_consultas),
+    (2, "Datas em dia juliano indexado nas tabelas financeiras", migracao_002_datas_juliano),
+    (3, "Eventos de clientes indexados por data e loja", migracao_003_eventos_cliente),
+    (4, "Importação dos cadastros existentes para os eventos de clientes", migracao_004_importacao_cadastros),
+]
+
+# Verificação das migrações que podem ser reaplicadas: versão -> função que
+# lista o que a migração criou e não existe mais (ex.: tabela recriada por
+# um script de manutenção)
+VERIFICACOES = {
+    1: lambda cur: _indices_faltando(cur, INDICES_CONSULTAS),
+    2: _faltando_datas_juliano,
+}
+
+# Consultas críticas verificadas com EXPLAIN QUERY PLAN: (descrição, sql, parâmetros)
+CONSULTAS_CRITICAS = [
+    ("Cliente por nome",
+     "SELECT id FROM cliente_full WHERE nome = ?", ("x",)),
+    ("Contratos ativos do cliente", """
+        SELECT cc.id, cc.data_venda, cu.nome as curso_nome, cc.valor_total,
+               cc.num_parcelas, cc.valor_parcela, cc.cashback_valor, cc.status
+        FROM contrato_curso cc
+        LEFT JOIN curso cu ON cc.curso_id = cu.id
+        WHERE cc.cliente_id = ? AND cc.status = 'Ativo'
+        ORDER BY cc.created_at DESC
+     """, (1,)),
+    ("Histórico de contratos do cliente", """
+        SELECT cc.id, cc.data_venda, cu.nome as curso_nome, cc.valor_total,
+               cc.num_parcelas, cc.valor_parcela, cc.cashback_valor, cc.status
+        FROM contrato_curso cc
+        LEFT JOIN curso cu ON cc.curso_id = cu.id
+        WHERE cc.cliente_id = ?
+        ORDER BY cc.created_at DESC
+     """, (1,)),
+    ("Parcelas do contrato", """
+        SELECT id, numero_parcela, data_vencimento, valor, status, data_pagamento
+        FROM parcela_contrato
+        WHERE contrato_id = ?
+        ORDER BY numero_parcela
+     """, (1,)),
+    ("Parcela pendente do contrato", """
+        SELECT id, valor FROM parcela_contrato
+        WHERE contrato_id = ? AND numero_parcela = ? AND status = 'Pendente'
+     """, (1, 1)),
+    ("Situação das parcelas do contrato", """
+        SELECT COUNT(*) as total,
+               COUNT(CASE WHEN status = 'Paga' THEN 1 END) as pagas,
+               SUM(CASE WHEN status = 'Paga' THEN valor ELSE 0 END) as valor_pago
+        FROM parcela_contrato WHERE contrato_id = ?
+     """, (1,)),
+    ("Transações do contrato", """
+        SELECT transacao_id, tipo, data_transacao, valor_transacao,
+               CASE WHEN pode_estornar = 1 THEN 'Pode estornar' ELSE 'Já estornado' END,
+               observacoes
+        FROM historico_transacoes
+        WHERE contrato_id = ?
+        ORDER BY created_at DESC
+     """, (1,)),
+    ("Transação por ID",
+     "SELECT * FROM historico_transacoes WHERE transacao_id = ? AND pode_estornar = 1", ("x",)),
+    ("Cashback do contrato",
+     "UPDATE cashback_cliente SET status = 'Liberado', data_liberacao = ? WHERE contrato_id = ?", ("x", 1)),
+    ("Lojas ativas",
+     "SELECT id, nome FROM loja WHERE ativo = 1 ORDER BY nome", ()),
+    ("Parcelas vencidas", consultas_financeiras.SQL_PARCELAS_VENCIDAS, (0,)),
+    ("Parcelas pagas no período", consultas_financeiras.SQL_PARCELAS_PAGAS_PERIODO, (0, 0)),
+    ("Receitas do período", consultas_financeiras.SQL_RECEITAS_PERIODO, (0, 0)),
+    ("Receitas da loja no período", consultas_financeiras.SQL_RECEITAS_LOJA_PERIODO, (1, 0, 0)),
+    ("Despesas do período", consultas_financeiras.SQL_DESPESAS_PERIODO, (0, 0)),
+    ("Despesas da loja no período", consultas_financeiras.SQL_DESPESAS_LOJA_PERIODO, (1, 0, 0)),
+    ("Fluxo de caixa da loja", consultas_financeiras.SQL_FLUXO_CAIXA_PERIODO, (1, 0, 0)),
+    ("Eventos de clientes por dia", eventos_clientes.SQL_EVENTOS_POR_DIA, (0, 0)),
+    ("Eventos de clientes da loja por dia", eventos_clientes.SQL_EVENTOS_LOJA_POR_DIA, (1, 0, 0)),
+]
+
+
+def versao_atual(conn):
+    """Retorna a versão de schema registrada no banco (0 se nenhuma)"""
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_versao (
+            versao INTEGER PRIMARY KEY,
+            descricao TEXT NOT NULL,
+            aplicada_em DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("SELECT MAX(versao) FROM schema_versao")
+    return cur.fetchone()[0] or 0
+
+
+def aplicar_migracoes(conn):
+    """Aplica as migrações pendentes, cada uma em sua própria transação
+
+    A versão só é registrada quando a migração é aplicada por inteiro. Uma
+    migração cujas tabelas ainda não existem é desfeita e fica (com as
+    seguintes) para a próxima verificação do schema. Migrações já
+    registradas com VERIFICACOES são reaplicadas se o que criaram sumiu.
+
+    Returns:
+        int: Versão do schema após as migrações
+    """
+    versao = versao_atual(conn)
+    conn.commit()
+
+    for numero, descricao, migracao in MIGRACOES:
+        cur = conn.cursor()
+        aplicada = numero <= versao
+        if aplicada:
+            verificar = VERIFICACOES.get(numero)
+            faltando = verificar(cur) if verificar else []
+            if not faltando:
+                continue
+            logging.warning(f"Reaplicando migração {numero}, faltando: {', '.join(faltando)}")
+        else:
+            logging.info(f"Aplicando migração {numero}: {descricao}")
+
+        try:
+            cur.execute("BEGIN")
+            migracao(cur)
+            if not aplicada:
+                cur.execute("INSERT INTO schema_versao (versao, descricao) VALUES (?, ?)", (numero, descricao))
+            conn.commit()
+        except MigracaoPendente as e:
+            conn.rollback()
+            logging.warning(f"Migração {numero} adiada: {e}")
+            break
+        except Exception as e:
+            conn.rollback()
+            logging.error(f"Erro na migração {numero}: {e}")
+            raise
+        versao = max(versao, numero)
+
+    # Atualizar estatísticas usadas pelo planejador de consultas
+    conn.execute("PRAGMA optimize")
+    return versao
+
+
+def verificar_planos(conn, consultas=None):
+    """Verifica se alguma consulta crítica recorre a varredura completa de tabela
+
+    Returns:
+        list: Tuplas (descrição, detalhe do plano) das consultas com SCAN
+    """
+    falhas = []
+    cur = conn.cursor()
+
+    for descricao, sql, parametros in consultas or CONSULTAS_CRITICAS:
+        try:
+            cur.execute(f"EXPLAIN QUERY PLAN {sql}", parametros)
+        except sqlite3.OperationalError as e:
+            # Tabela ainda não criada neste banco
+            logging.warning(f"Consulta '{descricao}' ignorada: {e}")
+            continue
+
+        for linha in cur.fetchall():
+            detalhe = linha[-1]
+            if detalhe.startswith("SCAN"):
+                falhas.append((descricao, detalhe))
+
+    return falhas
+
+
+def main():
+    from db import get_connection
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    conn = get_connection()
+    try:
+        if "--verificar" not in sys.argv:
+            print("=== MIGRAÇÕES DO SCHEMA ===")
+            versao = aplicar_migracoes(conn)
+            print(f"\nSchema na versão {versao}")
+
+        print("\n=== VERIFICAÇÃO DOS PLANOS DE CONSULTA ===")
+        falhas = verificar_planos(conn)
+        for descricao, detalhe in falhas:
+            print(f"FALHA - {descricao}: {detalhe}")
+        if falhas:
+            sys.exit(1)
+        print("Nenhuma consulta crítica com varredura completa de tabela")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sistema CM - Relatórios em PDF
+Renderização do relatório (resumo, gráficos e tabela) com o backend PDF do
+matplotlib e geração em lote de um PDF por loja e período, em paralelo
+"""
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+
+# Garantir que os módulos no mesmo diretório possam ser importados
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agregacao_relatorios import agrupar_periodos, interpretar_periodo, quadro_resumo
+from estatisticas_relatorios import EstatisticasRelatorio
+from graficos_relatorios import desenhar_distribuicao, desenhar_grafico
+
+# Página A4 em paisagem (polegadas)
+TAMANHO_PAGINA = (11.69, 8.27)
+LINHAS_POR_PAGINA = 30
+
+
+def _moeda(valor: float) -> str:
+    """Valor formatado para exibição (R$ 1234,50)"""
+    return f"R$ {valor:.2f}".replace('.', ',')
+
+
+def _pagina_resumo(titulo: str, informacoes: Dict[str, str], dados_agrupados: Dict[str, Dict[str, Any]],
+                   tipo_grafico: str, rotulo_valor: str, estatisticas: EstatisticasRelatorio) -> Figure:
+    """Primeira página: informações, estatísticas e gráfico principal"""
+    linhas = [f"{chave}: {valor}" for chave, valor in informacoes.items()]
+    textos = [
+        f"Total de registros: {estatisticas.registros}",
+        f"Valor total: {_moeda(estatisticas.soma)}",
+        f"Ticket médio: {_moeda(estatisticas.ticket_medio)}",
+        f"Maior valor: {_moeda(estatisticas.maximo)} ({estatisticas.chave_maximo})",
+        f"Menor valor: {_moeda(estatisticas.minimo)} ({estatisticas.chave_minimo})",
+        f"Desvio padrão por período: {_moeda(estatisticas.desvio_padrao)}",
+    ]
+    if estatisticas.tickets.peso > 0:
+        textos.append(f"Ticket (mediana / p90): {_moeda(estatisticas.percentil_ticket(50))} / "
+                      f"{_moeda(estatisticas.percentil_ticket(90))}")
+
+    fig = Figure(figsize=TAMANHO_PAGINA)
+    fig.suptitle(titulo, fontsize=16, fontweight="bold")
+    fig.text(0.06, 0.90, "\n".join(linhas), va="top", fontsize=10, linespacing=1.6)
+    fig.text(0.55, 0.90, "\n".join(textos), va="top", fontsize=10, linespacing=1.6)
+
+    ax = fig.add_axes([0.08, 0.10, 0.86, 0.52])
+    desenhar_grafico(ax, dados_agrupados, tipo_grafico, "Valores por Período", rotulo_valor)
+    return fig
+
+
+def _pagina_distribuicao(dados_agrupados: Dict[str, Dict[str, Any]]) -> Figure:
+    """Página com a distribuição dos valores por período"""
+    fig = Figure(figsize=TAMANHO_PAGINA)
+    desenhar_distribuicao(fig.add_subplot(), dados_agrupados)
+    fig.tight_layout()
+    return fig
+
+
+def _paginas_tabela(dados_agrupados: Dict[str, Dict[str, Any]]):
+    """Páginas da tabela (Período, Quantidade, Valor Total, Ticket Médio)"""
+    colunas = ("Período", "Quantidade", "Valor Total", "Ticket Médio")
+    linhas = []
+    for periodo, dados in dados_agrupados.items():
+        quantidade = dados['quantidade']
+        ticket_medio = dados['valor_total'] / quantidade if quantidade > 0 else 0
+        linhas.append((periodo, str(quantidade), _moeda(dados['valor_total']), _moeda(ticket_medio)))
+
+    for inicio in range(0, len(linhas), LINHAS_POR_PAGINA):
+        fig = Figure(figsize=TAMANHO_PAGINA)
+        ax = fig.add_axes([0.06, 0.06, 0.88, 0.86])
+        ax.axis("off")
+        ax.set_title("Tabela por Período", loc="left", fontweight="bold")
+        tabela = ax.table(cellText=linhas[inicio:inicio + LINHAS_POR_PAGINA], colLabels=colunas,
+                          loc="upper center", cellLoc="right", colLoc="center")
+        tabela.auto_set_font_size(False)
+        tabela.set_fontsize(9)
+        yield fig
+
+
+def renderizar_pdf(caminho: str, titulo: str, informacoes: Dict[str, str],
+                   dados_agrupados: Dict[str, Dict[str, Any]], tipo_grafico: str = "barras",
+                   rotulo_valor: str = "Valor Total (R$)",
+                   estatisticas: Optional[EstatisticasRelatorio] = None) -> str:
+    """Grava o relatório em PDF: resumo com gráfico, distribuição e tabela
+
+    Usa apenas Figure (sem pyplot), podendo rodar fora da thread da interface.
+    Sem as estatísticas do agrupamento, elas são calculadas dos dados agrupados.
+
+    Returns:
+        str: Caminho do arquivo gravado
+    """
+    with PdfPages(caminho) as pdf:
+        if not dados_agrupados:
+            fig = Figure(figsize=TAMANHO_PAGINA)
+            fig.suptitle(titulo, fontsize=16, fontweight="bold")
+            fig.text(0.5, 0.5, "Sem dados para exibir no período selecionado", ha="center")
+            pdf.savefig(fig)
+            return caminho
+
+        if estatisticas is None:
+            estatisticas = EstatisticasRelatorio.de_periodos(dados_agrupados)
+        pdf.savefig(_pagina_resumo(titulo, informacoes, dados_agrupados, tipo_grafico, rotulo_valor, estatisticas))
+        pdf.savefig(_pagina_distribuicao(dados_agrupados))
+        for fig in _paginas_tabela(dados_agrupados):
+            pdf.savefig(fig)
+
+        metadados = pdf.infodict()
+        metadados["Title"] = titulo
+        metadados["Creator"] = "Sistema CM"
+    return caminho
+
+
+def _renderizar_tarefa(tarefa: Tuple) -> str:
+    """Renderiza um PDF do lote (executado nos processos de trabalho)"""
+    return renderizar_pdf(*tarefa)
+
+
+def exportar_pdfs_por_loja(resumo_vendas, diretorio: str, periodos: Sequence[Tuple[date, date]],
+                           agrupamento: str = "diario", lojas: Optional[Sequence[str]] = None,
+                           processos: Optional[int] = None) -> List[str]:
+    """Gera um PDF de vendas por loja e período, em paralelo
+
+    Os dados vêm do resumo diário de vendas (já agregado por dia, loja e
+    produto) e são agrupados aqui, uma única vez por período; os processos
+    de trabalho apenas renderizam as páginas.
+
+    Args:
+        resumo_vendas: ResumoVendasDiario do GerenciadorDados
+        diretorio: Pasta de destino dos arquivos
+        periodos: Pares (início, fim), ex.: um por mês do fechamento
+        agrupamento: "diario", "semanal", "mensal" ou "anual"
+        lojas: Lojas a gerar (padrão: todas com vendas no período)
+        processos: Processos de trabalho (padrão: núcleos disponíveis; 1 = sem paralelismo)
+
+    Returns:
+        List[str]: Arquivos gravados
+    """
+    destino = Path(diretorio)
+    destino.mkdir(parents=True, exist_ok=True)
+    gerado_em = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+
+    tarefas = []
+    for inicio, fim in periodos:
+        quadro = quadro_resumo(resumo_vendas.linhas(inicio, fim))
+        lojas_periodo = lojas if lojas is not None else sorted(
+            str(loja) for loja in quadro["loja"].dropna().unique())
+
+        for loja in lojas_periodo:
+            estatisticas = EstatisticasRelatorio()
+            dados_agrupados = agrupar_periodos(quadro[quadro["loja"] == loja], agrupamento, estatisticas)
+            periodo_str = f"{inicio.strftime('%d/%m/%Y')} a {fim.strftime('%d/%m/%Y')}"
+            informacoes = {
+                "Loja": loja,
+                "Período": periodo_str,
+                "Agrupamento": agrupamento.capitalize(),
+                "Data de Geração": gerado_em,
+            }
+            caminho = str(destino / f"vendas_{loja}_{inicio.isoformat()}_{fim.isoformat()}.pdf")
+            tarefas.append((caminho, f"Relatório de Vendas - Loja {loja}", informacoes, dados_agrupados,
+                            "barras", "Valor Total (R$)", estatisticas))
+
+    if processos == 1 or len(tarefas) <= 1:
+        return [_renderizar_tarefa(tarefa) for tarefa in tarefas]
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        return list(executor.map(_renderizar_tarefa, tarefas))
+
+
+def main():
+    """Fechamento mensal: um PDF por loja para cada mês informado (AAAA-MM)"""
+    from sistema_interface import GerenciadorDados
+
+    meses = [argumento for argumento in sys.argv[1:] if not argumento.startswith("--")]
+    if not meses:
+        print("Uso: python pdf_relatorios.py AAAA-MM [AAAA-MM ...] [--sqlite]")
+        sys.exit(1)
+
+    backend = "sqlite" if "--sqlite" in sys.argv else "json"
+    gerenciador = GerenciadorDados(backend=backend)
+
+    print("=== RELATÓRIOS DE VENDAS EM PDF POR LOJA ===")
+    inicio_execucao = datetime.now()
+    arquivos = exportar_pdfs_por_loja(gerenciador.resumo_vendas, "relatorios_pdf",
+                                      [interpretar_periodo(mes) for mes in meses])
+    for arquivo in arquivos:
+        print(f"  {arquivo}")
+    print(f"{len(arquivos)} arquivos gerados em {(datetime.now() - inicio_execucao).total_seconds():.1f}s")
+
+
+if __name__ == "__main__":
+    main()
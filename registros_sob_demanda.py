@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sistema CM - Registros sob Demanda
+Lista dos registros carregados do arquivo JSON mantidos como dicionários e
+convertidos em objetos do modelo apenas quando acessados
+"""
+
+from collections.abc import MutableSequence
+from dataclasses import MISSING, asdict, fields
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class _Ausente:
+    """Marca de campo inexistente no registro (diferente de um campo nulo)"""
+
+    def __repr__(self):
+        return "AUSENTE"
+
+
+AUSENTE = _Ausente()
+
+
+def campos_modelo(classe) -> Tuple[frozenset, frozenset]:
+    """Campos aceitos e campos obrigatórios (sem valor padrão) da dataclass"""
+    todos = fields(classe)
+    obrigatorios = {campo.name for campo in todos
+                    if campo.default is MISSING and campo.default_factory is MISSING}
+    return frozenset(campo.name for campo in todos), frozenset(obrigatorios)
+
+
+class ListaSobDemanda(MutableSequence):
+    """Lista de registros hidratados no acesso
+
+    Cada posição guarda o registro bruto até ser acessada por índice; nesse
+    momento é convertida pela função converter e o objeto substitui o
+    registro bruto (alterações no objeto passam a valer para o salvamento).
+    A iteração converte sem guardar, como a ListaSQLite, para que percorrer
+    o histórico não mantenha todos os objetos em memória.
+
+    O registro bruto é o dicionário lido do JSON ou, vindo do snapshot
+    binário, uma tupla na ordem de colunas (AUSENTE nos campos inexistentes
+    e valores das colunas em centavos como int).
+    """
+
+    def __init__(self, registros: Iterable[Any], converter: Callable[[Dict[str, Any]], Any],
+                 colunas: Optional[Sequence[str]] = None, centavos: Sequence[str] = ()):
+        self._itens: List[Any] = registros if type(registros) is list else list(registros)
+        self._converter = converter
+        self._colunas = tuple(colunas or ())
+        self._posicoes = {coluna: i for i, coluna in enumerate(self._colunas)}
+        self._centavos = frozenset(centavos)
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def _valor(self, coluna: str, valor):
+        """Valor de uma coluna da tupla no formato do dicionário"""
+        if coluna in self._centavos and type(valor) is int:
+            return Decimal(valor).scaleb(-2)
+        return valor
+
+    def _dicionario(self, item) -> Dict[str, Any]:
+        """Registro bruto em dicionário"""
+        if type(item) is dict:
+            return item
+        return {coluna: self._valor(coluna, valor) for coluna, valor in zip(self._colunas, item)
+                if valor is not AUSENTE}
+
+    def _converter_item(self, item):
+        return self._converter(self._dicionario(item))
+
+    def _hidratar(self, indice: int):
+        item = self._itens[indice]
+        if isinstance(item, (dict, tuple)):
+            item = self._converter_item(item)
+            self._itens[indice] = item
+        return item
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self._hidratar(i) for i in range(*indice.indices(len(self)))]
+        return self._hidratar(indice)
+
+    def __iter__(self):
+        for item in self._itens:
+            yield self._converter_item(item) if isinstance(item, (dict, tuple)) else item
+
+    def __setitem__(self, indice, objeto):
+        self._itens[indice] = objeto
+
+    def __delitem__(self, indice):
+        del self._itens[indice]
+
+    def insert(self, indice, objeto):
+        self._itens.insert(indice, objeto)
+
+    def _campo(self, item, campo: str, padrao=""):
+        """Valor de um campo do registro (bruto ou já convertido)"""
+        if type(item) is dict:
+            return item.get(campo, padrao)
+        if type(item) is tuple:
+            posicao = self._posicoes.get(campo)
+            if posicao is None or item[posicao] is AUSENTE:
+                return padrao
+            return self._valor(campo, item[posicao])
+        return getattr(item, campo)
+
+    def iterar_onde(self, campo: str, condicao: Callable[[Any], bool]):
+        """Objetos cujo campo satisfaz a condição, testada antes da conversão"""
+        for item in self._itens:
+            if condicao(self._campo(item, campo, None)):
+                yield self._converter_item(item) if isinstance(item, (dict, tuple)) else item
+
+    def hidratados(self) -> int:
+        """Quantidade de registros já convertidos em objetos"""
+        return sum(1 for item in self._itens if not isinstance(item, (dict, tuple)))
+
+    def campos(self, indice: int, nomes: Sequence[str], padroes: Dict[str, Any] = None) -> Tuple:
+        """Valores dos campos informados, sem converter o registro
+
+        Registros ainda não acessados devolvem os valores como estão no JSON
+        (ex.: valores monetários em texto).
+        """
+        item = self._itens[indice]
+        padroes = padroes or {}
+        return tuple(self._campo(item, nome, padroes.get(nome, "")) for nome in nomes)
+
+    def para_dicionarios(self, normalizar: Callable[[Dict[str, Any]], bool] = None) -> List[Dict[str, Any]]:
+        """Registros em dicionários para o snapshot JSON
+
+        Registros não acessados são gravados como lidos, exceto os que
+        normalizar(dicionario) indicar (ex.: formato antigo), que são
+        convertidos para o formato atual.
+        """
+        resultado = []
+        for item in self._itens:
+            if isinstance(item, (dict, tuple)):
+                item = self._dicionario(item)
+                resultado.append(asdict(self._converter(item)) if normalizar and normalizar(item) else item)
+            else:
+                resultado.append(asdict(item))
+        return resultado
+
+    def __repr__(self) -> str:
+        return f"<ListaSobDemanda: {len(self)} registros, {self.hidratados()} convertidos>"
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sistema CM - Relatórios em Lote
+Geração de relatórios de vendas sem interface gráfica, para execução
+noturna ou no fechamento do mês: uma loja por processo de trabalho, com
+saídas em PNG, XLSX e CSV e um resumo dos tempos de execução
+
+Uso:
+    python relatorios_lote.py 2026-10 [2026-09 ...] [--lojas L1 L2]
+        [--agrupamentos diario mensal] [--formatos png xlsx csv]
+        [--destino relatorios_lote] [--processos N] [--sqlite]
+"""
+
+import os
+import sys
+import csv
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from matplotlib.figure import Figure
+
+# Garantir que os módulos no mesmo diretório possam ser importados
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agregacao_relatorios import AGRUPAMENTOS, agrupar_periodos, interpretar_periodo, quadro_resumo
+from estatisticas_relatorios import EstatisticasRelatorio
+from exportacao_relatorios import exportar_csv, exportar_xlsx, planilha_resumo
+from graficos_relatorios import desenhar_grafico
+
+FORMATOS = ("png", "xlsx", "csv")
+CAMPOS_TEMPOS = ("loja", "inicio", "fim", "agrupamento", "linhas", "periodos",
+                 "agregacao_s", "saidas_s", "arquivos")
+
+
+def _gravar_saidas(base: Path, titulo: str, informacoes: Dict[str, str], dados_agrupados,
+                   formatos: Sequence[str]) -> List[str]:
+    """Grava as saídas de um relatório (mesmo nome-base, uma extensão por formato)"""
+    arquivos = []
+    if "png" in formatos:
+        fig = Figure(figsize=(10, 6))
+        ax = fig.add_subplot()
+        if dados_agrupados:
+            desenhar_grafico(ax, dados_agrupados, "barras", titulo)
+        else:
+            ax.set_title(titulo)
+            ax.text(0.5, 0.5, "Sem dados no período", ha="center", transform=ax.transAxes)
+        fig.tight_layout()
+        fig.savefig(base.with_suffix(".png"), dpi=100)
+        arquivos.append(str(base.with_suffix(".png")))
+    if "xlsx" in formatos:
+        exportar_xlsx(str(base.with_suffix(".xlsx")), informacoes, [planilha_resumo(dados_agrupados)])
+        arquivos.append(str(base.with_suffix(".xlsx")))
+    if "csv" in formatos:
+        arquivos.extend(exportar_csv(str(base.with_suffix(".csv")), [planilha_resumo(dados_agrupados)]))
+    return arquivos
+
+
+def processar_loja(loja: str, quadros: List[tuple], agrupamentos: Sequence[str],
+                   formatos: Sequence[str], destino: str) -> Tuple[List[Dict], Dict[tuple, EstatisticasRelatorio]]:
+    """Gera os relatórios de uma loja (executado em um processo de trabalho)
+
+    Args:
+        loja: Código da loja
+        quadros: Pares ((início, fim), quadro do resumo diário da loja no período)
+        agrupamentos: Agrupamentos gerados para cada período
+        formatos: Saídas a gravar ("png", "xlsx", "csv")
+        destino: Pasta de destino
+
+    Returns:
+        Tempos de execução (um registro por período e agrupamento) e as
+        estatísticas da loja por período, no primeiro agrupamento
+    """
+    pasta = Path(destino) / f"loja_{loja}"
+    pasta.mkdir(parents=True, exist_ok=True)
+    gerado_em = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+
+    tempos = []
+    estatisticas_periodos = {}
+    for (inicio, fim), quadro in quadros:
+        for agrupamento in agrupamentos:
+            inicio_execucao = time.perf_counter()
+            estatisticas = EstatisticasRelatorio()
+            dados_agrupados = agrupar_periodos(quadro, agrupamento, estatisticas)
+            estatisticas_periodos.setdefault((inicio, fim), estatisticas)
+            agregado_em = time.perf_counter()
+
+            informacoes = {
+                "Tipo de Relatório": "Relatório de Vendas",
+                "Loja": loja,
+                "Período": f"{inicio.strftime('%d/%m/%Y')} a {fim.strftime('%d/%m/%Y')}",
+                "Agrupamento": agrupamento.capitalize(),
+                "Data de Geração": gerado_em,
+            }
+            base = pasta / f"vendas_{inicio.isoformat()}_{fim.isoformat()}_{agrupamento}"
+            arquivos = _gravar_saidas(base, f"Vendas - Loja {loja} - {agrupamento.capitalize()}",
+                                      informacoes, dados_agrupados, formatos)
+
+            fim_execucao = time.perf_counter()
+            tempos.append({
+                "loja": loja,
+                "inicio": inicio.isoformat(),
+                "fim": fim.isoformat(),
+                "agrupamento": agrupamento,
+                "linhas": len(quadro),
+                "periodos": len(dados_agrupados),
+                "agregacao_s": round(agregado_em - inicio_execucao, 4),
+                "saidas_s": round(fim_execucao - agregado_em, 4),
+                "arquivos": len(arquivos),
+            })
+    return tempos, estatisticas_periodos
+
+
+def executar_lote(resumo_vendas, periodos: Sequence[tuple], agrupamentos: Sequence[str] = ("diario",),
+                  formatos: Sequence[str] = FORMATOS, destino: str = "relatorios_lote",
+                  lojas: Optional[Sequence[str]] = None,
+                  processos: Optional[int] = None) -> Tuple[List[Dict], Dict[tuple, EstatisticasRelatorio]]:
+    """Gera os relatórios de todas as lojas, uma loja por processo de trabalho
+
+    O resumo diário de vendas é consultado uma única vez por período; cada
+    processo recebe apenas as linhas da sua loja e devolve as estatísticas
+    dela, mescladas aqui no consolidado de cada período.
+
+    Returns:
+        Tempos de execução de todos os relatórios e estatísticas consolidadas por período
+    """
+    quadros_por_loja: Dict[str, List[tuple]] = {}
+    for inicio, fim in periodos:
+        quadro = quadro_resumo(resumo_vendas.linhas(inicio, fim))
+        lojas_periodo = lojas if lojas is not None else [str(loja) for loja in quadro["loja"].dropna().unique()]
+        for loja in lojas_periodo:
+            quadro_loja = quadro[quadro["loja"] == loja]
+            quadros_por_loja.setdefault(loja, []).append(((inicio, fim), quadro_loja))
+
+    lojas_ordenadas = sorted(quadros_por_loja)
+    argumentos = [(loja, quadros_por_loja[loja], agrupamentos, formatos, destino) for loja in lojas_ordenadas]
+
+    if processos == 1 or len(argumentos) <= 1:
+        resultados = [processar_loja(*args) for args in argumentos]
+    else:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            resultados = list(executor.map(processar_loja, *zip(*argumentos)))
+
+    consolidado: Dict[tuple, EstatisticasRelatorio] = {}
+    for _, estatisticas_periodos in resultados:
+        for periodo, estatisticas in estatisticas_periodos.items():
+            consolidado.setdefault(periodo, EstatisticasRelatorio()).mesclar(estatisticas)
+
+    return [tempo for tempos, _ in resultados for tempo in tempos], consolidado
+
+
+def _gravar_tempos(caminho: Path, tempos: List[Dict]):
+    """Grava o resumo de tempos em CSV"""
+    with open(caminho, "w", newline="", encoding="utf-8-sig") as f:
+        escritor = csv.DictWriter(f, fieldnames=CAMPOS_TEMPOS)
+        escritor.writeheader()
+        escritor.writerows(tempos)
+
+
+def main():
+    from sistema_interface import GerenciadorDados
+
+    parser = argparse.ArgumentParser(description="Relatórios de vendas em lote, sem interface gráfica")
+    parser.add_argument("periodos", nargs="+", help="AAAA-MM ou AAAA-MM-DD:AAAA-MM-DD")
+    parser.add_argument("--lojas", nargs="+", help="Códigos de loja (padrão: todas com vendas no período)")
+    parser.add_argument("--agrupamentos", nargs="+", choices=AGRUPAMENTOS, default=["diario"])
+    parser.add_argument("--formatos", nargs="+", choices=FORMATOS, default=list(FORMATOS))
+    parser.add_argument("--destino", default="relatorios_lote")
+    parser.add_argument("--processos", type=int, default=None, help="Processos de trabalho (padrão: núcleos)")
+    parser.add_argument("--sqlite", action="store_true", help="Lê os dados do backend SQLite")
+    args = parser.parse_args()
+
+    try:
+        periodos = [interpretar_periodo(periodo) for periodo in args.periodos]
+    except ValueError as e:
+        parser.error(f"Período inválido: {e}")
+
+    print("=== RELATÓRIOS DE VENDAS EM LOTE ===")
+    inicio_execucao = time.perf_counter()
+    gerenciador = GerenciadorDados(backend="sqlite" if args.sqlite else "json")
+    carregado_em = time.perf_counter()
+
+    tempos, consolidado = executar_lote(gerenciador.resumo_vendas, periodos, args.agrupamentos, args.formatos,
+                           args.destino, args.lojas, args.processos)
+    fim_execucao = time.perf_counter()
+
+    Path(args.destino).mkdir(parents=True, exist_ok=True)
+    _gravar_tempos(Path(args.destino) / "tempos_execucao.csv", tempos)
+
+    lojas = sorted({tempo["loja"] for tempo in tempos})
+    print(f"Lojas: {len(lojas)} | Relatórios: {len(tempos)} | "
+          f"Arquivos: {sum(tempo['arquivos'] for tempo in tempos)}")
+    for loja in lojas:
+        da_loja = [tempo for tempo in tempos if tempo["loja"] == loja]
+        print(f"  Loja {loja}: {len(da_loja)} relatórios, "
+              f"agregação {sum(t['agregacao_s'] for t in da_loja):.2f}s, "
+              f"saídas {sum(t['saidas_s'] for t in da_loja):.2f}s")
+    for (inicio, fim), estatisticas in sorted(consolidado.items()):
+        print(f"  {inicio.strftime('%d/%m/%Y')} a {fim.strftime('%d/%m/%Y')}: "
+              f"{estatisticas.registros} vendas, R$ {estatisticas.soma:.2f}, "
+              f"ticket médio R$ {estatisticas.ticket_medio:.2f}, "
+              f"mediana R$ {estatisticas.percentil_ticket(50) or 0:.2f}, "
+              f"p90 R$ {estatisticas.percentil_ticket(90) or 0:.2f}")
+    print(f"Carga dos dados: {carregado_em - inicio_execucao:.1f}s")
+    print(f"Geração: {fim_execucao - carregado_em:.1f}s")
+    print(f"Resumo de tempos gravado em {Path(args.destino) / 'tempos_execucao.csv'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sistema CM - Resumo Diário de Vendas
+Agregado mantido por dia, loja e produto (registros, quantidade, total e
+histograma dos tickets), atualizado a cada venda, para que os relatórios
+não precisem reprocessar todo o histórico de vendas
+"""
+
+import sys
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+from estatisticas_relatorios import ERRO_RELATIVO_TICKET, EsbocoQuantis
+
+# Versão do formato gravado (2: linhas com o histograma dos tickets)
+VERSAO_FORMATO = 2
+
+
+class ResumoVendasDiario:
+    """Resumo de vendas por (dia, loja, produto)
+
+    Cada linha guarda [registros, quantidade, total, tickets], onde tickets
+    conta as vendas por bucket do EsbocoQuantis (ERRO_RELATIVO_TICKET): os
+    percentis do ticket saem das vendas individuais, não das médias das
+    linhas. Os dias ficam em uma lista ordenada para consultas por período.
+    """
+
+    # Apenas para calcular o bucket do ticket de cada venda
+    _esboco = EsbocoQuantis(ERRO_RELATIVO_TICKET)
+
+    def __init__(self):
+        self.dias: List[date] = []
+        self.linhas_por_dia: Dict[date, Dict[tuple, list]] = {}
+        # Quantidade de vendas do histórico já incorporadas
+        self.vendas_incorporadas = 0
+
+    def __len__(self):
+        return sum(len(linhas) for linhas in self.linhas_por_dia.values())
+
+    def _somar(self, dia: date, loja, produto, registros: int, quantidade: int, total: Decimal,
+               tickets: Dict[Optional[int], int]):
+        """Soma valores (e o histograma dos tickets) na linha (dia, loja, produto)"""
+        linhas = self.linhas_por_dia.get(dia)
+        if linhas is None:
+            linhas = self.linhas_por_dia[dia] = {}
+            self.dias.insert(bisect_left(self.dias, dia), dia)
+
+        linha = linhas.get((loja, produto))
+        if linha is None:
+            linhas[(loja, produto)] = [registros, quantidade, total, dict(tickets)]
+        else:
+            linha[0] += registros
+            linha[1] += quantidade
+            linha[2] += total
+            for indice, vendas in tickets.items():
+                linha[3][indice] = linha[3].get(indice, 0) + vendas
+
+    def registrar(self, venda) -> bool:
+        """Incorpora uma venda ao resumo
+
+        Returns:
+            bool: False se o timestamp da venda for inválido
+        """
+        self.vendas_incorporadas += 1
+        try:
+            # Timestamp no formato "%Y-%m-%d %H:%M:%S": basta a parte da data
+            dia = date.fromisoformat(venda.timestamp[:10])
+        except (ValueError, TypeError, AttributeError) as e:
+            logging.warning(f"Venda ignorada no resumo diário: {e}")
+            return False
+
+        total = Decimal(venda.total)
+        self._somar(dia, venda.codigo_loja, venda.produto, 1, venda.quantidade or 0, total,
+                    {self._esboco.indice(float(total)): 1})
+        return True
+
+    def incorporar(self, vendas: Iterable):
+        """Incorpora uma sequência de vendas"""
+        for venda in vendas:
+            self.registrar(venda)
+
+    @classmethod
+    def reconstruir(cls, vendas) -> "ResumoVendasDiario":
+        """Gera o resumo a partir do histórico completo"""
+        resumo = cls()
+        resumo.incorporar(vendas)
+        return resumo
+
+    @classmethod
+    def de_linhas(cls, linhas: Iterable, vendas_incorporadas: int) -> "ResumoVendasDiario":
+        """Monta o resumo a partir de linhas (dia, loja, produto, registros, quantidade, total, tickets)
+
+        tickets são pares [bucket, vendas]; linhas repetidas são somadas.
+        """
+        resumo = cls()
+        for dia, loja, produto, registros, quantidade, total, tickets in linhas:
+            if isinstance(dia, str):
+                dia = date.fromisoformat(dia)
+            resumo._somar(dia, loja, produto, registros, quantidade, Decimal(total),
+                          {indice: vendas for indice, vendas in tickets})
+        resumo.vendas_incorporadas = vendas_incorporadas
+        return resumo
+
+    def para_json(self) -> Dict[str, Any]:
+        """Representação gravada no arquivo de dados"""
+        return {
+            "versao": VERSAO_FORMATO,
+            "vendas": self.vendas_incorporadas,
+            "linhas": [
+                [dia.isoformat(), loja, produto, registros, quantidade, str(total), list(tickets.items())]
+                for dia in self.dias
+                for (loja, produto), (registros, quantidade, total, tickets) in self.linhas_por_dia[dia].items()
+            ]
+        }
+
+    @classmethod
+    def de_json(cls, conteudo: Optional[Dict[str, Any]], vendas) -> "ResumoVendasDiario":
+        """Restaura o resumo gravado, completando ou refazendo conforme o histórico
+
+        O histórico de vendas só recebe inclusões no final; vendas posteriores
+        ao resumo gravado (ex.: reaplicadas do journal) são incorporadas.
+        Resumos em formato anterior (sem os tickets) são refeitos.
+        """
+        try:
+            if (conteudo and conteudo.get("versao") == VERSAO_FORMATO
+                    and conteudo.get("vendas", 0) <= len(vendas)):
+                resumo = cls.de_linhas(conteudo.get("linhas", []), conteudo["vendas"])
+                if resumo.vendas_incorporadas < len(vendas):
+                    resumo.incorporar(vendas[resumo.vendas_incorporadas:])
+                return resumo
+        except (KeyError, TypeError, ValueError) as e:
+            logging.warning(f"Resumo diário de vendas inválido, reconstruindo: {e}")
+        return cls.reconstruir(vendas)
+
+    def linhas(self, inicio: date, fim: date) -> List[Dict[str, Any]]:
+        """Linhas do resumo no período (inclusive), em ordem de data"""
+        resultado = []
+        # Cópias (fatia e list) feitas de uma vez: a leitura pode ocorrer em outra
+        # thread enquanto a interface registra vendas
+        for dia in self.dias[bisect_left(self.dias, inicio):bisect_right(self.dias, fim)]:
+            for (loja, produto), (registros, quantidade, total, tickets) in list(self.linhas_por_dia[dia].items()):
+                resultado.append({
+                    'dia': dia,
+                    'loja': loja,
+                    'produto': produto,
+                    'registros': registros,
+                    'quantidade': quantidade,
+                    'total': total,
+                    'tickets': dict(tickets)
+                })
+        return resultado
+
+
+def main():
+    """Reconstrói o resumo diário a partir do histórico de vendas"""
+    from sistema_interface import GerenciadorDados
+
+    backend = "sqlite" if "--sqlite" in sys.argv else "json"
+    gerenciador = GerenciadorDados(backend=backend)
+
+    print("=== RECONSTRUÇÃO DO RESUMO DIÁRIO DE VENDAS ===")
+    gerenciador.reconstruir_resumo_vendas()
+    gerenciador.salvar_dados()
+
+    resumo = gerenciador.resumo_vendas
+    print(f"Vendas processadas: {resumo.vendas_incorporadas}")
+    print(f"Linhas do resumo: {len(resumo)} em {len(resumo.dias)} dias")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,7 +12,6 @@ import hashlib
 import logging
 import sys
 import os
-from datetime import datetime
 from pathlib import Path
 from dataclasses import dataclass, asdict
 from typing import List, Optional, Dict, Any
@@ -20,6 +19,19 @@ import csv
 import re
 from decimal import Decimal, InvalidOperation
 import uuid
+import threading
+from contextlib import contextmanager, nullcontext
+
+from journal_dados import JournalDados, LacunaJournal
+from indice_busca_clientes import CAMPOS_BUSCA, IndiceBuscaClientes, ValoresBusca
+from resumo_vendas import ResumoVendasDiario
+from eventos_clientes import importar_cadastros, registrar_cadastro
+from conexoes_db import obter_gerenciador
+from log_auditoria import LogAuditoria
+from registros_sob_demanda import ListaSobDemanda, campos_modelo
+from snapshot_binario import (SnapshotInvalido, caminho_snapshot, gravar_snapshot, identidade_arquivo,
+                              ler_gerais, ler_snapshot, linhas_validas)
+from trava_arquivo import TravaArquivo
 
 # Garantir que os módulos no mesmo diretório possam ser importados
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -38,8 +50,20 @@ logging.basicConfig(
 TELEFONE_REGEX_10 = re.compile(r"^\(\d{2}\) \d{4}-\d{4}$")  # (11) 1234-5678
 TELEFONE_REGEX_11 = re.compile(r"^\(\d{2}\) \d{5}-\d{4}$")  # (11) 12345-6789
 DATA_NASC_REGEX = re.compile(r"^\d{2}/\d{2}/\d{4}$")  # dd/mm/aaaa
+# Geração e sequência do journal, gravadas no início do arquivo de dados
+CABECALHO_DADOS_REGEX = re.compile(rb'"(geracao|journal_seq)":\s*(\d+)')
 
-@dataclass
+
+def internar_campos(registro, campos):
+    """Substitui textos repetidos entre registros (loja, estado, produto...) pela cópia única (sys.intern)"""
+    for campo in campos:
+        valor = getattr(registro, campo)
+        if type(valor) is str:
+            setattr(registro, campo, sys.intern(valor))
+
+# Modelos com __slots__ (dataclass slots=True): sem __dict__ por instância
+
+@dataclass(slots=True)
 class CadastroCliente:
     """Classe para representar um cliente com campos expandidos"""
     # Dados pessoais básicos
@@ -82,7 +106,11 @@ class CadastroCliente:
     loja_cadastro: str = ""
     id: str = ""
     
+    # Campos com poucos valores distintos, compartilhados entre os cadastros
+    CAMPOS_INTERNADOS = ("loja_cadastro", "estado", "cidade", "estado_civil", "profissao")
+    
     def __post_init__(self):
+        internar_campos(self, self.CAMPOS_INTERNADOS)
         if self.telefones_adicionais is None:
             self.telefones_adicionais = []
         if self.referencias is None:
@@ -102,7 +130,12 @@ class CadastroCliente:
         
         # Calcular limite de crédito automaticamente (30% da renda)
         if self.renda_mensal > 0 and self.limite_credito == 0:
-            self.limite_credito = self.renda_mensal * Decimal('0.30')
+            self.limite_credito = self.limite_padrao(self.renda_mensal)
+    
+    @staticmethod
+    def limite_padrao(renda_mensal: Decimal) -> Decimal:
+        """Limite de crédito calculado quando não informado (30% da renda)"""
+        return renda_mensal * Decimal('0.30')
 
 @dataclass
 class Usuario:
@@ -111,7 +144,7 @@ class Usuario:
     password_hash: str
     is_admin: bool = False
 
-@dataclass
+@dataclass(slots=True)
 class Venda:
     """Classe para representar uma venda"""
     produto: str
@@ -120,7 +153,10 @@ class Venda:
     timestamp: str
     codigo_loja: str = None
 
+    CAMPOS_INTERNADOS = ("produto", "codigo_loja")
+
     def __post_init__(self):
+        internar_campos(self, self.CAMPOS_INTERNADOS)
         if not isinstance(self.total, Decimal):
             try:
                 self.total = Decimal(str(self.total)) if self.total else Decimal('0')
@@ -128,7 +164,7 @@ class Venda:
                 logging.warning(f"Valor inválido para total: {self.total}, usando 0")
                 self.total = Decimal('0')
 
-@dataclass
+@dataclass(slots=True)
 class Pagamento:
     """Classe para representar um pagamento"""
     descricao: str
@@ -136,7 +172,10 @@ class Pagamento:
     tipo: str
     timestamp: str
 
+    CAMPOS_INTERNADOS = ("tipo",)
+
     def __post_init__(self):
+        internar_campos(self, self.CAMPOS_INTERNADOS)
         if not isinstance(self.valor, Decimal):
             try:
                 self.valor = Decimal(str(self.valor)) if self.valor else Decimal('0')
@@ -200,7 +239,7 @@ class SistemaAutenticacao:
         import json, tempfile, os
         dir_path = os.path.dirname(caminho) or "."
         with tempfile.NamedTemporaryFile("w", dir=dir_path, delete=False, encoding="utf-8") as tmp:
-            json.dump(conteudo, tmp, ensure_ascii=False, indent=4)
+            json.dump(conteudo, tmp, ensure_ascii=False, indent=4, default=str)
             temp_name = tmp.name
         os.replace(temp_name, caminho)
     
@@ -260,14 +299,220 @@ class SistemaAutenticacao:
 class GerenciadorDados:
     """Gerenciador de dados do sistema"""
     
-    def __init__(self, arquivo_dados: str = "dados_sistema.json"):
+    def __init__(self, arquivo_dados: str = "dados_sistema.json", usar_journal: bool = True,
+                 backend: str = "json", snapshot_binario: bool = True, conexoes_sistema=None):
+        """
+        Inicializa o gerenciador de dados
+        
+        Args:
+            arquivo_dados: Arquivo JSON de dados
+            usar_journal: Grava alterações em journal append-only (backend "json")
+            backend: "json" (arquivo + journal) ou "sqlite" (tabelas normalizadas)
+            snapshot_binario: Mantém e lê a cópia binária do JSON (inicialização rápida)
+            conexoes_sistema: GerenciadorConexoes do sistema.db que recebe os eventos de
+                cadastro do relatório de clientes (None: não registra eventos)
+        """
         self.arquivo_dados = arquivo_dados
+        self.backend = backend
+        self.snapshot_binario = snapshot_binario
+        self.armazenamento = None
+        self.journal = None
+        # Trava entre processos (várias instâncias sobre o mesmo arquivo)
+        self.trava = None
+        # Geração do arquivo de dados: incrementada a cada gravação completa
+        self.geracao = 0
+        # (tamanho, mtime) do arquivo de dados na última leitura/gravação
+        self._identidade_dados = None
+        # Índice de busca de clientes, criado na primeira busca
+        self.indice_busca = None
+        # Resumo diário gravado no snapshot JSON (consumido na carga)
+        self._resumo_vendas_salvo = None
+        # Versão dos dados: incrementada a cada alteração (validade de caches)
+        self.versao_dados = 0
+        # Usuário logado, registrado nas entradas de auditoria
+        self.usuario_atual: Optional[str] = None
+        # Log de auditoria fora do arquivo de dados (segmentos append-only)
+        self.auditoria = LogAuditoria(str(Path(arquivo_dados).with_suffix(".auditoria")))
+        self.conexoes_sistema = conexoes_sistema
+        
+        if backend == "sqlite":
+            self.dados = self._carregar_dados_sqlite()
+            self._migrar_auditoria()
+            self.resumo_vendas = self._carregar_resumo_vendas()
+            self._importar_eventos_cadastro()
+            return
+        
+        # Journal append-only: cada alteração grava apenas o registro alterado
+        self.trava = TravaArquivo(f"{arquivo_dados}.lock")
+        self.journal = JournalDados(arquivo_dados, trava=self.trava) if usar_journal else None
+        with self.trava:
+            self._carregar()
+        
+        if self.journal and self.journal.precisa_compactar():
+            self.compactar_journal()
+        self._importar_eventos_cadastro()
+    
+    def _carregar(self):
+        """Carga completa do arquivo de dados e do journal (com a trava obtida)"""
+        if self.journal:
+            self.journal.seq = 0
+            self.journal.registros_pendentes = 0
         self.dados = self._carregar_dados()
+        self.geracao = self.dados.pop('geracao', 0)
+        self._identidade_dados = identidade_arquivo(self.arquivo_dados) if os.path.exists(self.arquivo_dados) else None
+        self._migrar_auditoria()
+        self.resumo_vendas = self._carregar_resumo_vendas()
+        self.indice_busca = None
+        self.versao_dados += 1
+    
+    def _cabecalho_dados(self):
+        """(geracao, journal_seq) do início do arquivo de dados, ou None se ausentes"""
+        try:
+            with open(self.arquivo_dados, 'rb') as f:
+                inicio = f.read(256)
+        except OSError:
+            return None
+        valores = {chave.decode(): int(valor) for chave, valor in CABECALHO_DADOS_REGEX.findall(inicio)}
+        if 'geracao' not in valores:
+            return None
+        return valores['geracao'], valores.get('journal_seq', 0)
+    
+    def sincronizar(self) -> bool:
+        """Incorpora alterações gravadas por outras instâncias no mesmo arquivo
+        
+        Registros novos do journal são aplicados um a um; o arquivo de dados
+        só é relido se outra instância gravou um snapshot completo (geração
+        diferente) ou descartou registros ainda não lidos.
+        
+        Returns:
+            True se houve alterações
+        """
+        if self.trava is None:
+            return False
+        
+        with self.trava:
+            versao = self.versao_dados
+            try:
+                for registro in (self.journal.novos_registros() if self.journal else []):
+                    self._aplicar_registro_externo(registro)
+            except LacunaJournal as e:
+                logging.info(f"Recarregando dados: {e}")
+                self._carregar()
+                return True
+            
+            identidade = identidade_arquivo(self.arquivo_dados) if os.path.exists(self.arquivo_dados) else None
+            if identidade != self._identidade_dados:
+                cabecalho = self._cabecalho_dados()
+                seq_atual = self.journal.seq if self.journal else 0
+                if cabecalho is None or cabecalho[1] > seq_atual or (not self.journal and cabecalho[0] != self.geracao):
+                    logging.info("Recarregando dados gravados por outra instância")
+                    self._carregar()
+                    return True
+                if cabecalho[0] != self.geracao:
+                    self._recarregar_gerais(identidade)
+                    self.geracao = cabecalho[0]
+                    self.versao_dados += 1
+                self._identidade_dados = identidade
+            return self.versao_dados != versao
+    
+    def _recarregar_gerais(self, identidade):
+        """Relê as chaves que não são coleções de registros (saldos, lojas, metas...)"""
+        gerais = None
+        if self.snapshot_binario:
+            try:
+                gerais = ler_gerais(caminho_snapshot(self.arquivo_dados), identidade)
+            except SnapshotInvalido:
+                pass
+        if gerais is None:
+            with open(self.arquivo_dados, 'r', encoding='utf-8') as f:
+                gerais = json.load(f)
+        colecoes = ('cadastros', 'historico_vendas', 'pagamentos')
+        for chave in colecoes + ('geracao', 'journal_seq', 'resumo_vendas_diario', 'auditoria'):
+            gerais.pop(chave, None)
+        for chave in [chave for chave in self.dados if chave not in colecoes and chave not in gerais]:
+            del self.dados[chave]
+        self.dados.update(gerais)
+    
+    def _aplicar_registro_externo(self, registro: Dict[str, Any]):
+        """Aplica aos objetos em memória (e ao resumo e ao índice) um registro do journal de outra instância"""
+        operacao = registro.get("op")
+        cadastros = self.dados.setdefault('cadastros', [])
+        self.versao_dados += 1
+        
+        if operacao == "adicionar_cliente":
+            cliente = self._cliente_de_dicionario(registro["cliente"])
+            cadastros.append(cliente)
+            if self.indice_busca is not None:
+                self.indice_busca.adicionar(cliente)
+        elif operacao == "editar_cliente":
+            indice = registro["indice"]
+            if 0 <= indice < len(cadastros):
+                cliente = self._cliente_de_dicionario(registro["cliente"])
+                cadastros[indice] = cliente
+                if self.indice_busca is not None:
+                    self.indice_busca.editar(indice, cliente)
+        elif operacao == "remover_cliente":
+            indice = registro["indice"]
+            if 0 <= indice < len(cadastros):
+                cadastros.pop(indice)
+                if self.indice_busca is not None:
+                    self.indice_busca.remover(indice)
+        elif operacao == "registrar_venda":
+            venda = self._venda_de_dicionario(registro["venda"])
+            self.dados.setdefault('historico_vendas', []).append(venda)
+            self.resumo_vendas.registrar(venda)
+        elif operacao != "auditoria":
+            logging.warning(f"Operação desconhecida no journal: {operacao}")
+    
+    @contextmanager
+    def _exclusivo(self):
+        """Trava entre processos com as alterações das outras instâncias já incorporadas"""
+        if self.trava is None:
+            yield
+            return
+        with self.trava:
+            self.sincronizar()
+            yield
+    
+    def _posicao_cliente(self, indice: int, id_cliente: Optional[str]) -> int:
+        """Posição atual do cliente (a lista pode ter mudado na sincronização), ou -1"""
+        cadastros = self.dados['cadastros']
+        if 0 <= indice < len(cadastros) and (not id_cliente or self.valores_cliente(indice, ('id',))[0] == id_cliente):
+            return indice
+        if id_cliente:
+            for posicao in range(len(cadastros)):
+                if self.valores_cliente(posicao, ('id',))[0] == id_cliente:
+                    return posicao
+        return -1
+    
+    def _carregar_dados_sqlite(self) -> Dict[str, Any]:
+        """Carrega dados do banco SQLite, importando o arquivo JSON na primeira execução"""
+        from armazenamento_sqlite import ArmazenamentoSQLite
+        
+        caminho_db = str(Path(self.arquivo_dados).with_suffix(".db"))
+        self.armazenamento = ArmazenamentoSQLite(caminho_db, CadastroCliente, Venda, Pagamento)
+        
+        pendente = self.armazenamento.importacao_pendente()
+        if pendente:
+            # Sem importar o JSON por cima dos registros já gravados pela importação
+            logging.warning(f"Importação de {pendente} incompleta: execute importar_json.py novamente para continuar")
+        elif self.armazenamento.vazio():
+            self.journal = JournalDados(self.arquivo_dados)
+            dados_json = self._carregar_dados()
+            dados_json.pop('geracao', None)
+            self.journal = None
+            self.armazenamento.importar(dados_json)
+        
+        return self.armazenamento.carregar()
         
     def _carregar_dados(self) -> Dict[str, Any]:
-        """Carrega dados do arquivo JSON"""
+        """Carrega dados do arquivo JSON (ou do snapshot binário correspondente)"""
         try:
             if Path(self.arquivo_dados).exists():
+                data = self._carregar_snapshot_binario()
+                if data is not None:
+                    return data
+                
                 try:
                     with open(self.arquivo_dados, 'r', encoding='utf-8') as f:
                         data = json.load(f)
@@ -282,90 +527,263 @@ class GerenciadorDados:
                             if campo not in data:
                                 data[campo] = [] if campo != 'versao' else 1
                         
-                        # Converter listas de dicionários para objetos
-                        if 'cadastros' in data:
-                            clientes_convertidos = []
-                            for cliente in data['cadastros']:
-                                try:
-                                    # Verificar se é formato antigo (com 'idade') ou novo
-                                    if isinstance(cliente, dict):  # Garantir que é um dicionário
-                                        if 'idade' in cliente:
-                                            # Formato antigo - converter para novo
-                                            cliente_novo = CadastroCliente(
-                                                nome=cliente.get('nome', ''),
-                                                data_nascimento=cliente.get('data_nascimento', ''),
-                                                cpf=cliente.get('cpf', ''),
-                                                identidade=cliente.get('identidade', ''),
-                                                email=cliente.get('email', ''),
-                                                estado_civil=cliente.get('estado_civil', ''),
-                                                profissao=cliente.get('profissao', ''),
-                                                endereco=cliente.get('endereco', ''),
-                                                telefone_residencial=cliente.get('telefone_residencial', ''),
-                                                telefone_celular=cliente.get('telefone_celular', ''),
-                                                telefone_comercial=cliente.get('telefone_comercial', ''),
-                                                telefones_adicionais=cliente.get('telefones_adicionais', []),
-                                                onde_trabalha=cliente.get('onde_trabalha', ''),
-                                                telefone_trabalho=cliente.get('telefone_trabalho', ''),
-                                                renda_mensal=self._converter_para_decimal(cliente.get('renda_mensal', 0)),
-                                                limite_credito=self._converter_para_decimal(cliente.get('limite_credito', 0)),
-                                                referencias=cliente.get('referencias', []),
-                                                observacao=cliente.get('observacao', ''),
-                                                loja_cadastro=cliente.get('loja_cadastro', ''),
-                                                id=cliente.get('id', '')
-                                            )
-                                        else:
-                                            # Formato novo
-                                            # Garantir que valores decimais são tratados corretamente
-                                            if 'renda_mensal' in cliente and not isinstance(cliente['renda_mensal'], Decimal):
-                                                cliente['renda_mensal'] = self._converter_para_decimal(cliente['renda_mensal'])
-                                            if 'limite_credito' in cliente and not isinstance(cliente['limite_credito'], Decimal):
-                                                cliente['limite_credito'] = self._converter_para_decimal(cliente['limite_credito'])
-                                            cliente_novo = CadastroCliente(**cliente)
-                                        clientes_convertidos.append(cliente_novo)
-                                except Exception as e:
-                                    logging.warning(f"Erro ao converter cliente: {e}")
-                                    continue
-                            data['cadastros'] = clientes_convertidos
+                        # Snapshot binário ausente ou desatualizado: refazer a partir deste JSON
+                        self._regenerar_snapshot_binario(data)
                         
-                        # Tratamento para vendas
-                        if 'historico_vendas' in data:
-                            vendas_convertidas = []
-                            for venda in data['historico_vendas']:
-                                try:
-                                    if isinstance(venda, dict):
-                                        # Garantir que total é Decimal
-                                        if 'total' in venda and not isinstance(venda['total'], Decimal):
-                                            venda['total'] = self._converter_para_decimal(venda['total'])
-                                        vendas_convertidas.append(Venda(**venda))
-                                except Exception as e:
-                                    logging.error(f"Erro ao converter venda: {e}")
-                            data['historico_vendas'] = vendas_convertidas
+                        # Reaplicar alterações gravadas no journal após o snapshot
+                        seq_snapshot = data.pop('journal_seq', 0)
+                        if self.journal:
+                            self.journal.reaplicar(data, seq_snapshot)
                         
-                        # Tratamento para pagamentos
-                        if 'pagamentos' in data:
-                            pagamentos_convertidos = []
-                            for pag in data['pagamentos']:
-                                try:
-                                    if isinstance(pag, dict):
-                                        # Garantir que valor é Decimal
-                                        if 'valor' in pag and not isinstance(pag['valor'], Decimal):
-                                            pag['valor'] = self._converter_para_decimal(pag['valor'])
-                                        pagamentos_convertidos.append(Pagamento(**pag))
-                                except Exception as e:
-                                    logging.error(f"Erro ao converter pagamento: {e}")
-                            data['pagamentos'] = pagamentos_convertidos
+                        self._resumo_vendas_salvo = data.pop('resumo_vendas_diario', None)
                         
-                        return data
+                        return self._converter_registros(data)
                 except json.JSONDecodeError as e:
                     logging.error(f"Arquivo JSON corrompido: {e}")
                     return self._criar_dados_iniciais()
             else:
-                return self._criar_dados_iniciais()
+                data = self._criar_dados_iniciais()
+                # Primeira execução: alterações podem existir apenas no journal
+                if self.journal and self.journal.reaplicar(data):
+                    return self._converter_registros(data)
+                return data
         except Exception as e:
             logging.error(f"Erro ao carregar dados: {e}")
             return self._criar_dados_iniciais()
     
-    def _converter_para_decimal(self, valor):
+    def _carregar_snapshot_binario(self) -> Optional[Dict[str, Any]]:
+        """Dados do snapshot binário, se corresponde ao JSON atual (None caso contrário)"""
+        if not self.snapshot_binario:
+            return None
+        try:
+            data = ler_snapshot(caminho_snapshot(self.arquivo_dados), identidade_arquivo(self.arquivo_dados))
+        except SnapshotInvalido as e:
+            logging.info(f"Snapshot binário não utilizado: {e}")
+            return None
+        
+        conversores = {
+            'cadastros': (CadastroCliente, "cliente", self._cliente_de_dicionario),
+            'historico_vendas': (Venda, "venda", self._venda_de_dicionario),
+            'pagamentos': (Pagamento, "pagamento", self._pagamento_de_dicionario),
+        }
+        for colecao, (classe, descricao, converter) in conversores.items():
+            tabela = data.get(colecao)
+            if tabela is None:
+                continue
+            aceitos, obrigatorios = campos_modelo(classe)
+            validas = linhas_validas(tabela, aceitos, obrigatorios, 'idade' if colecao == 'cadastros' else None)
+            linhas = tabela.linhas
+            if not validas.all():
+                logging.warning(f"Erro ao converter {descricao}: {int((~validas).sum())} registros com campos inválidos")
+                linhas = [linha for linha, valida in zip(linhas, validas.tolist()) if valida]
+            data[colecao] = ListaSobDemanda(linhas, converter, tabela.colunas, tabela.centavos)
+        
+        # Reaplicar alterações gravadas no journal após o snapshot
+        seq_snapshot = data.pop('journal_seq', 0)
+        if self.journal:
+            self.journal.reaplicar(data, seq_snapshot)
+        
+        self._resumo_vendas_salvo = data.pop('resumo_vendas_diario', None)
+        for campo in ['versao', 'cadastros', 'lojas']:
+            if campo not in data:
+                data[campo] = [] if campo != 'versao' else 1
+        return data
+    
+    def _regenerar_snapshot_binario(self, data: Dict[str, Any]):
+        """Grava, em segundo plano, o snapshot binário do JSON recém-lido"""
+        if not self.snapshot_binario:
+            return
+        identidade = identidade_arquivo(self.arquivo_dados)
+        # Cópias rasas: o journal ainda será reaplicado sobre as listas originais
+        conteudo = {chave: list(valor) if isinstance(valor, list) else valor for chave, valor in data.items()}
+        
+        def gravar():
+            try:
+                gravar_snapshot(caminho_snapshot(self.arquivo_dados), conteudo, identidade)
+                logging.info("Snapshot binário regenerado")
+            except Exception as e:
+                logging.error(f"Erro ao gravar snapshot binário: {e}")
+        
+        threading.Thread(target=gravar, name="snapshot-binario", daemon=True).start()
+    
+    def _gravar_snapshots(self, caminho: str, conteudo: Dict[str, Any]):
+        """Grava o JSON (atômico) e, se habilitado, o snapshot binário correspondente"""
+        if 'auditoria' not in self.dados:
+            # Auditoria já transferida para o log (a compactação parte do arquivo em disco)
+            conteudo.pop('auditoria', None)
+        SistemaAutenticacao._gravar_json_atomico(caminho, conteudo)
+        if not self.snapshot_binario:
+            return
+        try:
+            gravar_snapshot(caminho_snapshot(caminho), conteudo, identidade_arquivo(caminho))
+        except Exception as e:
+            # O JSON já foi gravado; o snapshot antigo deixa de corresponder e é ignorado
+            logging.error(f"Erro ao gravar snapshot binário: {e}")
+    
+    def _converter_registros(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Prepara as coleções para conversão sob demanda em objetos do modelo
+        
+        Na carga apenas a estrutura de cada registro é conferida (campos
+        aceitos e obrigatórios); conversões para Decimal e do formato antigo
+        de cadastro ficam para o primeiro acesso ao registro.
+        """
+        if 'cadastros' in data:
+            data['cadastros'] = ListaSobDemanda(
+                self._registros_validos(data['cadastros'], CadastroCliente, "cliente", aceitar_legado=True),
+                self._cliente_de_dicionario)
+        
+        if 'historico_vendas' in data:
+            data['historico_vendas'] = ListaSobDemanda(
+                self._registros_validos(data['historico_vendas'], Venda, "venda"),
+                self._venda_de_dicionario)
+        
+        if 'pagamentos' in data:
+            data['pagamentos'] = ListaSobDemanda(
+                self._registros_validos(data['pagamentos'], Pagamento, "pagamento"),
+                self._pagamento_de_dicionario)
+        
+        return data
+    
+    @staticmethod
+    def _registros_validos(registros, classe, descricao: str, aceitar_legado: bool = False):
+        """Dicionários com os campos aceitos pela classe (os demais são descartados com log)"""
+        aceitos, obrigatorios = campos_modelo(classe)
+        for registro in registros:
+            if not isinstance(registro, dict):
+                continue
+            if aceitar_legado and 'idade' in registro:
+                yield registro
+                continue
+            chaves = registro.keys()
+            if chaves <= aceitos and chaves >= obrigatorios:
+                yield registro
+                continue
+            logging.warning(f"Erro ao converter {descricao}: campos inválidos "
+                            f"{sorted(chaves - aceitos)} / ausentes {sorted(obrigatorios - chaves)}")
+    
+    @classmethod
+    def _cliente_de_dicionario(cls, cliente: Dict[str, Any]) -> CadastroCliente:
+        """Converte o dicionário do arquivo em CadastroCliente"""
+        # Verificar se é formato antigo (com 'idade') ou novo
+        if 'idade' in cliente:
+            # Formato antigo - converter para novo
+            return CadastroCliente(
+                nome=cliente.get('nome', ''),
+                data_nascimento=cliente.get('data_nascimento', ''),
+                cpf=cliente.get('cpf', ''),
+                identidade=cliente.get('identidade', ''),
+                email=cliente.get('email', ''),
+                estado_civil=cliente.get('estado_civil', ''),
+                profissao=cliente.get('profissao', ''),
+                endereco=cliente.get('endereco', ''),
+                telefone_residencial=cliente.get('telefone_residencial', ''),
+                telefone_celular=cliente.get('telefone_celular', ''),
+                telefone_comercial=cliente.get('telefone_comercial', ''),
+                telefones_adicionais=cliente.get('telefones_adicionais', []),
+                onde_trabalha=cliente.get('onde_trabalha', ''),
+                telefone_trabalho=cliente.get('telefone_trabalho', ''),
+                renda_mensal=cls._converter_para_decimal(cliente.get('renda_mensal', 0)),
+                limite_credito=cls._converter_para_decimal(cliente.get('limite_credito', 0)),
+                referencias=cliente.get('referencias', []),
+                observacao=cliente.get('observacao', ''),
+                loja_cadastro=cliente.get('loja_cadastro', ''),
+                id=cliente.get('id', '')
+            )
+        
+        # Formato novo (cópia: o dicionário original pode voltar ao arquivo como lido)
+        cliente = dict(cliente)
+        for campo in ('renda_mensal', 'limite_credito'):
+            if campo in cliente:
+                cliente[campo] = cls._converter_para_decimal(cliente[campo])
+        return CadastroCliente(**cliente)
+    
+    @classmethod
+    def _venda_de_dicionario(cls, venda: Dict[str, Any]) -> Venda:
+        """Converte o dicionário do arquivo em Venda"""
+        if 'total' in venda:
+            venda = {**venda, 'total': cls._converter_para_decimal(venda['total'])}
+        return Venda(**venda)
+    
+    @classmethod
+    def _pagamento_de_dicionario(cls, pagamento: Dict[str, Any]) -> Pagamento:
+        """Converte o dicionário do arquivo em Pagamento"""
+        if 'valor' in pagamento:
+            pagamento = {**pagamento, 'valor': cls._converter_para_decimal(pagamento['valor'])}
+        return Pagamento(**pagamento)
+    
+    def valores_cliente(self, indice: int, campos: tuple) -> tuple:
+        """Campos de um cliente para exibição em listas, sem converter o cadastro inteiro
+        
+        renda_mensal e limite_credito voltam como Decimal, com o limite
+        calculado como no CadastroCliente quando não informado.
+        """
+        cadastros = self.dados['cadastros']
+        if not isinstance(cadastros, ListaSobDemanda):
+            cliente = cadastros[indice]
+            return tuple(getattr(cliente, campo) for campo in campos)
+        
+        valores = dict(zip(campos, cadastros.campos(indice, campos)))
+        if 'renda_mensal' in valores or 'limite_credito' in valores:
+            renda, limite = cadastros.campos(indice, ('renda_mensal', 'limite_credito'), {'renda_mensal': 0,
+                                                                                         'limite_credito': 0})
+            renda = self._converter_para_decimal(renda or 0)
+            limite = self._converter_para_decimal(limite or 0)
+            if renda > 0 and limite == 0:
+                limite = CadastroCliente.limite_padrao(renda)
+            valores.update(renda_mensal=renda, limite_credito=limite)
+        return tuple(valores[campo] for campo in campos)
+    
+    def _importar_eventos_cadastro(self):
+        """Importa uma única vez os cadastros existentes para os eventos de clientes do sistema.db"""
+        if self.conexoes_sistema is None:
+            return
+        
+        def cadastros():
+            # Data do cadastro pela auditoria: entrada do cliente ou, nas legadas, pelo nome
+            por_id, por_nome = {}, {}
+            for entrada in self.auditoria.consultar():
+                adicionado = re.search(r"Cliente adicionado: (.+)$", entrada.get("mensagem") or "")
+                if not adicionado or not entrada.get("timestamp"):
+                    continue
+                if entrada.get("entidade"):
+                    por_id[entrada["entidade"]] = entrada["timestamp"]
+                else:
+                    por_nome[adicionado.group(1)] = entrada["timestamp"]
+            
+            for indice in range(len(self.dados['cadastros'])):
+                id_cliente, nome, loja = self.valores_cliente(indice, ('id', 'nome', 'loja_cadastro'))
+                yield id_cliente, loja, por_id.get(id_cliente) or por_nome.get(nome)
+        
+        try:
+            importados = importar_cadastros(self.conexoes_sistema, str(Path(self.arquivo_dados).resolve()),
+                                            cadastros())
+            if importados is not None:
+                logging.info(f"{importados} cadastros importados para os eventos de clientes")
+        except Exception as e:
+            logging.error(f"Erro ao importar cadastros para os eventos de clientes: {e}")
+    
+    def _carregar_resumo_vendas(self) -> ResumoVendasDiario:
+        """Carrega o resumo diário de vendas (gravado ou recalculado)"""
+        vendas = self.dados.get('historico_vendas', [])
+        if self.armazenamento:
+            return ResumoVendasDiario.de_linhas(self.armazenamento.resumo_vendas_diario(), len(vendas))
+        
+        resumo = ResumoVendasDiario.de_json(self._resumo_vendas_salvo, vendas)
+        self._resumo_vendas_salvo = None
+        return resumo
+    
+    def reconstruir_resumo_vendas(self):
+        """Recalcula o resumo diário de vendas a partir do histórico completo"""
+        self._resumo_vendas_salvo = None
+        self.versao_dados += 1
+        if self.armazenamento:
+            self.resumo_vendas = self._carregar_resumo_vendas()
+        else:
+            self.resumo_vendas = ResumoVendasDiario.reconstruir(self.dados.get('historico_vendas', []))
+        logging.info(f"Resumo diário de vendas reconstruído: {len(self.resumo_vendas)} linhas")
+    
+    @staticmethod
+    def _converter_para_decimal(valor):
         """Converte valor para Decimal de forma segura"""
         if valor is None:
             return Decimal('0')
@@ -392,7 +810,6 @@ class GerenciadorDados:
             "historico_vendas": [],
             "pagamentos": [],
             "transferencias": [],
-            "auditoria": [],
             "grupos_usuarios": {},
             "metas_loja": {},
             "metas_recebimento": {},
@@ -401,59 +818,185 @@ class GerenciadorDados:
         }
     
     def salvar_dados(self):
-        """Salva dados no arquivo JSON"""
+        """Salva todos os dados no arquivo JSON (snapshot completo)"""
+        if self.armazenamento:
+            # Coleções já são gravadas linha a linha; restam os objetos editados
+            # diretamente (ex.: dados['cadastros'][i].nome = ...) e as demais chaves
+            try:
+                for colecao in ('cadastros', 'historico_vendas', 'pagamentos'):
+                    self.dados[colecao].gravar_alterados()
+                self.armazenamento.salvar_gerais(self.dados)
+                logging.info("Dados salvos com sucesso")
+            except Exception as e:
+                logging.error(f"Erro ao salvar dados: {e}")
+            return
+        
+        # Compactação em andamento grava um snapshot mais antigo
+        # (aguardada antes da trava, que a compactação também usa)
+        if self.journal:
+            self.journal.aguardar_compactacao()
+        
+        with self._exclusivo():
+            self._salvar_dados_json()
+    
+    def _salvar_dados_json(self):
         try:
             # Converter objetos para dicionários
+            # (registros nunca acessados são gravados como foram lidos)
             dados_para_salvar = self.dados.copy()
-            if 'cadastros' in dados_para_salvar:
-                dados_para_salvar['cadastros'] = [asdict(cliente) for cliente in dados_para_salvar['cadastros']]
-            if 'historico_vendas' in dados_para_salvar:
-                dados_para_salvar['historico_vendas'] = [asdict(venda) for venda in dados_para_salvar['historico_vendas']]
-            if 'pagamentos' in dados_para_salvar:
-                dados_para_salvar['pagamentos'] = [asdict(pag) for pag in dados_para_salvar['pagamentos']]
+            for colecao in ('cadastros', 'historico_vendas', 'pagamentos'):
+                registros = dados_para_salvar.get(colecao)
+                if isinstance(registros, ListaSobDemanda):
+                    dados_para_salvar[colecao] = registros.para_dicionarios(
+                        normalizar=(lambda cliente: 'idade' in cliente) if colecao == 'cadastros' else None)
+                elif registros is not None:
+                    dados_para_salvar[colecao] = [asdict(registro) for registro in registros]
+            
+            dados_para_salvar['resumo_vendas_diario'] = self.resumo_vendas.para_json()
+            # Geração e sequência no início do arquivo (lidas sem interpretar o JSON todo)
+            cabecalho = {'geracao': self.geracao + 1}
+            if self.journal:
+                cabecalho['journal_seq'] = self.journal.seq
+            dados_para_salvar = {**cabecalho, **dados_para_salvar}
             
             # Gravação atômica
-            SistemaAutenticacao._gravar_json_atomico(self.arquivo_dados, dados_para_salvar)
+            self._gravar_snapshots(self.arquivo_dados, dados_para_salvar)
+            self.geracao += 1
+            self._identidade_dados = identidade_arquivo(self.arquivo_dados)
+            
+            # Snapshot completo já contém todas as alterações do journal
+            if self.journal:
+                self.journal.descartar()
             logging.info("Dados salvos com sucesso")
         except Exception as e:
             logging.error(f"Erro ao salvar dados: {e}")
     
+    def _registrar_alteracao(self, operacao: str, **conteudo):
+        """Persiste uma alteração pontual (journal) ou, sem journal, o arquivo completo"""
+        self.versao_dados += 1
+        
+        if self.armazenamento:
+            # Backend SQLite: a lista persistente já gravou a linha alterada
+            return
+        
+        if not self.journal:
+            self.salvar_dados()
+            return
+        
+        try:
+            self.journal.registrar(operacao, **conteudo)
+        except Exception as e:
+            logging.error(f"Erro ao gravar journal: {e}")
+            self.salvar_dados()
+            return
+        
+        if self.journal.precisa_compactar():
+            self.compactar_journal()
+    
+    def compactar_journal(self, em_segundo_plano: bool = True):
+        """Incorpora o journal ao arquivo de dados principal"""
+        if self.journal:
+            self.journal.compactar(self._gravar_snapshots, em_segundo_plano)
+    
+    def registrar_venda(self, venda: Venda):
+        """Registra uma venda no histórico e no resumo diário"""
+        with self._exclusivo():
+            self.dados.setdefault('historico_vendas', []).append(venda)
+            self.resumo_vendas.registrar(venda)
+            self._registrar_alteracao("registrar_venda", venda=asdict(venda))
+    
+    def buscar_clientes(self, texto: str = "", loja: Optional[str] = None):
+        """Posições dos clientes cujo nome, CPF, telefone ou email começa com os termos buscados"""
+        if self.indice_busca is None:
+            cadastros = clientes = self.dados['cadastros']
+            if isinstance(cadastros, ListaSobDemanda):
+                # Valores brutos do JSON: a carga do índice não converte os cadastros
+                clientes = (ValoresBusca(*cadastros.campos(i, CAMPOS_BUSCA)) for i in range(len(cadastros)))
+            self.indice_busca = IndiceBuscaClientes(clientes)
+        return self.indice_busca.buscar(texto, loja)
+    
     def adicionar_cliente(self, cliente: CadastroCliente):
         """Adiciona um novo cliente"""
         if not cliente.id:
             cliente.id = self._gerar_id()
-        self.dados['cadastros'].append(cliente)
-        self._adicionar_auditoria(f"Cliente adicionado: {cliente.nome}")
-        self.salvar_dados()
+        with self._exclusivo():
+            self.dados['cadastros'].append(cliente)
+            if self.indice_busca is not None:
+                self.indice_busca.adicionar(cliente)
+            self._registrar_alteracao("adicionar_cliente", cliente=asdict(cliente))
+            self._adicionar_auditoria(f"Cliente adicionado: {cliente.nome}", entidade=cliente.id)
+        if self.conexoes_sistema is not None:
+            registrar_cadastro(self.conexoes_sistema, cliente)
     
     def editar_cliente(self, indice: int, cliente: CadastroCliente):
         """Edita um cliente existente"""
-        if 0 <= indice < len(self.dados['cadastros']):
+        with self._exclusivo():
+            indice = self._posicao_cliente(indice, cliente.id)
+            if indice < 0:
+                return
             cliente_antigo = self.dados['cadastros'][indice]
             self.dados['cadastros'][indice] = cliente
-            self._adicionar_auditoria(f"Cliente editado: {cliente.id} OLD=({cliente_antigo.nome}, '{cliente_antigo.email}', '{cliente_antigo.endereco}') NEW=({cliente.nome}, '{cliente.email}', '{cliente.endereco}')")
-            self.salvar_dados()
+            if self.indice_busca is not None:
+                self.indice_busca.editar(indice, cliente)
+            self._registrar_alteracao("editar_cliente", indice=indice, cliente=asdict(cliente))
+            self._adicionar_auditoria(f"Cliente editado: {cliente.id} OLD=({cliente_antigo.nome}, '{cliente_antigo.email}', '{cliente_antigo.endereco}') NEW=({cliente.nome}, '{cliente.email}', '{cliente.endereco}')", entidade=cliente.id)
     
     def remover_cliente(self, indice: int):
         """Remove um cliente"""
-        if 0 <= indice < len(self.dados['cadastros']):
+        if not 0 <= indice < len(self.dados['cadastros']):
+            return
+        # Identificado pelo id: a posição pode mudar ao incorporar alterações de outras instâncias
+        id_cliente = self.valores_cliente(indice, ('id',))[0]
+        with self._exclusivo():
+            indice = self._posicao_cliente(indice, id_cliente)
+            if indice < 0:
+                return
             cliente = self.dados['cadastros'].pop(indice)
-            self._adicionar_auditoria(f"Cliente removido: {cliente.nome}")
-            self.salvar_dados()
+            if self.indice_busca is not None:
+                self.indice_busca.remover(indice)
+            self._registrar_alteracao("remover_cliente", indice=indice)
+            self._adicionar_auditoria(f"Cliente removido: {cliente.nome}", entidade=cliente.id)
     
     def _gerar_id(self) -> str:
         """Gera um ID único para o cliente"""
         import secrets
         return uuid.uuid4().hex[:16]
     
-    def _adicionar_auditoria(self, mensagem: str):
-        """Adiciona entrada no log de auditoria"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.dados['auditoria'].append(f"{timestamp} - [INFO] {mensagem}")
+    def _adicionar_auditoria(self, mensagem: str, entidade: Optional[str] = None):
+        """Adiciona entrada no log de auditoria (não altera o arquivo de dados)"""
+        try:
+            with self.trava or nullcontext():
+                self.auditoria.registrar(mensagem, usuario=self.usuario_atual, entidade=entidade)
+        except Exception as e:
+            logging.error(f"Erro ao gravar auditoria: {e}")
+    
+    def registrar_acesso(self, usuario: Optional[str], acao: str):
+        """Registra login/logout no log de auditoria e atualiza o usuário atual"""
+        if acao == "login":
+            self.usuario_atual = usuario
+        self._adicionar_auditoria(f"Usuário '{usuario}' {acao}.")
+        if acao == "logout":
+            self.usuario_atual = None
+    
+    def _migrar_auditoria(self):
+        """Transfere a antiga lista dados['auditoria'] para o log de auditoria (uma única vez)"""
+        entradas = self.dados.pop('auditoria', None)
+        if not entradas or len(self.auditoria):
+            # Log já existente: a lista é resto de um arquivo ainda não regravado
+            return
+        try:
+            importadas = self.auditoria.importar_legado(entradas)
+            logging.info(f"Auditoria: {importadas} entradas transferidas para {self.auditoria.diretorio}")
+        except Exception as e:
+            logging.error(f"Erro ao transferir auditoria: {e}")
+            self.dados['auditoria'] = entradas
 
 class SistemaCM:
     """Classe principal do sistema CM"""
     
+    # Intervalo da verificação de alterações gravadas por outras instâncias
+    INTERVALO_SINCRONIZACAO_MS = 5000
+    
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("Sistema CM - Gestão Comercial")
@@ -461,7 +1004,7 @@ class SistemaCM:
         
         # Inicializar componentes
         self.sistema_auth = SistemaAutenticacao()
-        self.gerenciador_dados = GerenciadorDados()
+        self.gerenciador_dados = GerenciadorDados(conexoes_sistema=obter_gerenciador())
         
         # Ocultar janela principal até login ser realizado
         self.root.withdraw()
@@ -526,16 +1069,29 @@ class SistemaCM:
         
     def _login_sucesso(self):
         """Callback chamado após login bem-sucedido"""
+        self.gerenciador_dados.registrar_acesso(self.sistema_auth.usuario_logado.username, "login")
         messagebox.showinfo("Sucesso", "Login realizado com sucesso!")
         # Criar interface principal se ainda não foi criada
         if not self._interface_criada:
             self._criar_interface()
             self._interface_criada = True
+            self.root.after(self.INTERVALO_SINCRONIZACAO_MS, self._sincronizar_dados)
         # Exibir janela principal
         self.root.deiconify()
+    
+    def _sincronizar_dados(self):
+        """Incorpora periodicamente as alterações de outras instâncias (mesmo arquivo de dados)"""
+        try:
+            if self.gerenciador_dados.sincronizar():
+                logging.info("Dados atualizados com alterações de outra instância")
+        except Exception as e:
+            logging.error(f"Erro ao sincronizar dados: {e}")
+        self.root.after(self.INTERVALO_SINCRONIZACAO_MS, self._sincronizar_dados)
         
     def _logout(self):
         """Realiza logout do usuário"""
+        if self.sistema_auth.usuario_logado:
+            self.gerenciador_dados.registrar_acesso(self.sistema_auth.usuario_logado.username, "logout")
         self.sistema_auth.logout()
         messagebox.showinfo("Logout", "Logout realizado com sucesso!")
         
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sistema CM - Snapshot Binário dos Dados
+Cópia compacta do dados_sistema.json gravada ao lado dele para acelerar a
+inicialização. O JSON continua sendo o formato de troca e exportação; o
+snapshot binário só é usado quando corresponde ao JSON atual (tamanho e
+data de modificação) e passa na verificação de checksum.
+
+Formato (little-endian):
+    SCMSNAP1 | tamanho do JSON <Q> | mtime do JSON em ns <q> | seções <I>
+    seções:  tipo <B> | nome <H> + nome | tipo do dado <B> | linhas <I> | tamanho <Q> + conteúdo
+    CRC32 de tudo o que vem antes <I>
+
+Cadastros, vendas e pagamentos são gravados em colunas (uma seção por
+campo): textos em UTF-8 separados por NUL, inteiros em int64, valores
+monetários em centavos int64 e, se a coluna não couber em um tipo, JSON.
+Cada coluna começa com um byte de estado por linha (valor, nulo, ausente).
+As demais chaves vão em uma seção JSON.
+"""
+
+import os
+import json
+import struct
+import zlib
+import tempfile
+from array import array
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from registros_sob_demanda import AUSENTE
+
+MAGICO = b"SCMSNAP1"
+COLECOES = ("cadastros", "historico_vendas", "pagamentos")
+CAMPOS_MONETARIOS = {
+    "cadastros": ("renda_mensal", "limite_credito"),
+    "historico_vendas": ("total",),
+    "pagamentos": ("valor",),
+}
+
+# Tipos de seção
+SECAO_GERAIS, SECAO_TABELA, SECAO_COLUNA = 1, 2, 3
+# Tipos de dado das colunas
+TEXTO, INTEIRO, CENTAVOS, JSON = 1, 2, 3, 4
+# Estado de cada linha na coluna
+VALOR, NULO, FALTANTE = 0, 1, 2
+
+_CABECALHO = struct.Struct("<8sQqI")
+_SECAO = struct.Struct("<BH")
+_DADO = struct.Struct("<BIQ")
+_CRC = struct.Struct("<I")
+_CENTAVO = Decimal("0.01")
+
+
+class SnapshotInvalido(Exception):
+    """Snapshot binário ausente, desatualizado ou corrompido"""
+
+
+class Tabela:
+    """Coleção lida do snapshot: linhas em tuplas na ordem das colunas
+
+    estados guarda, por coluna, o vetor de estados (VALOR, NULO, FALTANTE);
+    centavos lista as colunas cujos valores estão em centavos (int).
+    """
+
+    __slots__ = ("colunas", "linhas", "estados", "centavos")
+
+    def __init__(self, colunas: List[str], linhas: List[tuple], estados: Dict[str, np.ndarray],
+                 centavos: Tuple[str, ...]):
+        self.colunas = colunas
+        self.linhas = linhas
+        self.estados = estados
+        self.centavos = centavos
+
+
+def caminho_snapshot(arquivo_dados: str) -> str:
+    """Arquivo do snapshot binário correspondente ao arquivo JSON"""
+    return str(Path(arquivo_dados).with_suffix(".snap"))
+
+
+def identidade_arquivo(caminho: str) -> Optional[Tuple[int, int]]:
+    """(tamanho, mtime em ns) do arquivo ou None se não existe"""
+    try:
+        info = os.stat(caminho)
+    except OSError:
+        return None
+    return info.st_size, info.st_mtime_ns
+
+
+# ---------------------------------------------------------------- gravação
+
+def _em_centavos(valor) -> int:
+    """Valor monetário em centavos; ValueError se não for exato em centavos"""
+    if isinstance(valor, bool) or not isinstance(valor, (str, int, float, Decimal)):
+        raise ValueError(valor)
+    try:
+        decimal = valor if isinstance(valor, Decimal) else Decimal(str(valor))
+    except InvalidOperation:
+        raise ValueError(valor)
+    if not decimal.is_finite() or decimal != decimal.quantize(_CENTAVO):
+        raise ValueError(valor)
+    return int(decimal * 100)
+
+
+def _codificar_coluna(valores: List[Any], monetario: bool) -> Tuple[int, bytes]:
+    """(tipo do dado, conteúdo) de uma coluna; AUSENTE marca campo inexistente no registro"""
+    estados = bytes(FALTANTE if valor is AUSENTE else NULO if valor is None else VALOR for valor in valores)
+    presentes = [valor for valor in valores if valor is not AUSENTE and valor is not None]
+
+    if monetario:
+        try:
+            centavos = array("q", (0 if valor is AUSENTE or valor is None else _em_centavos(valor)
+                                   for valor in valores))
+            return CENTAVOS, estados + centavos.tobytes()
+        except (ValueError, OverflowError):
+            pass
+
+    if all(type(valor) is int for valor in presentes):
+        try:
+            inteiros = array("q", (valor if type(valor) is int else 0 for valor in valores))
+            return INTEIRO, estados + inteiros.tobytes()
+        except OverflowError:
+            pass
+
+    if all(type(valor) is str and "\x00" not in valor for valor in presentes):
+        texto = "\x00".join(valor if type(valor) is str else "" for valor in valores)
+        return TEXTO, estados + texto.encode("utf-8")
+
+    conteudo = json.dumps([None if valor is AUSENTE else valor for valor in valores],
+                          ensure_ascii=False, default=str, separators=(",", ":"))
+    return JSON, estados + conteudo.encode("utf-8")
+
+
+def _secao(tipo: int, nome: str, tipo_dado: int, linhas: int, conteudo: bytes) -> bytes:
+    nome_bytes = nome.encode("utf-8")
+    return (_SECAO.pack(tipo, len(nome_bytes)) + nome_bytes
+            + _DADO.pack(tipo_dado, linhas, len(conteudo)) + conteudo)
+
+
+def gravar_snapshot(caminho: str, dados: Dict[str, Any], identidade_json: Tuple[int, int]):
+    """Grava o snapshot binário (atômico) dos dados no formato do arquivo JSON
+
+    Args:
+        caminho: Arquivo do snapshot
+        dados: Conteúdo gravado no JSON (registros em dicionários)
+        identidade_json: (tamanho, mtime em ns) do JSON correspondente
+    """
+    secoes = []
+    gerais = {chave: valor for chave, valor in dados.items() if chave not in COLECOES}
+    secoes.append(_secao(SECAO_GERAIS, "", JSON, 0, json.dumps(
+        gerais, ensure_ascii=False, default=str, separators=(",", ":")).encode("utf-8")))
+
+    for colecao in COLECOES:
+        if colecao not in dados:
+            continue
+        registros = [registro for registro in dados[colecao] if isinstance(registro, dict)]
+        colunas = list(dict.fromkeys(campo for registro in registros for campo in registro))
+        secoes.append(_secao(SECAO_TABELA, colecao, JSON, len(registros),
+                             json.dumps(colunas, ensure_ascii=False).encode("utf-8")))
+        monetarios = CAMPOS_MONETARIOS.get(colecao, ())
+        for coluna in colunas:
+            tipo, conteudo = _codificar_coluna([registro.get(coluna, AUSENTE) for registro in registros],
+                                               coluna in monetarios)
+            secoes.append(_secao(SECAO_COLUNA, f"{colecao}.{coluna}", tipo, len(registros), conteudo))
+
+    corpo = _CABECALHO.pack(MAGICO, identidade_json[0], identidade_json[1], len(secoes)) + b"".join(secoes)
+    with tempfile.NamedTemporaryFile("wb", dir=os.path.dirname(caminho) or ".", delete=False) as tmp:
+        tmp.write(corpo)
+        tmp.write(_CRC.pack(zlib.crc32(corpo)))
+        temporario = tmp.name
+    os.replace(temporario, caminho)
+
+
+# ---------------------------------------------------------------- leitura
+
+def _decodificar_coluna(tipo: int, linhas: int, conteudo: memoryview) -> Tuple[List[Any], np.ndarray]:
+    """Valores (AUSENTE / None conforme o estado) e vetor de estados da coluna"""
+    estados = np.frombuffer(conteudo[:linhas], dtype=np.uint8)
+    dados = conteudo[linhas:]
+
+    if tipo in (INTEIRO, CENTAVOS):
+        numeros = array("q")
+        numeros.frombytes(dados)
+        valores = numeros.tolist()
+    elif tipo == TEXTO:
+        valores = str(dados, "utf-8").split("\x00") if linhas else []
+    elif tipo == JSON:
+        valores = json.loads(str(dados, "utf-8"))
+    else:
+        raise SnapshotInvalido(f"Tipo de coluna desconhecido: {tipo}")
+
+    if len(valores) != linhas:
+        raise SnapshotInvalido("Quantidade de valores diferente da quantidade de linhas")
+    for indice in np.flatnonzero(estados).tolist():
+        valores[indice] = AUSENTE if estados[indice] == FALTANTE else None
+    return valores, estados
+
+
+def _abrir_snapshot(caminho: str, identidade_json: Optional[Tuple[int, int]]) -> Tuple[memoryview, int]:
+    """Conteúdo conferido (sem o CRC) e quantidade de seções do snapshot"""
+    try:
+        with open(caminho, "rb") as f:
+            conteudo = f.read()
+    except OSError as e:
+        raise SnapshotInvalido(f"Snapshot indisponível: {e}")
+
+    if len(conteudo) < _CABECALHO.size + _CRC.size:
+        raise SnapshotInvalido("Snapshot truncado")
+    magico, tamanho_json, mtime_json, quantidade = _CABECALHO.unpack_from(conteudo)
+    if magico != MAGICO:
+        raise SnapshotInvalido("Formato desconhecido")
+    if identidade_json != (tamanho_json, mtime_json):
+        raise SnapshotInvalido("Snapshot não corresponde ao arquivo JSON atual")
+    (crc,) = _CRC.unpack_from(conteudo, len(conteudo) - _CRC.size)
+    visao = memoryview(conteudo)[:len(conteudo) - _CRC.size]
+    if zlib.crc32(visao) != crc:
+        raise SnapshotInvalido("Checksum inválido")
+    return visao, quantidade
+
+
+def ler_gerais(caminho: str, identidade_json: Optional[Tuple[int, int]]) -> Dict[str, Any]:
+    """Somente as chaves gerais (sem cadastros, vendas e pagamentos) do snapshot
+
+    Raises:
+        SnapshotInvalido: Arquivo ausente, de outro JSON ou corrompido
+    """
+    visao, quantidade = _abrir_snapshot(caminho, identidade_json)
+    try:
+        tipo_secao, tamanho_nome = _SECAO.unpack_from(visao, _CABECALHO.size)
+        posicao = _CABECALHO.size + _SECAO.size + tamanho_nome
+        _, _, tamanho = _DADO.unpack_from(visao, posicao)
+        posicao += _DADO.size
+    except struct.error as e:
+        raise SnapshotInvalido(f"Seção inválida: {e}")
+    if not quantidade or tipo_secao != SECAO_GERAIS:
+        raise SnapshotInvalido("Seção de chaves gerais ausente")
+    return json.loads(str(visao[posicao:posicao + tamanho], "utf-8"))
+
+
+def ler_snapshot(caminho: str, identidade_json: Optional[Tuple[int, int]]) -> Dict[str, Any]:
+    """Lê o snapshot binário
+
+    Returns:
+        Dados no formato do JSON, com cadastros, vendas e pagamentos em Tabela
+
+    Raises:
+        SnapshotInvalido: Arquivo ausente, de outro JSON ou corrompido
+    """
+    visao, quantidade = _abrir_snapshot(caminho, identidade_json)
+
+    dados: Dict[str, Any] = {}
+    colunas_tabela: Dict[str, Dict[str, Any]] = {}
+    posicao = _CABECALHO.size
+    try:
+        for _ in range(quantidade):
+            tipo_secao, tamanho_nome = _SECAO.unpack_from(visao, posicao)
+            posicao += _SECAO.size
+            nome = str(visao[posicao:posicao + tamanho_nome], "utf-8")
+            posicao += tamanho_nome
+            tipo_dado, linhas, tamanho = _DADO.unpack_from(visao, posicao)
+            posicao += _DADO.size
+            secao = visao[posicao:posicao + tamanho]
+            posicao += tamanho
+
+            if tipo_secao == SECAO_GERAIS:
+                dados.update(json.loads(str(secao, "utf-8")))
+            elif tipo_secao == SECAO_TABELA:
+                colunas_tabela[nome] = {"colunas": json.loads(str(secao, "utf-8")), "linhas": linhas,
+                                        "valores": {}, "estados": {}, "centavos": []}
+            elif tipo_secao == SECAO_COLUNA:
+                colecao, coluna = nome.split(".", 1)
+                tabela = colunas_tabela[colecao]
+                valores, estados = _decodificar_coluna(tipo_dado, linhas, secao)
+                tabela["valores"][coluna] = valores
+                tabela["estados"][coluna] = estados
+                if tipo_dado == CENTAVOS:
+                    tabela["centavos"].append(coluna)
+            else:
+                raise SnapshotInvalido(f"Tipo de seção desconhecido: {tipo_secao}")
+    except (struct.error, KeyError, ValueError, UnicodeDecodeError) as e:
+        raise SnapshotInvalido(f"Seção inválida: {e}")
+
+    for colecao, tabela in colunas_tabela.items():
+        colunas = tabela["colunas"]
+        linhas = list(zip(*(tabela["valores"][coluna] for coluna in colunas))) if colunas \
+            else [()] * tabela["linhas"]
+        dados[colecao] = Tabela(colunas, linhas, tabela["estados"], tuple(tabela["centavos"]))
+    return dados
+
+
+def linhas_validas(tabela: Tabela, aceitos: Sequence[str], obrigatorios: Sequence[str],
+                   legado: Optional[str] = None) -> np.ndarray:
+    """Máscara das linhas com os campos aceitos e obrigatórios (legado: campo que dispensa a checagem)"""
+    validas = np.ones(len(tabela.linhas), dtype=bool)
+    for coluna in tabela.colunas:
+        if coluna not in aceitos and coluna != legado:
+            validas &= tabela.estados[coluna] == FALTANTE
+    for coluna in obrigatorios:
+        if coluna not in tabela.estados:
+            validas[:] = False
+        else:
+            validas &= tabela.estados[coluna] != FALTANTE
+    if legado in tabela.estados:
+        validas |= tabela.estados[legado] != FALTANTE
+    return validas
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Script para testar várias instâncias do sistema gravando no mesmo arquivo de dados
+
+Cada processo adiciona e edita clientes e registra vendas ao mesmo tempo
+(com compactações do journal e gravações completas no meio); ao final
+confere que nenhuma alteração se perdeu e que uma instância aberta desde
+o início acompanha tudo sem recarregar o arquivo inteiro.
+
+Uso:
+    python teste_multiprocessos.py [processos] [operacoes por processo]
+"""
+
+import os
+import sys
+import json
+import random
+import shutil
+import tempfile
+import logging
+import multiprocessing
+from datetime import date
+from decimal import Decimal
+
+# Garantir que os módulos no mesmo diretório possam ser importados
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sistema_interface import GerenciadorDados, CadastroCliente, Venda
+
+
+def _trabalhador(arquivo: str, numero: int, operacoes: int, resultados):
+    """Executa operações aleatórias e devolve o que gravou (clientes, edições e vendas)"""
+    logging.disable(logging.INFO)
+    gerenciador = GerenciadorDados(arquivo)
+    gerenciador.journal.limite_compactacao = 40
+    aleatorio = random.Random(numero)
+    meus_clientes = []
+    vendas = 0
+    total = Decimal("0")
+
+    for operacao in range(operacoes):
+        sorteio = aleatorio.random()
+        if sorteio < 0.3 or not meus_clientes:
+            cliente = CadastroCliente(nome=f"Cliente {numero}-{operacao}", cpf=f"{numero:03d}{operacao:08d}",
+                                      loja_cadastro=f"Loja {numero}")
+            gerenciador.adicionar_cliente(cliente)
+            meus_clientes.append(cliente.id)
+        elif sorteio < 0.5:
+            id_cliente = aleatorio.choice(meus_clientes)
+            indice = next(i for i in range(len(gerenciador.dados['cadastros']))
+                          if gerenciador.valores_cliente(i, ('id',))[0] == id_cliente)
+            cliente = gerenciador.dados['cadastros'][indice]
+            cliente.observacao = f"editado por {numero} na operação {operacao}"
+            gerenciador.editar_cliente(indice, cliente)
+        elif sorteio < 0.98:
+            venda = Venda(produto=f"Produto {numero}", quantidade=1, total=Decimal("10.50"),
+                          timestamp="2025-03-10 10:00:00", codigo_loja=f"Loja {numero}")
+            gerenciador.registrar_venda(venda)
+            vendas += 1
+            total += venda.total
+        else:
+            # Gravação completa: incrementa a geração do arquivo
+            gerenciador.dados['saldo_caixa'] = f"{numero}.00"
+            gerenciador.salvar_dados()
+
+    gerenciador.journal.aguardar_compactacao()
+    resultados.put((numero, meus_clientes, vendas, str(total)))
+
+
+def main():
+    processos = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    operacoes = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    print("=== TESTE DE VÁRIAS INSTÂNCIAS NO MESMO ARQUIVO ===")
+    diretorio = tempfile.mkdtemp(prefix="multiprocessos_")
+    diretorio_original = os.getcwd()
+    os.chdir(diretorio)
+    logging.disable(logging.INFO)
+    try:
+        arquivo = os.path.join(diretorio, "dados_sistema.json")
+
+        # Instância aberta antes das demais: deve acompanhar as alterações
+        observador = GerenciadorDados(arquivo)
+        recargas = []
+        carregar = observador._carregar
+        observador._carregar = lambda: (recargas.append(1), carregar())
+        observador.buscar_clientes("")
+
+        print(f"\n1. {processos} processos x {operacoes} operações...")
+        resultados = multiprocessing.Queue()
+        trabalhadores = [multiprocessing.Process(target=_trabalhador, args=(arquivo, numero, operacoes, resultados))
+                         for numero in range(processos)]
+        for trabalhador in trabalhadores:
+            trabalhador.start()
+
+        sincronizacoes = 0
+        while any(trabalhador.is_alive() for trabalhador in trabalhadores):
+            observador.sincronizar()
+            sincronizacoes += 1
+        respostas = [resultados.get() for _ in trabalhadores]
+        for trabalhador in trabalhadores:
+            trabalhador.join()
+        observador.sincronizar()
+
+        clientes_esperados = [id_cliente for _, ids, _, _ in respostas for id_cliente in ids]
+        vendas_esperadas = sum(vendas for _, _, vendas, _ in respostas)
+        total_esperado = sum(Decimal(total) for _, _, _, total in respostas)
+
+        print("\n2. Conferindo uma carga nova do arquivo...")
+        erros = 0
+        novo = GerenciadorDados(arquivo)
+        for descricao, gerenciador in (("carga nova", novo), ("observador", observador)):
+            cadastros = gerenciador.dados['cadastros']
+            ids = [gerenciador.valores_cliente(i, ('id',))[0] for i in range(len(cadastros))]
+            vendas = gerenciador.dados['historico_vendas']
+            # Total pelo resumo diário (mantido incrementalmente pelo observador)
+            total = sum((linha['total'] for linha in gerenciador.resumo_vendas.linhas(date.min, date.max)),
+                        Decimal("0"))
+            verificacoes = [
+                ("clientes", sorted(ids), sorted(clientes_esperados)),
+                ("vendas", len(vendas), vendas_esperadas),
+                ("total das vendas", total, total_esperado),
+                ("busca", sorted(gerenciador.buscar_clientes("")), list(range(len(cadastros)))),
+            ]
+            for nome, obtido, esperado in verificacoes:
+                if obtido != esperado:
+                    erros += 1
+                    print(f"   ❌ {descricao}: {nome} divergente")
+            print(f"   {descricao}: {len(ids)} clientes, {len(vendas)} vendas")
+
+        # Última edição de cada cliente gravada pelo próprio processo
+        observacoes = {novo.dados['cadastros'][i].id: novo.dados['cadastros'][i].observacao
+                       for i in range(len(novo.dados['cadastros']))}
+        for i in range(len(observador.dados['cadastros'])):
+            cliente = observador.dados['cadastros'][i]
+            if observacoes.get(cliente.id) != cliente.observacao:
+                erros += 1
+                print(f"   ❌ observador: edição divergente no cliente {cliente.id}")
+                break
+
+        print("\n3. Conferindo o journal...")
+        sequencias = []
+        for caminho in (f"{arquivo}.journal.1", f"{arquivo}.journal"):
+            if os.path.exists(caminho):
+                with open(caminho, "r", encoding="utf-8") as f:
+                    sequencias += [json.loads(linha)["seq"] for linha in f if linha.strip()]
+        if len(sequencias) != len(set(sequencias)):
+            erros += 1
+            print("   ❌ Sequências repetidas no journal")
+        print(f"   {len(sequencias)} registros pendentes, sequência final {novo.journal.seq}")
+        print(f"   Observador: {sincronizacoes} sincronizações, {len(recargas)} recargas completas")
+
+        print("\n4. Conferindo a auditoria...")
+        entradas = novo.auditoria.consultar()
+        alteracoes = len(clientes_esperados) + sum(1 for entrada in entradas if "editado" in entrada["mensagem"])
+        if sum(1 for entrada in entradas if "Cliente adicionado" in entrada["mensagem"]) != len(clientes_esperados):
+            erros += 1
+            print("   ❌ Entradas de auditoria perdidas")
+        print(f"   {len(entradas)} entradas ({alteracoes} de clientes)")
+
+        print("\n✅ Nenhuma alteração perdida" if not erros else f"\n❌ {erros} divergências")
+        return 0 if not erros else 1
+    finally:
+        os.chdir(diretorio_original)
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Sistema CM - Trava entre Processos
+Trava exclusiva baseada em arquivo (fcntl.flock no Linux/macOS,
+msvcrt.locking no Windows) para que várias instâncias do sistema gravem
+no mesmo arquivo de dados uma de cada vez
+"""
+
+import os
+import time
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class TravaArquivo:
+    """Trava exclusiva entre processos, reentrante dentro do processo
+
+    Uso:
+        trava = TravaArquivo("dados_sistema.json.lock")
+        with trava:
+            ...
+    """
+
+    def __init__(self, caminho: str, tempo_limite: float = 30.0):
+        self.caminho = caminho
+        self.tempo_limite = tempo_limite
+        self._lock = threading.RLock()
+        self._profundidade = 0
+        self._descritor = None
+
+    def _travar_arquivo(self, descritor: int) -> bool:
+        """Tenta obter a trava do sistema operacional sem esperar"""
+        try:
+            if fcntl:
+                fcntl.flock(descritor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                os.lseek(descritor, 0, os.SEEK_SET)
+                msvcrt.locking(descritor, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _liberar_arquivo(self, descritor: int):
+        if fcntl:
+            fcntl.flock(descritor, fcntl.LOCK_UN)
+        else:
+            os.lseek(descritor, 0, os.SEEK_SET)
+            msvcrt.locking(descritor, msvcrt.LK_UNLCK, 1)
+
+    def adquirir(self):
+        """Obtém a trava (espera até tempo_limite; TimeoutError se outro processo não liberar)"""
+        self._lock.acquire()
+        if self._profundidade:
+            self._profundidade += 1
+            return
+
+        try:
+            descritor = os.open(self.caminho, os.O_RDWR | os.O_CREAT, 0o666)
+            limite = time.monotonic() + self.tempo_limite
+            espera = 0.001
+            while not self._travar_arquivo(descritor):
+                if time.monotonic() >= limite:
+                    os.close(descritor)
+                    raise TimeoutError(f"Trava {self.caminho} ocupada por outro processo")
+                time.sleep(espera)
+                espera = min(espera * 2, 0.05)
+        except BaseException:
+            self._lock.release()
+            raise
+
+        self._descritor = descritor
+        self._profundidade = 1
+
+    def liberar(self):
+        """Libera um nível da trava (o arquivo é liberado no último)"""
+        self._profundidade -= 1
+        if not self._profundidade:
+            try:
+                self._liberar_arquivo(self._descritor)
+            finally:
+                os.close(self._descritor)
+                self._descritor = None
+        self._lock.release()
+
+    def __enter__(self):
+        self.adquirir()
+        return self
+
+    def __exit__(self, *exc):
+        self.liberar()